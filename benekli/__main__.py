@@ -4,7 +4,7 @@
 
 import sys
 
-from . import benekli
+from . import cli
 
 if __name__ == "__main__":
-    sys.exit(benekli.run())
+    sys.exit(cli.run())
@@ -0,0 +1,338 @@
+# SPDX-FileCopyrightText: 2025 Mete Balci
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import argparse
+import concurrent.futures
+import copy
+import glob
+import json
+import logging
+import os
+
+from .benekli import open_cms_profile, run_with_opts
+from .cli import add_common_arguments, check_features, setup_logging
+from .options import CommandOptions, err
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MANIFEST_FILENAME = "benekli-manifest.jsonl"
+
+# profiles opened once per worker process by init_worker
+_worker_cms_profiles = {}
+
+
+def expand_images(patterns):
+    """Expand the filenames or glob patterns to a list of image filenames."""
+    images = []
+    for pattern in patterns:
+        filenames = sorted(glob.glob(pattern))
+        if len(filenames) == 0:
+            err("no input image matches %s" % pattern)
+
+        images.extend(filenames)
+
+    # remove the duplicates but keep the order
+    return list(dict.fromkeys(images))
+
+
+def get_output_filename(output_dir, image_filename, opts, suffix=None, extension=None):
+    # e.g. FourteenBalls.SC-P800.p.bpc.tif, or FourteenBalls.SC-P800.p.bpc.de.tif
+    image_name, image_extension = os.path.splitext(os.path.basename(image_filename))
+    if extension is not None:
+        image_extension = extension
+
+    profile_filename = os.path.basename(opts.simulated_profile_filename)
+    profile_name = os.path.splitext(profile_filename)[0]
+    names = [image_name, profile_name, opts.rendering_intent]
+    if opts.bpc:
+        names.append("bpc")
+
+    if suffix is not None:
+        names.append(suffix)
+
+    return os.path.join(output_dir, ".".join(names) + image_extension)
+
+
+def create_jobs(
+    images, simulated_profile_filenames, opts, output_dir, proof, de, de_stats=False
+):
+    """Create the options of all image and simulated profile combinations."""
+    jobs = []
+    for image_filename in images:
+        for simulated_profile_filename in simulated_profile_filenames:
+            job = copy.copy(opts)
+            job.input_filename = image_filename
+            job.simulated_profile_filename = simulated_profile_filename
+            job.output_filename = None
+            job.de_filename = None
+            job.de_stats_filename = None
+            if proof:
+                job.output_filename = get_output_filename(
+                    output_dir, image_filename, job
+                )
+
+            if de:
+                job.de_filename = get_output_filename(
+                    output_dir, image_filename, job, "de"
+                )
+
+            if de_stats:
+                job.de_stats_filename = get_output_filename(
+                    output_dir, image_filename, job, "de", ".json"
+                )
+
+            jobs.append(job)
+
+    return jobs
+
+
+def get_job_record(job):
+    """Return the manifest record of a job, without its status."""
+    return {
+        "image": job.input_filename,
+        "input_profile": job.input_profile_filename,
+        "simulated_profile": job.simulated_profile_filename,
+        "display_profile": job.display_profile_filename,
+        "rendering_intent": job.rendering_intent,
+        "bpc": job.bpc,
+        "gamut_check": job.gamut_check,
+        "de_formula": job.de_formula,
+        "de_direct": job.de_direct,
+        "de_float": job.de_float,
+        "output": job.output_filename,
+        "de": job.de_filename,
+        "de_stats": job.de_stats_filename,
+    }
+
+
+def get_record_key(record):
+    return json.dumps(
+        {k: v for k, v in record.items() if k not in ("status", "error")},
+        sort_keys=True,
+    )
+
+
+def read_manifest(filename):
+    """Return the keys of the jobs that are done according to the manifest."""
+    done = set()
+    if filename is None or not os.path.exists(filename):
+        return done
+
+    with open(filename, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+
+            except json.JSONDecodeError:
+                # the last line is incomplete if the batch was killed while writing
+                logger.warning("ignoring invalid manifest line: %s" % line.strip())
+                continue
+
+            if record.get("status") == "done":
+                done.add(get_record_key(record))
+
+    return done
+
+
+def init_worker(profile_filenames, logging_level):
+    """Initialize a worker process, open the profiles used by its jobs."""
+    logging.getLogger("benekli").setLevel(logging_level)
+    for filename in profile_filenames:
+        try:
+            _worker_cms_profiles[filename] = open_cms_profile(filename)
+
+        except OSError as e:
+            # the jobs using this profile report the error
+            logger.warning("cannot open profile %s: %s" % (filename, e))
+
+
+def run_job(job):
+    """Run a job in a worker, return None if it succeeds or the error."""
+    try:
+        run_with_opts(job, _worker_cms_profiles)
+
+    except SystemExit:
+        # err() logs the error and exits
+        return "failed, see the log for the error"
+
+    return None
+
+
+def run_batch(jobs, workers=None, manifest_filename=None):
+    """Run the jobs in worker processes, return the number of failed jobs.
+
+    The jobs that are done according to the manifest are skipped, and the
+    result of every job is appended to the manifest as soon as it is known,
+    so an interrupted batch continues where it stopped."""
+    done = read_manifest(manifest_filename)
+    pending = [job for job in jobs if get_record_key(get_job_record(job)) not in done]
+    logger.info(
+        "%d jobs, %d are already done, %d to run"
+        % (len(jobs), len(jobs) - len(pending), len(pending))
+    )
+    if len(pending) == 0:
+        return 0
+
+    profile_filenames = set()
+    for job in pending:
+        profile_filenames.add(job.simulated_profile_filename)
+        profile_filenames.add(job.display_profile_filename)
+        profile_filenames.add(job.input_profile_filename)
+
+    profile_filenames.discard(None)
+
+    manifest = None
+    if manifest_filename is not None:
+        manifest = open(manifest_filename, "a", encoding="utf-8")
+
+    failed = 0
+    try:
+        with concurrent.futures.ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=init_worker,
+            initargs=(sorted(profile_filenames), logging.getLogger("benekli").level),
+        ) as executor:
+            futures = {executor.submit(run_job, job): job for job in pending}
+            for future in concurrent.futures.as_completed(futures):
+                job = futures[future]
+                try:
+                    error = future.result()
+
+                except Exception as e:  # pylint: disable=broad-exception-caught
+                    error = str(e)
+
+                record = get_job_record(job)
+                record["status"] = "done" if error is None else "failed"
+                record["error"] = error
+                if error is not None:
+                    failed = failed + 1
+                    logger.error(
+                        "%s with %s failed: %s"
+                        % (job.input_filename, job.simulated_profile_filename, error)
+                    )
+
+                if manifest is not None:
+                    manifest.write(json.dumps(record) + "\n")
+                    manifest.flush()
+
+    finally:
+        if manifest is not None:
+            manifest.close()
+
+    return failed
+
+
+def run(argv=None):
+    opts = CommandOptions()
+    # the worker processes already use all CPUs
+    opts.threads = 1
+    parser = argparse.ArgumentParser(
+        prog="benekli batch",
+        description="soft proof many images with many simulated profiles",
+    )
+    add_common_arguments(parser, opts)
+    parser.add_argument(
+        "-i",
+        "--input-image",
+        metavar="PATTERN",
+        help="input image filename or glob pattern, can be repeated",
+        action="append",
+        required=True,
+    )
+    parser.add_argument(
+        "-s",
+        "--simulated-profile",
+        metavar="FILENAME",
+        help="simulated (printer/paper) profile, can be repeated",
+        action="append",
+        required=True,
+    )
+    parser.add_argument(
+        "--output-dir",
+        metavar="DIRECTORY",
+        help="directory of the output proof and delta E images",
+        required=True,
+    )
+    parser.add_argument(
+        "--no-proof",
+        help="do not output proof images",
+        default=False,
+        action="store_true",
+    )
+    parser.add_argument(
+        "--de",
+        help="output delta E images",
+        default=False,
+        action="store_true",
+    )
+    parser.add_argument(
+        "--de-stats",
+        help="output delta E statistics (JSON)",
+        default=False,
+        action="store_true",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        metavar="N",
+        type=int,
+        help="number of worker processes (default: number of CPUs)",
+    )
+    parser.add_argument(
+        "--manifest",
+        metavar="FILENAME",
+        help="manifest of the finished jobs, used to resume an interrupted batch "
+        "(default: %s in the output directory)" % DEFAULT_MANIFEST_FILENAME,
+    )
+    parser.set_defaults(
+        output_image=None,
+        output_de=None,
+        output_de_stats=None,
+        sweep=False,
+        sweep_threads=1,
+        cprofile=None,
+        tracemalloc=None,
+    )
+    args = parser.parse_args(argv)
+    setup_logging(args.verbose)
+    logger.debug(args)
+    check_features()
+
+    opts.load_from_args(args)
+
+    if opts.rendering_intent is None:
+        err("-r (rendering intent) must be specified")
+
+    if args.no_proof and not args.de and not args.de_stats:
+        err(
+            "--no-proof requires --de or --de-stats, otherwise there is nothing to output"
+        )
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    manifest_filename = args.manifest
+    if manifest_filename is None:
+        manifest_filename = os.path.join(args.output_dir, DEFAULT_MANIFEST_FILENAME)
+
+    jobs = create_jobs(
+        expand_images(args.input_image),
+        list(dict.fromkeys(args.simulated_profile)),
+        opts,
+        args.output_dir,
+        proof=not args.no_proof,
+        de=args.de,
+        de_stats=args.de_stats,
+    )
+    outputs = [
+        job.output_filename or job.de_filename or job.de_stats_filename for job in jobs
+    ]
+    if len(set(outputs)) != len(outputs):
+        err("input images with the same name would overwrite each other's outputs")
+
+    failed = run_batch(jobs, args.jobs, manifest_filename)
+    if failed > 0:
+        print("%d of %d jobs failed" % (failed, len(jobs)))
+        return 1
+
+    print("batch done: %d jobs" % len(jobs))
+    return 0
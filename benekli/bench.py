@@ -0,0 +1,377 @@
+# SPDX-FileCopyrightText: 2025 Mete Balci
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+# python -m benekli.bench, the benchmarks of the hot paths
+#
+# every stage is timed on synthetic RGB images of the given sizes (a
+# gradient in red and green and noise in blue, so both the smooth and the
+# noisy colors are in them) and on the given images, FourteenBalls.tif of the
+# repository by default, the best of --repeat runs is kept
+#
+# the stages:
+#   lab       the RGB image to Lab, the input and display Lab of delta E
+#   de76      cie76 of the Lab images, chunk by chunk like create_de_image
+#   de94      cie94 (graphic arts)
+#   de2000    ciede2000
+#   de_image  create_de_image with ciede2000, delta E and its colors
+#   proof     run_with_opts, reading the TIFF, the proof and the delta E image,
+#             writing them as LZW TIFFs
+#
+# every stage and image is run in a new process, so the peak RSS of a
+# process is the peak of that stage (and of creating its input images), and
+# proof starts with empty profile and transform caches like the command line
+#
+# the results are written as JSON with --output, and compared with the
+# results of an earlier run with --baseline, a stage that is slower than the
+# baseline by more than --tolerance is a regression and the exit code is 1
+
+import argparse
+import collections
+import concurrent.futures
+import contextlib
+import io
+import json
+import logging
+import math
+import os
+import platform
+import sys
+import tempfile
+import time
+
+import numpy as np
+from PIL import Image, ImageCms
+
+from . import cache
+from .benekli import create_de_image, get_Lab_transform, iterate_de, run_with_opts
+from .cli import setup_logging
+from .options import CommandOptions
+from .timings import get_peak_rss
+
+logger = logging.getLogger(__name__)
+
+BENCH_STAGES = ("lab", "de76", "de94", "de2000", "de_image", "proof")
+DE_FORMULAS = {"de76": "cie76", "de94": "cie94", "de2000": "ciede2000"}
+
+# megapixels
+DEFAULT_SIZES = (1, 4, 16)
+DEFAULT_REPEAT = 3
+DEFAULT_TOLERANCE = 0.25
+
+REPOSITORY_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FOURTEEN_BALLS = os.path.join(REPOSITORY_DIR, "FourteenBalls.tif")
+
+
+def create_rgb_image(megapixels, seed=0):
+    """Return a square RGB image of about megapixels."""
+    side = max(1, round(math.sqrt(megapixels * 1e6)))
+    rgb = np.empty((side, side, 3), dtype=np.uint8)
+    gradient = (np.arange(side) * 255 // max(side - 1, 1)).astype(np.uint8)
+    rgb[..., 0] = gradient[np.newaxis, :]
+    rgb[..., 1] = gradient[:, np.newaxis]
+    rgb[..., 2] = np.random.default_rng(seed).integers(0, 256, (side, side))
+    return Image.fromarray(rgb)
+
+
+def get_image_name(source):
+    if isinstance(source, str):
+        return os.path.basename(source)
+
+    return "synthetic-%gMP" % source
+
+
+def open_image(source):
+    """Return the RGB image and its input profile of a filename or a size."""
+    if isinstance(source, str):
+        with Image.open(source) as image:
+            image.load()
+
+        if "icc_profile" in image.info:
+            return image, cache.get_profile_from_bytes(image.info["icc_profile"])
+
+        return image, cache.get_built_profile("sRGB")
+
+    return create_rgb_image(source), cache.get_built_profile("sRGB")
+
+
+def get_changed_image(image):
+    """Return the image with small random changes, like a proof of it."""
+    rgb = np.asarray(image).astype(np.int16)
+    rgb += np.random.default_rng(1).integers(-8, 9, rgb.shape, dtype=np.int16)
+    return Image.fromarray(np.clip(rgb, 0, 255).astype(np.uint8))
+
+
+def prepare_stage(stage, source, directory):
+    """Return the function running the stage once and the size of the image,
+    the input of the stage is not timed."""
+    image, cms_profile = open_image(source)
+    transform = get_Lab_transform(cms_profile)
+    if stage == "lab":
+        return lambda: transform.point(image), image.size
+
+    image_Lab = transform.point(image)
+    changed_Lab = transform.point(get_changed_image(image))
+    if stage in DE_FORMULAS:
+        opts = CommandOptions()
+        opts.de_formula = DE_FORMULAS[stage]
+        de_formula = opts.get_color_difference_formula()
+        # consume the chunks
+        return (
+            lambda: collections.deque(
+                iterate_de(de_formula, image_Lab, changed_Lab), maxlen=0
+            ),
+            image.size,
+        )
+
+    if stage == "de_image":
+        opts = CommandOptions()
+        opts.de_formula = "ciede2000"
+        de_formula = opts.get_color_difference_formula()
+        return lambda: create_de_image(de_formula, image_Lab, changed_Lab), image.size
+
+    # proof
+    input_filename = os.path.join(directory, "input.tif")
+    image.save(
+        input_filename, compression="tiff_lzw", icc_profile=cms_profile.tobytes()
+    )
+    simulated_profile_filename = os.path.join(directory, "printer.icc")
+    display_profile_filename = os.path.join(directory, "display.icc")
+    srgb = cache.get_built_profile("sRGB").tobytes()
+    # sRGB with the printer device class
+    with open(simulated_profile_filename, "wb") as f:
+        f.write(srgb[:12] + b"prtr" + srgb[16:])
+
+    with open(display_profile_filename, "wb") as f:
+        f.write(srgb)
+
+    opts = CommandOptions()
+    opts.input_filename = input_filename
+    opts.simulated_profile_filename = simulated_profile_filename
+    opts.display_profile_filename = display_profile_filename
+    opts.de_formula = "ciede2000"
+    opts.output_filename = os.path.join(directory, "proof.tif")
+    opts.de_filename = os.path.join(directory, "de.tif")
+
+    def proof():
+        # a new process per run would time the imports too
+        cache.cache_clear()
+        with contextlib.redirect_stdout(io.StringIO()):
+            run_with_opts(opts)
+
+    return proof, image.size
+
+
+def run_stage(stage, source, repeat, logging_level=logging.WARNING):
+    """Run a stage in this process, return its result record."""
+    logging.getLogger("benekli").setLevel(logging_level)
+    with tempfile.TemporaryDirectory() as directory:
+        run_once, (width, height) = prepare_stage(stage, source, directory)
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            run_once()
+            times.append(time.perf_counter() - start)
+
+    megapixels = width * height / 1e6
+    seconds = min(times)
+    return {
+        "stage": stage,
+        "image": get_image_name(source),
+        "megapixels": round(megapixels, 6),
+        "seconds": round(seconds, 6),
+        "mp_per_s": round(megapixels / seconds, 3),
+        "peak_rss_mb": get_peak_rss(),
+    }
+
+
+def run_benchmarks(stages, sources, repeat=DEFAULT_REPEAT):
+    """Run every stage of every image in a new process, return the results."""
+    results = []
+    for source in sources:
+        for stage in stages:
+            with concurrent.futures.ProcessPoolExecutor(
+                max_workers=1, max_tasks_per_child=1
+            ) as executor:
+                result = executor.submit(
+                    run_stage,
+                    stage,
+                    source,
+                    repeat,
+                    logging.getLogger("benekli").level,
+                ).result()
+
+            logger.info(
+                "%s of %s: %.3f seconds" % (stage, result["image"], result["seconds"])
+            )
+            results.append(result)
+
+    return results
+
+
+def get_environment():
+    return {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pillow": Image.__version__,
+        "littlecms": ImageCms.core.littlecms_version,
+        "machine": platform.machine(),
+        "system": platform.system(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def compare(results, baseline, tolerance=DEFAULT_TOLERANCE):
+    """Return the results with the change of the seconds from the baseline,
+    and the results that are slower than the baseline by more than
+    tolerance."""
+    baseline_seconds = {
+        (result["stage"], result["image"]): result["seconds"]
+        for result in baseline["results"]
+    }
+    compared = []
+    regressions = []
+    for result in results:
+        result = dict(result)
+        key = (result["stage"], result["image"])
+        if key in baseline_seconds:
+            result["change"] = round(result["seconds"] / baseline_seconds[key] - 1, 4)
+            if result["change"] > tolerance:
+                regressions.append(result)
+
+        compared.append(result)
+
+    return compared, regressions
+
+
+def format_result(result):
+    line = "%-9s %-22s %9.3f s %9.2f MP/s" % (
+        result["stage"],
+        result["image"],
+        result["seconds"],
+        result["mp_per_s"],
+    )
+    if result["peak_rss_mb"] is not None:
+        line = line + " %8.1f MB" % result["peak_rss_mb"]
+
+    if "change" in result:
+        line = line + " %+7.1f%%" % (100 * result["change"])
+
+    return line
+
+
+def parse_sizes(s):
+    try:
+        return tuple(float(size) for size in s.split(","))
+
+    except ValueError as e:
+        raise argparse.ArgumentTypeError("invalid sizes: %s" % s) from e
+
+
+def parse_stages(s):
+    stages = tuple(s.split(","))
+    for stage in stages:
+        if stage not in BENCH_STAGES:
+            raise argparse.ArgumentTypeError("invalid stage: %s" % stage)
+
+    return stages
+
+
+def run(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m benekli.bench",
+        description="benchmark the delta E formulas, the delta E images and "
+        "the proofs",
+    )
+    parser.add_argument(
+        "--sizes",
+        metavar="MP,...",
+        type=parse_sizes,
+        help="megapixels of the synthetic images, e.g. 1,4,16,100 (default: %s)"
+        % ",".join("%g" % size for size in DEFAULT_SIZES),
+        default=DEFAULT_SIZES,
+    )
+    parser.add_argument(
+        "-i",
+        "--image",
+        metavar="FILENAME",
+        help="image to benchmark too, can be repeated (default: %s if it exists)"
+        % os.path.basename(FOURTEEN_BALLS),
+        action="append",
+    )
+    parser.add_argument(
+        "--stages",
+        metavar="STAGE,...",
+        type=parse_stages,
+        help="stages to run (default: %s)" % ",".join(BENCH_STAGES),
+        default=BENCH_STAGES,
+    )
+    parser.add_argument(
+        "--repeat",
+        metavar="N",
+        type=int,
+        help="number of runs of every stage, the fastest is kept "
+        "(default: %d)" % DEFAULT_REPEAT,
+        default=DEFAULT_REPEAT,
+    )
+    parser.add_argument(
+        "-o", "--output", metavar="FILENAME", help="output the results (JSON)"
+    )
+    parser.add_argument(
+        "--baseline",
+        metavar="FILENAME",
+        help="compare the results with the results (JSON) of an earlier run",
+    )
+    parser.add_argument(
+        "--tolerance",
+        metavar="FRACTION",
+        type=float,
+        help="a stage slower than the baseline by more than FRACTION is a "
+        "regression (default: %g)" % DEFAULT_TOLERANCE,
+        default=DEFAULT_TOLERANCE,
+    )
+    parser.add_argument(
+        "-v",
+        "--verbose",
+        help="enable verbose mode, use -vv to enable debug mode",
+        action="count",
+        default=0,
+    )
+    args = parser.parse_args(argv)
+    setup_logging(args.verbose)
+
+    images = args.image
+    if images is None:
+        images = [FOURTEEN_BALLS] if os.path.exists(FOURTEEN_BALLS) else []
+
+    baseline = None
+    if args.baseline is not None:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    results = run_benchmarks(args.stages, list(args.sizes) + images, args.repeat)
+    regressions = []
+    if baseline is not None:
+        results, regressions = compare(results, baseline, args.tolerance)
+
+    for result in results:
+        print(format_result(result))
+
+    if args.output is not None:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(
+                {"environment": get_environment(), "results": results}, f, indent=2
+            )
+
+    if len(regressions) > 0:
+        print(
+            "%d regressions, slower than the baseline by more than %g%%"
+            % (len(regressions), 100 * args.tolerance)
+        )
+        return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(run())
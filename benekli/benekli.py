@@ -2,15 +2,23 @@
 #
 # SPDX-License-Identifier: GPL-3.0-or-later
 
-import argparse
-import importlib.metadata
-import io
+import concurrent.futures
+import contextlib
+import copy
+import functools
+import json
 import logging
-import sys
+import math
+import os
 from typing import Callable
 
-from PIL import features, Image, ImageCms
+import numpy as np
+from PIL import Image, ImageCms
 
+from . import cache, lut, parallel, stream, timings
+from .options import DE_PALETTE, DE_THRESHOLDS, CommandOptions, ProofError, err
+from .options import get_default_lut_cache_dir
+from .shaper import MatrixShaper, MatrixShaperTransform
 from .constants import PCS_illuminant_nXYZ
 from .formulas import ColorTriple
 from .formulas import nXYZ_to_PCSXYZ, PCSXYZ_to_nXYZ
@@ -18,67 +26,13 @@ from .formulas import XYZ_to_xyY, xyY_to_XYZ
 from .formulas import XYZ_to_Lab, Lab_to_XYZ
 from .formulas import Lab_to_LCh, LCh_to_Lab
 from .formulas import de76, de94_for_graphic_arts, de94_for_textiles, de2000
+from .lab8 import decode_Lab8
+from .stats import DeStatistics
+from .unique import get_unique_de
 
 logger = logging.getLogger(__name__)
 
 
-def err(s):
-    logger.error(s)
-    sys.exit(1)
-
-
-class CommandOptions:
-
-    def __init__(self):
-        self.bpc = False
-        self.de_formula = "cie76"
-        self.de_filename = None
-        self.display_profile_filename = None
-        self.gamut_check = False
-        self.input_filename = None
-        self.input_profile_filename = None
-        self.output_filename = None
-        self.rendering_intent = "p"
-        self.simulated_profile_filename = None
-
-    def load_from_args(self, args):
-        self.bpc = args.bpc
-        self.de_formula = args.de_formula
-        self.de_filename = args.output_de
-        self.display_profile_filename = args.display_profile
-        self.gamut_check = args.gamut_check
-        self.input_filename = args.input_image
-        self.input_profile_filename = args.input_profile
-        self.output_filename = args.output_image
-        self.rendering_intent = args.rendering_intent
-        self.simulated_profile_filename = args.simulated_profile
-
-    def get_color_difference_formula(self):
-        if self.de_formula == "cie76":
-            return de76
-
-        elif self.de_formula == "cie94":
-            return de94_for_graphic_arts
-
-        elif self.de_formula == "ciede2000":
-            return de2000
-
-        else:
-            err("invalid de_formula: %s" % self.de_formula)
-
-    def get_rendering_intent(self):
-        if self.rendering_intent == "p":
-            return ImageCms.Intent.PERCEPTUAL
-        elif self.rendering_intent == "s":
-            return ImageCms.Intent.SATURATION
-        elif self.rendering_intent == "r":
-            return ImageCms.Intent.RELATIVE_COLORIMETRIC
-        elif self.rendering_intent == "a":
-            return ImageCms.Intent.ABSOLUTE_COLORIMETRIC
-        else:
-            err("invalid rendering_intent: %s" % self.rendering_intent)
-
-
 def debug_profile(profile):
     logger.debug(profile.version)
     logger.debug(profile.device_class)
@@ -118,65 +72,790 @@ def debug_profile(profile):
     logger.debug(str(profile.chromatic_adaptation))
 
 
-def de_colorizer(de):
-    demin = 3.0
-    demax = 8.0
-    # green
-    if de <= 1.0:
-        return [0, 0xFF, 0]
+# number of colorizer LUT entries per 1.0 delta E
+DE_LUT_RESOLUTION = 100
 
-    # yellow
-    elif de <= 2.0:
-        return [0xFF, 0xFF, 0]
 
-    # orange
-    elif de <= demin:
-        return [0xFF, 0x45, 0]
+@functools.lru_cache(maxsize=8)
+def build_de_lut(thresholds=DE_THRESHOLDS, palette=DE_PALETTE):
+    """Build the delta E colorizer LUT, entry i is the color of i / resolution."""
+    if len(thresholds) < 2:
+        err("at least two delta E thresholds are required")
 
-    # red gradient from demin to demax
-    else:
-        if de > demax:
-            de = demax
-        start_at_red = 140
-        gradient = start_at_red - ((de - demin) / (demax - demin)) * start_at_red
-        return [0xFF, gradient, gradient]
+    if thresholds[0] < 0 or any(t2 <= t1 for t1, t2 in zip(thresholds, thresholds[1:])):
+        err("delta E thresholds must be positive and increasing")
 
+    if len(palette) != len(thresholds) + 1:
+        err(
+            "delta E palette must have %d colors for %d thresholds"
+            % (len(thresholds) + 1, len(thresholds))
+        )
 
-def create_de_image(
-    de_formula: Callable[[ColorTriple, ColorTriple], float], im1, im2
+    size = math.ceil(thresholds[-1] * DE_LUT_RESOLUTION) + 1
+    de = np.arange(size, dtype=np.float64) / DE_LUT_RESOLUTION
+    colors = np.asarray(palette, dtype=np.float64)
+    # index of the first threshold >= de
+    band = np.searchsorted(np.asarray(thresholds), de, side="left")
+    colors_lut = colors[np.minimum(band, len(thresholds) - 1)]
+    # gradient band
+    gradient_start = thresholds[-2]
+    gradient_end = thresholds[-1]
+    in_gradient = band >= len(thresholds) - 1
+    t = np.minimum(
+        (de[in_gradient] - gradient_start) / (gradient_end - gradient_start), 1.0
+    )
+    colors_lut[in_gradient] = colors[-2] + t[:, np.newaxis] * (colors[-1] - colors[-2])
+    # truncate like assigning a float to an uint8 array
+    return colors_lut.astype(np.uint8)
+
+
+def de_colorizer(de, thresholds=DE_THRESHOLDS, palette=DE_PALETTE):
+    """Map a delta E array to an RGB array with shape de.shape + (3,)."""
+    colors_lut = build_de_lut(tuple(thresholds), tuple(map(tuple, palette)))
+    index = np.multiply(de, DE_LUT_RESOLUTION, dtype=np.float64)
+    np.ceil(index, out=index)
+    np.clip(index, 0, len(colors_lut) - 1, out=index)
+    return colors_lut[index.astype(np.intp)]
+
+
+# number of pixels of which delta E is calculated at once, so the float delta E
+# and the temporaries of the formulas are not created for the whole image
+DE_CHUNK_SIZE = 1 << 16
+
+
+class FloatLab:
+    """The float32 Lab colors of an image, to_Lab converts its pixels to Lab
+    chunk by chunk, so the float Lab of the whole image is not kept in memory."""
+
+    def __init__(self, image, to_Lab: Callable[[np.ndarray], np.ndarray]):
+        self.image = image
+        self.size = image.size
+        self.pixels = np.asarray(image).reshape(-1, 3)
+        self.to_Lab = to_Lab
+
+    def get(self, start, end):
+        """Return the (n, 3) float32 Lab of the pixels start to end."""
+        return np.asarray(self.to_Lab(self.pixels[start:end]), dtype=np.float32)
+
+
+def float_Lab_transform(
+    transform: Callable[[object, Image.Image], Image.Image], shapers
 ):
-    """Create a color difference image between two Lab images."""
+    """Return transform(name, image) returning FloatLab instead of the Lab
+    images, converted by the MatrixShaper shapers[name] if it is given."""
+
+    def float_transform(name, image):
+        if name in shapers:
+            return FloatLab(image, shapers[name].to_Lab)
+
+        output_image = transform(name, image)
+        if output_image.mode == "LAB":
+            return FloatLab(output_image, decode_Lab8)
+
+        return output_image
+
+    return float_transform
+
+
+def iterate_de(de_formula: Callable[[np.ndarray, np.ndarray], np.ndarray], im1, im2):
+    """Yield the start pixel and the delta E of the chunks of two Lab images,
+    or of two FloatLab."""
+    assert im1.size == im2.size
+    if isinstance(im1, FloatLab):
+        assert isinstance(im2, FloatLab)
+        for start in range(0, len(im1.pixels), DE_CHUNK_SIZE):
+            end = start + DE_CHUNK_SIZE
+            yield start, de_formula(im1.get(start, end), im2.get(start, end))
+
+        return
+
     assert im1.mode == "LAB"
     assert im2.mode == "LAB"
     assert im1.size == im2.size
+
+    Lab1 = np.asarray(im1).reshape(-1, 3)
+    Lab2 = np.asarray(im2).reshape(-1, 3)
+    # once per unique pair of colors, unless there are too many
+    de_formula = get_unique_de(de_formula)
+    for start in range(0, len(Lab1), DE_CHUNK_SIZE):
+        end = start + DE_CHUNK_SIZE
+        yield start, de_formula(Lab1[start:end], Lab2[start:end])
+
+
+def create_de_image(
+    de_formula: Callable[[np.ndarray, np.ndarray], np.ndarray],
+    im1,
+    im2,
+    thresholds=DE_THRESHOLDS,
+    palette=DE_PALETTE,
+    statistics: DeStatistics = None,
+    processes=1,
+):
+    """Create a color difference image between two Lab images.
+
+    statistics is updated with the delta E if it is given. If processes > 1,
+    delta E is calculated in that many worker processes."""
     width, height = im1.size
-    
-    import numpy as np
-    out = np.zeros((height, width, 3), dtype=np.uint8)
-    
-    data1 = im1.getdata()
-    data2 = im2.getdata()
-    
-    for i in range(len(data1)):
-        Lab1 = data1[i]
-        Lab2 = data2[i]
-        de = de_formula(Lab1, Lab2)
-        
-        y = i // width
-        x = i % width
-        
-        out[y, x] = de_colorizer(de)
-        
-    return Image.fromarray(out, mode="RGB")
-
-
-def run_with_opts(opts: CommandOptions):
+    if use_processes(im1, im2, processes):
+        # check the thresholds and the palette in this process
+        build_de_lut(tuple(thresholds), tuple(map(tuple, palette)))
+        colors = parallel.process_de(
+            de_formula,
+            np.asarray(im1).reshape(-1, 3),
+            np.asarray(im2).reshape(-1, 3),
+            processes,
+            DE_CHUNK_SIZE,
+            functools.partial(de_colorizer, thresholds=thresholds, palette=palette),
+            statistics,
+        )
+
+    else:
+        colors = colorize_de(
+            iterate_de(de_formula, im1, im2),
+            width * height,
+            thresholds,
+            palette,
+            statistics,
+        )
+
+    return Image.fromarray(colors.reshape(height, width, 3), mode="RGB")
+
+
+def colorize_de(chunks, size, thresholds, palette, statistics: DeStatistics = None):
+    """Return the (size, 3) colors of the (start pixel, delta E) chunks."""
+    colors = np.empty((size, 3), dtype=np.uint8)
+    for start, de in chunks:
+        colors[start : start + len(de)] = de_colorizer(de, thresholds, palette)
+        if statistics is not None:
+            statistics.update(de)
+
+    return colors
+
+
+# grid step of the delta E LUTs, the same as the LUTs of the transforms, so
+# the delta E LUTs sampled with the cached LUTs of the transforms are sampled
+# at their exact grid points
+DE_LUT_GRID_STEP = lut.LUT_GRID_STEP
+
+
+def iterate_de_lut(de_lut, image):
+    """Yield the start pixel and the delta E of the chunks of an image,
+    interpolated in the delta E LUT of its colors."""
+    pixels = np.asarray(image).reshape(-1, 3)
+    for start in range(0, len(pixels), DE_CHUNK_SIZE):
+        yield start, lut.apply_scalar_lut(
+            de_lut, pixels[start : start + DE_CHUNK_SIZE], image.mode
+        )
+
+
+def create_de_image_with_lut(
+    de_lut,
+    image,
+    thresholds=DE_THRESHOLDS,
+    palette=DE_PALETTE,
+    statistics: DeStatistics = None,
+    colorize=True,
+):
+    """Create the color difference image of an image with its delta E LUT.
+
+    statistics is updated with the delta E if it is given. If colorize is
+    False, only statistics is updated and None is returned."""
+    width, height = image.size
+    if not colorize:
+        for _, de in iterate_de_lut(de_lut, image):
+            statistics.update(de)
+
+        return None
+
+    colors = colorize_de(
+        iterate_de_lut(de_lut, image), width * height, thresholds, palette, statistics
+    )
+    return Image.fromarray(colors.reshape(height, width, 3), mode="RGB")
+
+
+def calculate_de_statistics(
+    de_formula: Callable[[np.ndarray, np.ndarray], np.ndarray],
+    im1,
+    im2,
+    statistics: DeStatistics,
+    processes=1,
+):
+    """Update statistics with the delta E between two Lab images."""
+    if use_processes(im1, im2, processes):
+        parallel.process_de(
+            de_formula,
+            np.asarray(im1).reshape(-1, 3),
+            np.asarray(im2).reshape(-1, 3),
+            processes,
+            DE_CHUNK_SIZE,
+            statistics=statistics,
+        )
+
+    else:
+        for _, de in iterate_de(de_formula, im1, im2):
+            statistics.update(de)
+
+
+def use_processes(im1, im2, processes):
+    if isinstance(im1, FloatLab):
+        # the float Lab conversions are not sent to the workers
+        return False
+
+    assert im1.mode == "LAB"
+    assert im2.mode == "LAB"
+    assert im1.size == im2.size
+
+    # starting the workers and copying the pixels to the shared memory are
+    # not worth it for a single chunk
+    return processes > 1 and im1.size[0] * im1.size[1] > DE_CHUNK_SIZE
+
+
+def write_de_statistics(opts: CommandOptions, statistics: DeStatistics):
+    report = {
+        "input_image": opts.input_filename,
+        "simulated_profile": opts.simulated_profile_filename,
+        "rendering_intent": opts.rendering_intent,
+        "bpc": opts.bpc,
+        "de_formula": opts.de_formula,
+        "de_direct": opts.de_direct,
+        "de_float": opts.de_float,
+    }
+    report.update(statistics.to_dict())
+    with open(opts.de_stats_filename, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+        f.write("\n")
+
+
+# rendering intents of the sweep
+# black point compensation is not used with the absolute colorimetric intent
+SWEEP_RENDERING_INTENTS = ["p", "r", "s", "a"]
+
+
+def get_sweep_filename(filename, rendering_intent, bpc):
+    # e.g. out.tif -> out.p.bpc.tif, out.p.nobpc.tif, out.a.tif
+    if filename is None:
+        return None
+
+    root, extension = os.path.splitext(filename)
+    if rendering_intent == "a":
+        return "%s.%s%s" % (root, rendering_intent, extension)
+
+    return "%s.%s.%s%s" % (root, rendering_intent, "bpc" if bpc else "nobpc", extension)
+
+
+def get_sweep_variants(opts, simulated_profile=None):
+    """Return the options of all rendering intent and bpc variants.
+
+    The intents not supported by simulated_profile are skipped, all are
+    returned if it is None."""
+    variants = []
+    for rendering_intent in SWEEP_RENDERING_INTENTS:
+        for bpc in [False] if rendering_intent == "a" else [True, False]:
+            variant_opts = copy.copy(opts)
+            variant_opts.sweep = False
+            variant_opts.rendering_intent = rendering_intent
+            variant_opts.bpc = bpc
+            variant_opts.output_filename = get_sweep_filename(
+                opts.output_filename, rendering_intent, bpc
+            )
+            variant_opts.de_filename = get_sweep_filename(
+                opts.de_filename, rendering_intent, bpc
+            )
+            variant_opts.de_stats_filename = get_sweep_filename(
+                opts.de_stats_filename, rendering_intent, bpc
+            )
+            if simulated_profile is not None and not ImageCms.isIntentSupported(
+                simulated_profile,
+                variant_opts.get_rendering_intent(),
+                ImageCms.Direction.PROOF,
+            ):
+                logger.warning(
+                    "simulated profile does not support rendering intent %s, skipped"
+                    % rendering_intent
+                )
+                continue
+
+            variants.append(variant_opts)
+
+    return variants
+
+
+def open_cms_profile(filename, cms_profiles=None):
+    """Open an ICC profile, unless it is already opened in cms_profiles."""
+    if cms_profiles is not None and filename in cms_profiles:
+        return cms_profiles[filename]
+
+    return cache.get_profile(filename)
+
+
+def check_image_profile(mode, image_profile):
+    """Raise ProofError if image_profile is not a profile of the images of mode."""
+    if mode == "RGB" and image_profile.device_class != "mntr":
+        raise ProofError(
+            "input image is RGB and but image profile device class is not Display (mntr) but %s"
+            % image_profile.device_class
+        )
+
+    if mode == "RGB" and image_profile.xcolor_space.strip() != "RGB":
+        raise ProofError("input image is RGB but the profile xcolor space is not RGB")
+
+    if mode == "LAB" and image_profile.xcolor_space.strip() != "Lab":
+        raise ProofError("input image is Lab but the profile xcolor space is not Lab")
+
+
+def check_simulated_profile(simulated_profile, rendering_intent=None):
+    """Raise ProofError if simulated_profile is not an RGB printer profile, or
+    if it does not support rendering_intent when it is given."""
+    if simulated_profile.device_class != "prtr":
+        raise ProofError("simulated profile class is not Output (prtr)")
+
+    if simulated_profile.xcolor_space.strip() != "RGB":
+        raise ProofError("simulated profile xcolor space is not RGB")
+
+    if rendering_intent is not None and not ImageCms.isIntentSupported(
+        simulated_profile, rendering_intent, ImageCms.Direction.PROOF
+    ):
+        raise ProofError(
+            "simulated profile does not support requested rendering intent"
+        )
+
+
+def check_display_profile(display_profile):
+    """Raise ProofError if the proofs cannot be shown with display_profile."""
+    if not ImageCms.isIntentSupported(
+        display_profile,
+        ImageCms.Intent.ABSOLUTE_COLORIMETRIC,
+        ImageCms.Direction.OUTPUT,
+    ):
+        raise ProofError(
+            "display profile does not support Absolute Colorimetric intent"
+        )
+
+
+def open_profiles(opts: CommandOptions, input_image, cms_profiles=None):
+    """Open and check the input image, simulated and display profiles."""
+    lab_cms_profile = cache.get_built_profile("LAB")
+
+    image_cms_profile = None
+    if opts.input_profile_filename is None:
+        if "icc_profile" in input_image.info:
+            logger.info("using the embedded profile in %s" % opts.input_filename)
+            image_cms_profile = cache.get_profile_from_bytes(
+                input_image.info["icc_profile"]
+            )
+            if image_cms_profile is None:
+                err("cannot open embedded input profile in %s" % opts.input_filename)
+
+        elif input_image.mode == "LAB":
+            # if there is no embedded profile, but the image is in Lab space
+            # then built-in/standard/abstract Lab profile can be used
+            # since it is an identity transform only
+            image_cms_profile = lab_cms_profile
+            assert image_cms_profile is not None
+
+        else:
+            err("image is RGB and does not have an embedded profile")
+
+    else:
+        logger.info("using the given profile %s" % opts.input_profile_filename)
+        image_cms_profile = open_cms_profile(opts.input_profile_filename, cms_profiles)
+        if image_cms_profile is None:
+            err("cannot open given input profile %s" % opts.input_profile_filename)
+
+    image_profile = image_cms_profile.profile
+    logger.debug("--- image profile starts ---")
+    debug_profile(image_profile)
+    logger.debug("--- image profile ends ---")
+    logger.info("image profile: %s" % image_profile.profile_description.strip())
+
+    try:
+        check_image_profile(input_image.mode, image_profile)
+
+    except ProofError as e:
+        err(str(e))
+
+    image_white_point_nXYZ = image_profile.media_white_point[0]
+    logger.debug("image white point: %s" % str(image_white_point_nXYZ))
+
+    simulated_cms_profile = open_cms_profile(
+        opts.simulated_profile_filename, cms_profiles
+    )
+    if simulated_cms_profile is None:
+        err("cannot open simulated profile %s" % opts.simulated_profile_filename)
+
+    simulated_profile = simulated_cms_profile.profile
+
+    logger.debug("--- simulated profile starts ---")
+    debug_profile(simulated_profile)
+    logger.debug("--- simulated profile ends ---")
+    logger.info("simulated profile: %s" % simulated_profile.profile_description.strip())
+
+    try:
+        # the sweep skips the intents that are not supported
+        check_simulated_profile(
+            simulated_profile, None if opts.sweep else opts.get_rendering_intent()
+        )
+
+    except ProofError as e:
+        err(str(e))
+
+    simulated_white_point_nXYZ = simulated_profile.media_white_point[0]
+    logger.debug("simulated white point: %s" % str(simulated_white_point_nXYZ))
+
+    display_cms_profile = None
+    if not opts.needs_display_profile():
+        return image_cms_profile, simulated_cms_profile, display_cms_profile
+
+    if opts.display_profile_filename is None:
+        display_cms_profile = ImageCms.get_display_profile()
+        if display_cms_profile is None:
+            err(
+                "cannot fetch the profile of the current display device, please provide it explicitly"
+            )
+
+    else:
+        display_cms_profile = open_cms_profile(
+            opts.display_profile_filename, cms_profiles
+        )
+        if display_cms_profile is None:
+            err("cannot open display profile %s" % opts.display_profile_filename)
+
+    display_profile = display_cms_profile.profile
+
+    logger.debug("--- display profile starts ---")
+    debug_profile(display_profile)
+    logger.debug("--- display profile ends ---")
+    logger.info("display profile: %s" % display_profile.profile_description.strip())
+
+    try:
+        check_display_profile(display_profile)
+
+    except ProofError as e:
+        err(str(e))
+
+    return image_cms_profile, simulated_cms_profile, display_cms_profile
+
+
+def read_profile_bytes(filename):
+    try:
+        with open(filename, "rb") as f:
+            return f.read()
+
+    except OSError:
+        # open_profiles reports the error
+        return None
+
+
+def read_profile_key(filename):
+    data = read_profile_bytes(filename)
+    if data is None:
+        return None
+
+    return cache.get_profile_key_from_bytes(data)
+
+
+def get_Lab_shapers(opts: CommandOptions, input_image):
+    """Return the MatrixShapers of the matrix/TRC input and display profiles,
+    which convert to float Lab instead of the input_Lab and output_Lab
+    transforms."""
+    shapers = {}
+    if input_image.mode != "LAB":
+        if opts.input_profile_filename is not None:
+            data = read_profile_bytes(opts.input_profile_filename)
+
+        else:
+            data = input_image.info.get("icc_profile")
+
+        shapers["input_Lab"] = MatrixShaper.from_bytes(data)
+
+    if not opts.de_direct:
+        if opts.display_profile_filename is not None:
+            data = read_profile_bytes(opts.display_profile_filename)
+
+        else:
+            data = None
+            display_cms_profile = ImageCms.get_display_profile()
+            if display_cms_profile is not None:
+                data = display_cms_profile.tobytes()
+
+        shapers["output_Lab"] = MatrixShaper.from_bytes(data)
+
+    for name, shaper in list(shapers.items()):
+        if shaper is None:
+            logger.info("%s is not matrix/TRC, its Lab is 8-bit" % name)
+            del shapers[name]
+
+    return shapers
+
+
+def get_profile_keys(opts: CommandOptions, input_image):
+    """Return the keys of the input, simulated and display profiles, or None if
+    they are unknown.
+
+    The keys are created from the profile bytes, without parsing the profiles.
+    The display key is None if opts does not need the display profile."""
+    if opts.input_profile_filename is not None:
+        input_key = read_profile_key(opts.input_profile_filename)
+
+    elif "icc_profile" in input_image.info:
+        input_key = cache.get_profile_key_from_bytes(input_image.info["icc_profile"])
+
+    elif input_image.mode == "LAB":
+        input_key = cache.get_profile_key(cache.get_built_profile("LAB"))
+
+    else:
+        input_key = None
+
+    simulated_key = read_profile_key(opts.simulated_profile_filename)
+    if None in (input_key, simulated_key):
+        return None
+
+    display_key = None
+    if opts.needs_display_profile():
+        # the profile of the active display is not cached, it can change anytime
+        if opts.display_profile_filename is None:
+            return None
+
+        display_key = read_profile_key(opts.display_profile_filename)
+        if display_key is None:
+            return None
+
+    return input_key, simulated_key, display_key
+
+
+def get_lut_keys(opts: CommandOptions, input_image, variants):
+    """Return the LUT cache keys of the transforms, or None if they are unknown.
+
+    The keys are created from the profile bytes, without parsing the profiles."""
+    profile_keys = get_profile_keys(opts, input_image)
+    if profile_keys is None:
+        return None
+
+    input_key, simulated_key, display_key = profile_keys
+    lut_keys = {}
+    for variant_opts in variants:
+        if opts.de_direct and opts.needs_de():
+            lut_keys[get_proof_transform_name(variant_opts, "LAB")] = lut.get_lut_key(
+                "proof",
+                input_key,
+                simulated_key,
+                "Lab",
+                input_image.mode,
+                variant_opts.rendering_intent,
+                variant_opts.bpc,
+                lut.LUT_GRID_STEP,
+            )
+
+        if not opts.needs_display_profile():
+            continue
+
+        lut_keys[get_proof_transform_name(variant_opts)] = lut.get_lut_key(
+            "proof",
+            input_key,
+            simulated_key,
+            display_key,
+            input_image.mode,
+            variant_opts.rendering_intent,
+            variant_opts.bpc,
+            lut.LUT_GRID_STEP,
+        )
+
+    if opts.needs_de():
+        if input_image.mode != "LAB":
+            lut_keys["input_Lab"] = lut.get_lut_key(
+                "Lab", input_key, input_image.mode, lut.LUT_GRID_STEP
+            )
+
+        if not opts.de_direct:
+            lut_keys["output_Lab"] = lut.get_lut_key(
+                "Lab", display_key, "RGB", lut.LUT_GRID_STEP
+            )
+
+    return lut_keys
+
+
+def get_de_lut_keys(opts: CommandOptions, input_image, variants):
+    """Return the LUT cache keys of the delta E LUTs of the variants, or None
+    if they are unknown."""
+    if opts.de_direct:
+        # the display is not used
+        opts = copy.copy(opts)
+        opts.output_filename = None
+
+    profile_keys = get_profile_keys(opts, input_image)
+    if profile_keys is None:
+        return None
+
+    input_key, simulated_key, display_key = profile_keys
+    de_lut_keys = {}
+    for variant_opts in variants:
+        de_lut_keys[get_de_lut_name(variant_opts)] = lut.get_lut_key(
+            "de",
+            input_key,
+            simulated_key,
+            display_key,
+            input_image.mode,
+            variant_opts.rendering_intent,
+            variant_opts.bpc,
+            opts.de_formula,
+            opts.de_float,
+            DE_LUT_GRID_STEP,
+        )
+
+    return de_lut_keys
+
+
+def get_de_lut_name(opts: CommandOptions):
+    return ("de", opts.rendering_intent, opts.bpc)
+
+
+def get_proof_transform_name(opts: CommandOptions, out_mode="RGB"):
+    return ("proof", out_mode, opts.rendering_intent, opts.bpc)
+
+
+def build_transforms(
+    opts: CommandOptions,
+    input_image,
+    variants,
+    image_cms_profile,
+    simulated_cms_profile,
+    display_cms_profile,
+    de=None,
+):
+    """Return the LittleCMS transforms of the variants and of delta E.
+
+    The delta E transforms are built if de is True, or if opts.needs_de() when
+    de is None."""
+    if de is None:
+        de = opts.needs_de()
+
+    transforms = {}
+    lab_cms_profile = cache.get_built_profile("LAB")
+    for variant_opts in variants:
+        if opts.de_direct and de:
+            # image -> simulated -> Lab, without the gamut check alarm color
+            # since it is not a simulated color
+            name = get_proof_transform_name(variant_opts, "LAB")
+            transforms[name] = cache.get_proof_transform(
+                image_cms_profile,
+                lab_cms_profile,
+                simulated_cms_profile,
+                input_image.mode,
+                "LAB",
+                ImageCms.Intent.ABSOLUTE_COLORIMETRIC,
+                variant_opts.get_rendering_intent(),
+                variant_opts.get_proof_flags(gamut_check=False),
+            )
+
+        if opts.needs_display_profile():
+            name = get_proof_transform_name(variant_opts)
+            transforms[name] = cache.get_proof_transform(
+                image_cms_profile,
+                display_cms_profile,
+                simulated_cms_profile,
+                input_image.mode,
+                "RGB",
+                ImageCms.Intent.ABSOLUTE_COLORIMETRIC,
+                variant_opts.get_rendering_intent(),
+                variant_opts.get_proof_flags(),
+            )
+
+    if de:
+        if input_image.mode != "LAB":
+            transforms["input_Lab"] = get_Lab_transform(image_cms_profile)
+
+        if not opts.de_direct:
+            transforms["output_Lab"] = get_Lab_transform(display_cms_profile)
+
+    return transforms
+
+
+def get_Lab_transform(cms_profile):
+    """Return the transform of the RGB images of cms_profile to Lab.
+
+    The matrix/TRC profiles are converted in NumPy, see shaper.py."""
+    matrix_shaper = cache.get_matrix_shaper(cms_profile)
+    if matrix_shaper is not None:
+        return MatrixShaperTransform(matrix_shaper)
+
+    return cache.get_transform(
+        cms_profile,
+        cache.get_built_profile("LAB"),
+        "RGB",
+        "LAB",
+        ImageCms.Intent.PERCEPTUAL,
+        0,
+    )
+
+
+# an image is not split into bands smaller than this (pixels)
+MIN_BAND_SIZE = 1 << 16
+
+
+def apply_in_bands(transform: Callable[[Image.Image], Image.Image], image, threads):
+    """Apply transform to horizontal bands of image in threads, return the
+    bands stitched together.
+
+    The transforms work pixel by pixel, and LittleCMS and NumPy release the
+    GIL, so the output is the same as transform(image) but created in
+    parallel."""
+    width, height = image.size
+    bands = min(threads, height, width * height // MIN_BAND_SIZE)
+    if bands <= 1:
+        return transform(image)
+
+    boxes = []
+    for i in range(bands):
+        boxes.append((0, height * i // bands, width, height * (i + 1) // bands))
+
+    def transform_band(box):
+        return transform(image.crop(box))
+
+    output_image = None
+    with concurrent.futures.ThreadPoolExecutor(bands) as executor:
+        for box, output_band in zip(boxes, executor.map(transform_band, boxes)):
+            if output_image is None:
+                output_image = Image.new(output_band.mode, image.size)
+                output_image.info = output_band.info.copy()
+
+            output_image.paste(output_band, box)
+
+    return output_image
+
+
+def run(argv=None):
+    """Run the command line, benekli.benekli:run was the entry point before
+    it moved to cli.py, see cli.run."""
+    # imported when it is called, like cli.py imports this module
+    from .cli import run as cli_run
+
+    return cli_run(argv)
+
+
+def run_with_opts(opts: CommandOptions, cms_profiles=None):
+    """Run with opts, cms_profiles can map profile filenames to opened profiles.
+
+    The stages of the run are timed, see timings.py, and the record of the run
+    is appended to opts.timings_filename if it is given."""
+    opts = copy.copy(opts)
+    opts.timings = timings.Timings(
+        input=opts.input_filename, simulated_profile=opts.simulated_profile_filename
+    )
+    try:
+        with timings.profile(opts.cprofile_filename, opts.tracemalloc_filename):
+            with opts.timings.run():
+                _run_with_opts(opts, cms_profiles)
+
+    finally:
+        if opts.timings_filename is not None:
+            timings.write_record(opts.timings_filename, opts.timings.record)
+
+
+def _run_with_opts(opts: CommandOptions, cms_profiles=None):
     with Image.open(opts.input_filename) as input_image:
         if input_image is None:
             err("cannot open input image %s" % opts.input_filename)
 
-        lab_profile = ImageCms.createProfile("LAB")
-
         if input_image.mode == "LAB":
             logger.info("input image is Lab")
 
@@ -186,290 +865,549 @@ def run_with_opts(opts: CommandOptions):
         else:
             err("input image is neither RGB nor Lab")
 
-        image_cms_profile = None
-        if opts.input_profile_filename is None:
-            if "icc_profile" in input_image.info:
-                logger.info("using the embedded profile in %s" % opts.input_filename)
-                image_cms_profile = ImageCms.ImageCmsProfile(
-                    io.BytesIO(input_image.info["icc_profile"])
-                )
-                if image_cms_profile is None:
-                    err(
-                        "cannot open embedded input profile in %s" % opts.input_filename
+        if opts.needs_de() and opts.de_float and opts.de_processes > 1:
+            # see use_processes
+            logger.warning(
+                "--de-processes is not used with --de-float, the float Lab is "
+                "not sent to the worker processes"
+            )
+
+        if opts.sweep:
+            variants = get_sweep_variants(opts)
+
+        else:
+            variants = [opts]
+
+        de_lut_cache = None
+        de_lut_keys = None
+        de_luts = None
+        if opts.de_lut and opts.needs_de():
+            if opts.gamut_check and not opts.de_direct:
+                # the alarm color of the out of gamut pixels is not a
+                # simulated color, delta E cannot be interpolated
+                logger.info("delta E LUT is not used with gamut check")
+
+            else:
+                de_lut_keys = get_de_lut_keys(opts, input_image, variants)
+                if de_lut_keys is None:
+                    logger.info("delta E LUT is not used without a display profile")
+
+                else:
+                    de_lut_cache = lut.LUTCache(
+                        opts.lut_cache_dir or get_default_lut_cache_dir()
                     )
+                    with timings.stage(opts.timings, "de_lut_load"):
+                        de_luts = {
+                            name: de_lut_cache.load(key, np.float32, 1)
+                            for name, key in de_lut_keys.items()
+                        }
+
+        # with all delta E LUTs in the cache, the transforms are only needed
+        # for the proof
+        needs_transforms = opts.output_filename is not None or (
+            opts.needs_de()
+            and (de_luts is None or any(de_lut is None for de_lut in de_luts.values()))
+        )
 
-            elif input_image.mode == "LAB":
-                # if there is no embedded profile, but the image is in Lab space
-                # then built-in/standard/abstract Lab profile can be used
-                # since it is an identity transform only
-                image_cms_profile = ImageCms.ImageCmsProfile(lab_profile)
-                assert image_cms_profile is not None
+        lut_cache = None
+        lut_keys = None
+        luts = None
+        transforms = {}
+        if opts.lut_cache_dir is not None and needs_transforms:
+            if opts.gamut_check:
+                # out of gamut colors are replaced by the alarm color, a LUT
+                # would interpolate between them and the in gamut colors
+                logger.info("LUT cache is not used with gamut check")
 
             else:
-                err("image is RGB and does not have an embedded profile")
+                lut_keys = get_lut_keys(opts, input_image, variants)
+                if lut_keys is None:
+                    logger.info("LUT cache is not used without a display profile")
+
+                else:
+                    lut_cache = lut.LUTCache(opts.lut_cache_dir)
+                    with timings.stage(opts.timings, "lut_load"):
+                        luts = {
+                            name: lut_cache.load(key) for name, key in lut_keys.items()
+                        }
+
+                    if any(lut_array is None for lut_array in luts.values()):
+                        luts = None
+
+                    else:
+                        logger.info("using the cached LUTs, profiles are not opened")
+
+        display_icc_profile = None
+        if luts is None and needs_transforms:
+            with timings.stage(opts.timings, "open_profiles"):
+                image_cms_profile, simulated_cms_profile, display_cms_profile = (
+                    open_profiles(opts, input_image, cms_profiles)
+                )
 
-        else:
-            logger.info("using the given profile %s" % opts.input_profile_filename)
-            image_cms_profile = ImageCms.ImageCmsProfile(opts.input_profile_filename)
-            if image_cms_profile is None:
-                err("cannot open given input profile %s" % opts.input_profile_filename)
+            if opts.sweep:
+                variants = get_sweep_variants(opts, simulated_cms_profile.profile)
 
-        image_profile = image_cms_profile.profile
-        logger.debug("--- image profile starts ---")
-        debug_profile(image_profile)
-        logger.debug("--- image profile ends ---")
-        logger.info("image profile: %s" % image_profile.profile_description.strip())
+            with timings.stage(opts.timings, "build_transforms"):
+                transforms = build_transforms(
+                    opts,
+                    input_image,
+                    variants,
+                    image_cms_profile,
+                    simulated_cms_profile,
+                    display_cms_profile,
+                )
 
-        if input_image.mode == "RGB" and image_profile.device_class != "mntr":
-            err(
-                "input image is RGB and but image profile device class is not Display (mntr) but %s"
-                % image_profile.device_class
+            if lut_cache is not None:
+                luts = {}
+                with timings.stage(opts.timings, "lut_sample"):
+                    for name, cms_transform in transforms.items():
+                        luts[name] = lut.sample_transform(
+                            cms_transform, cms_transform.input_mode
+                        )
+                        lut_cache.save(lut_keys[name], luts[name])
+
+        if luts is not None and opts.needs_display_profile():
+            # embed the display profile to the proof like ImageCmsTransform
+            with open(opts.display_profile_filename, "rb") as f:
+                display_icc_profile = f.read()
+
+        def transform_band(name, image):
+            if luts is None:
+                return transforms[name].point(image)
+
+            if name[0] == "proof" and name[1] == "RGB":
+                return lut.apply_lut_to_image(
+                    luts[name], image, "RGB", display_icc_profile
+                )
+
+            return lut.apply_lut_to_image(luts[name], image, "LAB")
+
+        def transform(name, image):
+            return apply_in_bands(
+                functools.partial(transform_band, name), image, opts.threads
             )
 
-        if input_image.mode == "RGB" and image_profile.xcolor_space.strip() != "RGB":
-            err("input image is RGB but the profile xcolor space is not RGB")
+        if opts.de_float and opts.needs_de():
+            transform = float_Lab_transform(
+                transform, get_Lab_shapers(opts, input_image)
+            )
 
-        if input_image.mode == "LAB" and image_profile.xcolor_space.strip() != "Lab":
-            err("input image is Lab but the profile xcolor space is not Lab")
+        if de_luts is not None:
+            for variant_opts in variants:
+                name = get_de_lut_name(variant_opts)
+                if de_luts.get(name) is None:
+                    logger.info("sampling the delta E LUT of %s" % (name,))
+                    with timings.stage(opts.timings, "de_lut_sample"):
+                        de_luts[name] = sample_de_lut(
+                            variant_opts, input_image.mode, transform
+                        )
+                        de_lut_cache.save(de_lut_keys[name], de_luts[name])
+
+        if opts.memory_budget is not None:
+            # the stages of the strips are too short to time one by one
+            with timings.stage(opts.timings, "strips"):
+                proof_in_strips(opts, input_image, variants, transform, de_luts)
+
+            return
+
+        # decode the input image and convert it to Lab only once for all variants
+        with timings.stage(opts.timings, "decode"):
+            input_image.load()
+
+        input_image_Lab = None
+        if opts.needs_de() and de_luts is None:
+            with timings.stage(opts.timings, "input_Lab"):
+                input_image_Lab = get_input_Lab(opts, input_image, transform)
+
+        def proof(variant_opts):
+            de_lut = None
+            if de_luts is not None:
+                de_lut = de_luts[get_de_lut_name(variant_opts)]
+
+            proof_with_opts(
+                variant_opts, input_image, input_image_Lab, transform, de_lut
+            )
 
-        image_white_point_nXYZ = image_profile.media_white_point[0]
-        logger.debug("image white point: %s" % str(image_white_point_nXYZ))
+        if opts.sweep_threads > 1 and len(variants) > 1:
+            with concurrent.futures.ThreadPoolExecutor(opts.sweep_threads) as executor:
+                # list to wait for all and raise the exceptions
+                list(executor.map(proof, variants))
 
-        simulated_cms_profile = ImageCms.ImageCmsProfile(
-            opts.simulated_profile_filename
-        )
-        if simulated_cms_profile is None:
-            err("cannot open simulated profile %s" % opts.simulated_profile_filename)
+        else:
+            for variant_opts in variants:
+                proof(variant_opts)
 
-        simulated_profile = simulated_cms_profile.profile
 
-        logger.debug("--- simulated profile starts ---")
-        debug_profile(simulated_profile)
-        logger.debug("--- simulated profile ends ---")
-        logger.info(
-            "simulated profile: %s" % simulated_profile.profile_description.strip()
-        )
+def get_input_Lab(
+    opts: CommandOptions,
+    input_image,
+    transform: Callable[[object, Image.Image], Image.Image],
+):
+    """Return the input colors in Lab."""
+    if input_image.mode != "LAB":
+        return transform("input_Lab", input_image)
 
-        if simulated_profile.device_class != "prtr":
-            err("simulated profile class is not Output (prtr)")
+    if opts.de_float:
+        return FloatLab(input_image, decode_Lab8)
 
-        if simulated_profile.xcolor_space.strip() != "RGB":
-            err("simulated profile xcolor space is not RGB")
+    return input_image
 
-        if not ImageCms.isIntentSupported(
-            simulated_profile, opts.get_rendering_intent(), ImageCms.Direction.PROOF
-        ):
-            err("simulated profile does not support requested rendering intent")
 
-        simulated_white_point_nXYZ = simulated_profile.media_white_point[0]
-        logger.debug("simulated white point: %s" % str(simulated_white_point_nXYZ))
+def get_proof_Lab(
+    opts: CommandOptions,
+    input_image,
+    transform: Callable[[object, Image.Image], Image.Image],
+    output_image=None,
+):
+    """Return the simulated colors in Lab, output_image is the proof if created."""
+    if opts.de_direct:
+        # simulated colors in Lab, without the display
+        return transform(get_proof_transform_name(opts, "LAB"), input_image)
 
-        display_cms_profile = None
-        if opts.display_profile_filename is None:
-            display_cms_profile = ImageCms.get_display_profile()
-            if display_cms_profile is None:
-                err(
-                    "cannot fetch the profile of the current display device, please provide it explicitly"
-                )
+    # convert output image to Lab
+    if output_image is None:
+        output_image = transform(get_proof_transform_name(opts), input_image)
 
-        else:
-            display_cms_profile = ImageCms.ImageCmsProfile(
-                opts.display_profile_filename
-            )
-            if display_cms_profile is None:
-                err("cannot open display profile %s" % opts.display_profile_filename)
-
-        display_profile = display_cms_profile.profile
-
-        logger.debug("--- display profile starts ---")
-        debug_profile(display_profile)
-        logger.debug("--- display profile ends ---")
-        logger.info("display profile: %s" % display_profile.profile_description.strip())
-
-        if not ImageCms.isIntentSupported(
-            display_profile,
-            ImageCms.Intent.ABSOLUTE_COLORIMETRIC,
-            ImageCms.Direction.OUTPUT,
-        ):
-            err("display profile does not support Absolute Colorimetric intent")
-
-        cms_transform = ImageCms.buildProofTransform(
-            inputProfile=image_profile,
-            outputProfile=display_profile,
-            proofProfile=simulated_profile,
-            inMode=input_image.mode,
-            outMode="RGB",
-            renderingIntent=ImageCms.Intent.ABSOLUTE_COLORIMETRIC,
-            proofRenderingIntent=opts.get_rendering_intent(),
-            flags=(
-                (ImageCms.Flags.SOFTPROOFING) |
-                (ImageCms.Flags.BLACKPOINTCOMPENSATION if opts.bpc else 0) |
-                (ImageCms.Flags.GAMUTCHECK if opts.gamut_check else 0)
-            ),
-        )
+    return transform("output_Lab", output_image)
 
-        output_image = cms_transform.point(input_image)
-        
-        if opts.output_filename is not None:
+
+def sample_de_lut(
+    opts: CommandOptions,
+    input_mode,
+    transform: Callable[[object, Image.Image], Image.Image],
+):
+    """Return the delta E LUT of a variant, the float32 delta E of the grid
+    points of the input color space with the shape (N, N, N, 1)."""
+    n = lut.get_grid_size(DE_LUT_GRID_STEP)
+    grid_image = lut.get_grid_image(input_mode, DE_LUT_GRID_STEP)
+    de = np.empty(n * n * n, dtype=np.float32)
+    for start, chunk_de in iterate_de(
+        opts.get_color_difference_formula(),
+        get_input_Lab(opts, grid_image, transform),
+        get_proof_Lab(opts, grid_image, transform),
+    ):
+        de[start : start + len(chunk_de)] = chunk_de
+
+    return de.reshape(n, n, n, 1)
+
+
+def proof_with_opts(
+    opts: CommandOptions,
+    input_image,
+    input_image_Lab,
+    transform: Callable[[object, Image.Image], Image.Image],
+    de_lut=None,
+):
+    """Create and save the soft proof and the delta E images of a variant.
+
+    transform(name, image) applies the transform name of build_transforms. If
+    de_lut is given, delta E is interpolated in it and input_image_Lab is not
+    used."""
+    variant = {"rendering_intent": opts.rendering_intent, "bpc": opts.bpc}
+    output_image = None
+    if opts.output_filename is not None:
+        with timings.stage(opts.timings, "proof", **variant):
+            output_image = transform(get_proof_transform_name(opts), input_image)
+
+        with timings.stage(opts.timings, "proof_save", **variant):
             output_image.save(
-                opts.output_filename, 
+                opts.output_filename,
                 description="benekli soft proof image",
                 compression="tiff_lzw",
-                keep_rgb=True)
-            print("soft proof generated: %s" % opts.output_filename)
+                keep_rgb=True,
+            )
 
-        # de requested ?
-        if opts.de_filename is not None:
-            # convert input image to Lab if required
-            if input_image.mode == "LAB":
-                input_image_Lab = input_image
+        print("soft proof generated: %s" % opts.output_filename)
 
-            else:
-                input_image_Lab = ImageCms.applyTransform(
+    # de requested ?
+    if opts.needs_de():
+        statistics = None
+        if opts.de_stats_filename is not None:
+            statistics = DeStatistics()
+
+        if de_lut is not None:
+            # delta E of the input colors, without converting them to Lab
+            with timings.stage(opts.timings, "de_lut", **variant):
+                de_image = create_de_image_with_lut(
+                    de_lut,
                     input_image,
-                    ImageCms.buildTransform(
-                        image_profile, lab_profile, input_image.mode, "LAB"
-                    ),
+                    opts.de_thresholds,
+                    opts.de_palette,
+                    statistics,
+                    opts.de_filename is not None,
                 )
 
-            # convert output image to Lab
-            output_image_Lab = ImageCms.applyTransform(
-                output_image,
-                ImageCms.buildTransform(
-                    ImageCms.ImageCmsProfile(
-                        io.BytesIO(output_image.info["icc_profile"])
-                    ),
-                    lab_profile,
-                    output_image.mode,
-                    "LAB",
-                ),
-            )
-            # calculate and create color difference (delta e) image
-            de_image = create_de_image(
-                opts.get_color_difference_formula(), input_image_Lab, output_image_Lab
-            )
+        else:
+            with timings.stage(opts.timings, "proof_Lab", **variant):
+                output_image_Lab = get_proof_Lab(
+                    opts, input_image, transform, output_image
+                )
+
+            de_image = None
+            if opts.de_filename is not None:
+                # calculate and create color difference (delta e) image
+                with timings.stage(opts.timings, "de_image", **variant):
+                    de_image = create_de_image(
+                        opts.get_color_difference_formula(),
+                        input_image_Lab,
+                        output_image_Lab,
+                        opts.de_thresholds,
+                        opts.de_palette,
+                        statistics,
+                        opts.de_processes,
+                    )
+
+            else:
+                with timings.stage(opts.timings, "de_statistics", **variant):
+                    calculate_de_statistics(
+                        opts.get_color_difference_formula(),
+                        input_image_Lab,
+                        output_image_Lab,
+                        statistics,
+                        opts.de_processes,
+                    )
+
+        if de_image is not None:
             # save color difference (delta e) image
             # create_de_image creates an RGB image, embed an sRGB profile
             # set keep_rgb so when saving JPG, it is not saved as YCbCr
-            de_image.save(
+            with timings.stage(opts.timings, "de_save", **variant):
+                de_image.save(
+                    opts.de_filename,
+                    description="benekli delta E color difference image",
+                    compression="tiff_lzw",
+                    keep_rgb=True,
+                    icc_profile=cache.get_built_profile("sRGB").tobytes(),
+                )
+
+            print("deltaE output generated: %s" % opts.de_filename)
+
+        if statistics is not None:
+            write_de_statistics(opts, statistics)
+            print("deltaE statistics generated: %s" % opts.de_stats_filename)
+
+
+# memory used by a strip per pixel, the input and its Lab, and the proof, its
+# Lab and the delta E image of each variant proofed at the same time, the
+# LittleCMS and the LUT transforms create a new image for their output
+STRIP_INPUT_BYTES_PER_PIXEL = 2 * 3
+STRIP_VARIANT_BYTES_PER_PIXEL = 4 * 3
+# the bands of apply_in_bands with more than one thread, the crops of the
+# input and the output bands of a transform before they are stitched
+STRIP_BAND_BYTES_PER_PIXEL = 2 * 3
+# the float64 temporaries of the delta E formulas, per pixel of a chunk
+DE_BYTES_PER_PIXEL = 256
+
+
+def get_strip_memory(width, rows, concurrency, threads=1):
+    """Return the memory used to proof strips of rows in concurrency threads,
+    the transforms are applied in bands in threads threads."""
+    variant_bytes_per_pixel = STRIP_VARIANT_BYTES_PER_PIXEL
+    if threads > 1:
+        variant_bytes_per_pixel = variant_bytes_per_pixel + STRIP_BAND_BYTES_PER_PIXEL
+
+    return (
+        width
+        * rows
+        * (STRIP_INPUT_BYTES_PER_PIXEL + concurrency * variant_bytes_per_pixel)
+        + concurrency * DE_CHUNK_SIZE * DE_BYTES_PER_PIXEL
+        + concurrency * 2 * stream.TIFF_STRIP_SIZE
+    )
+
+
+def get_strip_rows(opts: CommandOptions, width, concurrency, image_memory=0):
+    """Return the number of rows of a strip that fits in the memory budget,
+    image_memory is the memory of the input image if it is decoded as a
+    whole."""
+    fixed_memory = get_strip_memory(width, 0, concurrency, opts.threads)
+    row_memory = get_strip_memory(width, 1, concurrency, opts.threads) - fixed_memory
+    fixed_memory = fixed_memory + image_memory
+    rows = (opts.memory_budget - fixed_memory) // row_memory
+    if rows < 1:
+        err(
+            "memory budget is too small for the image, at least %d MB is needed%s"
+            % (
+                math.ceil((fixed_memory + row_memory) / (1024 * 1024)),
+                (
+                    ", the input image is compressed and decoded as a whole, "
+                    "an uncompressed TIFF is read strip by strip"
+                    if image_memory > 0
+                    else ""
+                ),
+            )
+        )
+
+    return rows
+
+
+class StripProof:
+    """The soft proof, the delta E image and statistics of a variant, created
+    strip by strip, delta E is interpolated in de_lut if it is given."""
+
+    def __init__(self, opts: CommandOptions, width, height, de_lut=None):
+        self.opts = opts
+        self.de_lut = de_lut
+        self.proof_writer = None
+        self.de_writer = None
+        self.statistics = None
+        self.icc_profile = None
+        if opts.output_filename is not None:
+            self.proof_writer = stream.TiffStripWriter(
+                opts.output_filename, width, height, "benekli soft proof image"
+            )
+
+        if opts.de_filename is not None:
+            self.de_writer = stream.TiffStripWriter(
                 opts.de_filename,
-                description="benekli delta E color difference image",
-                compression="tiff_lzw",
-                keep_rgb=True,
-                icc_profile=ImageCms.ImageCmsProfile(
-                    ImageCms.createProfile("sRGB")
-                ).tobytes(),
+                width,
+                height,
+                "benekli delta E color difference image",
             )
-            print("deltaE output generated: %s" % opts.de_filename)
 
+        if opts.de_stats_filename is not None:
+            self.statistics = DeStatistics()
+
+    def update(self, input_strip, input_strip_Lab, transform):
+        output_strip = None
+        if self.proof_writer is not None:
+            output_strip = transform(get_proof_transform_name(self.opts), input_strip)
+            self.icc_profile = output_strip.info.get("icc_profile")
+            self.proof_writer.write(np.asarray(output_strip))
+
+        if not self.opts.needs_de():
+            return
+
+        if self.de_lut is not None:
+            de_strip = create_de_image_with_lut(
+                self.de_lut,
+                input_strip,
+                self.opts.de_thresholds,
+                self.opts.de_palette,
+                self.statistics,
+                self.de_writer is not None,
+            )
+            if de_strip is not None:
+                self.de_writer.write(np.asarray(de_strip))
 
-def run():
-    opts = CommandOptions()
-    parser = argparse.ArgumentParser(prog="benekli")
-    parser.add_argument(
-        "--bpc",
-        help="enable black point compensation (default: %s)" % opts.bpc,
-        default=False,
-        action="store_true",
-    )
-    parser.add_argument(
-        "-d",
-        "--display-profile",
-        metavar="FILENAME",
-        help="display (output) profile, default is active display",
-    )
-    parser.add_argument(
-        "-e",
-        "--de-formula",
-        choices=["cie76", "cie94", "ciede2000"],
-        help="delta E formula (default: %s)" % opts.de_formula,
-        default=opts.de_formula,
-    )
-    parser.add_argument(
-        "-g",
-        "--gamut-check",
-        help="enable gamut check (default: %s)" % opts.gamut_check,
-        default=opts.gamut_check,
-        action="store_true",
-    )
-    parser.add_argument(
-        "-i",
-        "--input-image",
-        metavar="FILENAME",
-        help="input image filename",
-        required=True,
-    )
-    parser.add_argument(
-        "--input-profile",
-        metavar="FILENAME",
-        help="input profile to use (overrides embedded profile in input image)",
-    )
-    parser.add_argument(
-        "-o", "--output-image", metavar="FILENAME", help="output proof image"
-    )
-    parser.add_argument(
-        "-q", "--output-de", metavar="FILENAME", help="output delta E image"
-    )
-    parser.add_argument(
-        "-r",
-        "--rendering-intent",
-        choices=["p", "r", "s", "a"],
-        help="rendering intent, p(erceptual), r(elative) colorimetric, s(aturation) or a(bsolute) colorimetric",
-        required=True
-    )
-    parser.add_argument(
-        "-s",
-        "--simulated-profile",
-        metavar="FILENAME",
-        help="simulated (printer/paper) profile",
-        required=True,
-    )
-    parser.add_argument(
-        "-v",
-        "--verbose",
-        help="enable verbose mode, use -vv to enable debug mode",
-        action="count",
-        default=0,
-    )
-    parser.add_argument(
-        "--version",
-        action="version",
-        version=importlib.metadata.version("benekli")
-    )
-    args = parser.parse_args()
-    logging_format = "%(levelname)5s:%(filename)15s: %(message)s"
-    logging.basicConfig(
-        filename=log_file if False else None,
-        level=logging.WARNING,
-        format=logging_format,
-    )
-    logging_level = logging.WARNING
-    if args.verbose >= 2:
-        logging_level = logging.DEBUG
+            return
 
-    elif args.verbose >= 1:
-        logging_level = logging.INFO
+        output_strip_Lab = get_proof_Lab(
+            self.opts, input_strip, transform, output_strip
+        )
+        if self.de_writer is not None:
+            de_strip = create_de_image(
+                self.opts.get_color_difference_formula(),
+                input_strip_Lab,
+                output_strip_Lab,
+                self.opts.de_thresholds,
+                self.opts.de_palette,
+                self.statistics,
+                self.opts.de_processes,
+            )
+            self.de_writer.write(np.asarray(de_strip))
 
-    logging.getLogger("benekli").setLevel(logging_level)
-    logger.debug(args)
-    logger.debug("Pillow supported modeles: %s" % ",".join(features.get_supported()))
-    if not features.check("littlecms2"):
-        err("littlecms2 module is not available")
+        else:
+            calculate_de_statistics(
+                self.opts.get_color_difference_formula(),
+                input_strip_Lab,
+                output_strip_Lab,
+                self.statistics,
+                self.opts.de_processes,
+            )
 
-    if not features.check("libtiff"):
-        err("libtiff module is not available")
+    def close(self):
+        if self.proof_writer is not None:
+            self.proof_writer.close(self.icc_profile)
+            print("soft proof generated: %s" % self.opts.output_filename)
 
-    if not features.check("jpg"):
-        logger.warning("jpg module is not available")
+        if self.de_writer is not None:
+            self.de_writer.close(cache.get_built_profile("sRGB").tobytes())
+            print("deltaE output generated: %s" % self.opts.de_filename)
 
-    opts.load_from_args(args)
-    
-    if opts.output_filename is None and opts.de_filename is None:
-        err("At least one of -o (output proof image) or -q (output delta E image) must be specified")
-    
-    run_with_opts(opts)
-    return 0
+        if self.statistics is not None:
+            write_de_statistics(self.opts, self.statistics)
+            print("deltaE statistics generated: %s" % self.opts.de_stats_filename)
 
+    def abort(self):
+        for writer in (self.proof_writer, self.de_writer):
+            if writer is not None:
+                writer.abort()
 
-if __name__ == "__main__":
-    run()
+
+def proof_in_strips(
+    opts: CommandOptions,
+    input_image,
+    variants,
+    transform: Callable[[object, Image.Image], Image.Image],
+    de_luts=None,
+):
+    """Create and save the soft proofs and the delta E of the variants strip by
+    strip, so the memory used stays within opts.memory_budget.
+
+    The input image is opened but not loaded, the output images are TIFF.
+    de_luts maps the delta E LUT names to the delta E LUTs if they are used."""
+    for variant_opts in variants:
+        for filename in (variant_opts.output_filename, variant_opts.de_filename):
+            if filename is None:
+                continue
+
+            if os.path.splitext(filename)[1].lower() not in (".tif", ".tiff"):
+                err("output images must be TIFF with a memory budget: %s" % filename)
+
+    width, height = input_image.size
+    concurrency = min(opts.sweep_threads, len(variants))
+    reader = stream.StripReader(opts.input_filename, input_image)
+    image_memory = 0
+    if reader.tiles is None:
+        # a compressed image is decoded as a whole, within the budget too
+        image_memory = width * height * len(input_image.getbands())
+
+    rows = get_strip_rows(opts, width, concurrency, image_memory)
+    logger.info("processing the image in strips of %d rows" % rows)
+    proofs = []
+    executor = None
+    if concurrency > 1:
+        executor = concurrent.futures.ThreadPoolExecutor(concurrency)
+
+    try:
+        with executor or contextlib.nullcontext():
+            for variant_opts in variants:
+                de_lut = None
+                if de_luts is not None:
+                    de_lut = de_luts[get_de_lut_name(variant_opts)]
+
+                proofs.append(StripProof(variant_opts, width, height, de_lut))
+
+            for y in range(0, height, rows):
+                input_strip = reader.read(y, min(y + rows, height))
+                input_strip_Lab = None
+                if opts.needs_de() and de_luts is None:
+                    input_strip_Lab = get_input_Lab(opts, input_strip, transform)
+
+                if executor is not None:
+                    futures = [
+                        executor.submit(
+                            proof.update, input_strip, input_strip_Lab, transform
+                        )
+                        for proof in proofs
+                    ]
+                    # wait for all and raise the exceptions
+                    for future in futures:
+                        future.result()
+
+                else:
+                    for proof in proofs:
+                        proof.update(input_strip, input_strip_Lab, transform)
+
+    except BaseException:
+        # do not leave incomplete TIFF files
+        for proof in proofs:
+            proof.abort()
+
+        raise
+
+    finally:
+        reader.close()
+
+    for proof in proofs:
+        proof.close()
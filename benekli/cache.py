@@ -0,0 +1,197 @@
+# SPDX-FileCopyrightText: 2025 Mete Balci
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+# in-process caches of the parsed ICC profiles and the built LittleCMS
+# transforms, so repeated proofs (sweep, batch, library use) do not parse the
+# same profiles and build the same transforms again
+#
+# the profiles are keyed by the profile ID in the header, or by the digest of
+# the profile bytes if the profile ID is not set (it is optional and often all
+# zeros), the transforms by the keys of their profiles, modes, intents and flags
+
+import collections
+import hashlib
+import io
+import threading
+import weakref
+
+from PIL import ImageCms
+
+from .shaper import MatrixShaper
+
+PROFILE_CACHE_SIZE = 32
+TRANSFORM_CACHE_SIZE = 64
+
+CacheInfo = collections.namedtuple(
+    "CacheInfo", ["hits", "misses", "maxsize", "currsize"]
+)
+
+
+class LRUCache:
+    """Thread-safe bounded LRU cache with hit and miss counters."""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._items = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, create):
+        """Return the value of key, call create() to create it if it is missing."""
+        with self._lock:
+            if key in self._items:
+                self.hits = self.hits + 1
+                self._items.move_to_end(key)
+                return self._items[key]
+
+            self.misses = self.misses + 1
+
+        # create without holding the lock, building a transform takes a while
+        # if another thread creates the same value meanwhile, last one is kept
+        value = create()
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+
+        return value
+
+    def info(self):
+        with self._lock:
+            return CacheInfo(self.hits, self.misses, self.maxsize, len(self._items))
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+profile_cache = LRUCache(PROFILE_CACHE_SIZE)
+transform_cache = LRUCache(TRANSFORM_CACHE_SIZE)
+
+# keys of the profiles returned by this module, so they are not serialized
+# again to create a transform key
+_profile_keys = weakref.WeakKeyDictionary()
+
+
+def get_profile_key_from_bytes(data):
+    profile_id = data[84:100]
+    if len(profile_id) == 16 and any(profile_id):
+        return "id:" + profile_id.hex()
+
+    return "sha256:" + hashlib.sha256(data).hexdigest()
+
+
+def get_profile_key(profile):
+    """Return the cache key of an ImageCmsProfile."""
+    key = _profile_keys.get(profile)
+    if key is None:
+        key = get_profile_key_from_bytes(profile.tobytes())
+        _profile_keys[profile] = key
+
+    return key
+
+
+def get_profile_from_bytes(data):
+    """Return the ImageCmsProfile of the ICC profile bytes."""
+    key = get_profile_key_from_bytes(data)
+    profile = profile_cache.get(key, lambda: ImageCms.ImageCmsProfile(io.BytesIO(data)))
+    _profile_keys[profile] = key
+    return profile
+
+
+def get_profile(filename):
+    """Return the ImageCmsProfile of the ICC profile file."""
+    # the file is read every time, so a changed file is not served from cache
+    with open(filename, "rb") as f:
+        return get_profile_from_bytes(f.read())
+
+
+def get_built_profile(color_space, color_temp=0):
+    """Return the ImageCmsProfile of ImageCms.createProfile(color_space)."""
+    key = "built:%s:%s" % (color_space, color_temp)
+    profile = profile_cache.get(
+        key,
+        lambda: ImageCms.ImageCmsProfile(
+            ImageCms.createProfile(color_space, color_temp)
+        ),
+    )
+    _profile_keys[profile] = key
+    return profile
+
+
+def get_transform(input_profile, output_profile, in_mode, out_mode, intent, flags):
+    """Return the cached ImageCms.buildTransform(...)."""
+    key = (
+        "transform",
+        get_profile_key(input_profile),
+        get_profile_key(output_profile),
+        in_mode,
+        out_mode,
+        int(intent),
+        int(flags),
+    )
+    return transform_cache.get(
+        key,
+        lambda: ImageCms.buildTransform(
+            input_profile, output_profile, in_mode, out_mode, intent, flags
+        ),
+    )
+
+
+def get_matrix_shaper(profile):
+    """Return the cached MatrixShaper of an ImageCmsProfile, or None if it is
+    not an RGB matrix/TRC profile."""
+    key = ("shaper", get_profile_key(profile))
+    return transform_cache.get(key, lambda: MatrixShaper.from_bytes(profile.tobytes()))
+
+
+def get_proof_transform(
+    input_profile,
+    output_profile,
+    proof_profile,
+    in_mode,
+    out_mode,
+    intent,
+    proof_intent,
+    flags,
+):
+    """Return the cached ImageCms.buildProofTransform(...)."""
+    key = (
+        "proof",
+        get_profile_key(input_profile),
+        get_profile_key(output_profile),
+        get_profile_key(proof_profile),
+        in_mode,
+        out_mode,
+        int(intent),
+        int(proof_intent),
+        int(flags),
+    )
+    return transform_cache.get(
+        key,
+        lambda: ImageCms.buildProofTransform(
+            inputProfile=input_profile,
+            outputProfile=output_profile,
+            proofProfile=proof_profile,
+            inMode=in_mode,
+            outMode=out_mode,
+            renderingIntent=intent,
+            proofRenderingIntent=proof_intent,
+            flags=flags,
+        ),
+    )
+
+
+def cache_info():
+    """Return the CacheInfo of the profile and the transform caches."""
+    return {"profiles": profile_cache.info(), "transforms": transform_cache.info()}
+
+
+def cache_clear():
+    profile_cache.clear()
+    transform_cache.clear()
@@ -0,0 +1,327 @@
+# SPDX-FileCopyrightText: 2025 Mete Balci
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+# the command line of benekli
+#
+# a command line run that only parses the arguments, e.g. --version, --help or
+# an invalid argument, does not import NumPy, Pillow or the modules of benekli
+# that use them, so it takes a few milliseconds instead of a few hundred,
+# the Pillow features are checked after the arguments, and the proof modules
+# are imported when they are run, the subcommands are imported only when they
+# are given, see tests/test_startup.py for the import time budget
+
+import argparse
+import functools
+import importlib
+import logging
+import sys
+
+from .options import CommandOptions, err, get_default_lut_cache_dir
+
+logger = logging.getLogger(__name__)
+
+
+def setup_logging(verbose):
+    logging_format = "%(levelname)5s:%(filename)15s: %(message)s"
+    logging.basicConfig(
+        level=logging.WARNING,
+        format=logging_format,
+    )
+    logging_level = logging.WARNING
+    if verbose >= 2:
+        logging_level = logging.DEBUG
+
+    elif verbose >= 1:
+        logging_level = logging.INFO
+
+    logging.getLogger("benekli").setLevel(logging_level)
+
+
+@functools.lru_cache(maxsize=None)
+def check_features():
+    # imports Pillow, so it is called after the arguments are checked, and
+    # only once per process
+    from PIL import features
+
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(
+            "Pillow supported modeles: %s" % ",".join(features.get_supported())
+        )
+
+    if not features.check("littlecms2"):
+        err("littlecms2 module is not available")
+
+    if not features.check("libtiff"):
+        err("libtiff module is not available")
+
+    if not features.check("jpg"):
+        logger.warning("jpg module is not available")
+
+
+def parse_de_thresholds(s):
+    try:
+        return tuple(float(t) for t in s.split(","))
+
+    except ValueError as e:
+        raise argparse.ArgumentTypeError("invalid delta E thresholds: %s" % s) from e
+
+
+def parse_de_palette(s):
+    palette = []
+    for color in s.split(","):
+        color = color.strip().lstrip("#")
+        try:
+            if len(color) != 6:
+                raise ValueError(color)
+
+            palette.append(tuple(int(color[i : i + 2], 16) for i in (0, 2, 4)))
+
+        except ValueError as e:
+            raise argparse.ArgumentTypeError("invalid delta E palette: %s" % s) from e
+
+    return tuple(palette)
+
+
+def add_common_arguments(parser, opts):
+    """Add the arguments shared by benekli and its subcommands."""
+    parser.add_argument(
+        "--bpc",
+        help="enable black point compensation (default: %s)" % opts.bpc,
+        default=False,
+        action="store_true",
+    )
+    parser.add_argument(
+        "-d",
+        "--display-profile",
+        metavar="FILENAME",
+        help="display (output) profile, default is active display",
+    )
+    parser.add_argument(
+        "-e",
+        "--de-formula",
+        choices=["cie76", "cie94", "ciede2000"],
+        help="delta E formula (default: %s)" % opts.de_formula,
+        default=opts.de_formula,
+    )
+    parser.add_argument(
+        "--de-direct",
+        help="calculate delta E of the simulated colors directly, "
+        "not of the proof on the display, the display profile is not needed "
+        "without -o (default: %s)" % opts.de_direct,
+        default=opts.de_direct,
+        action="store_true",
+    )
+    parser.add_argument(
+        "--de-float",
+        help="calculate delta E of float Lab colors, the matrix/TRC input and "
+        "display profiles are converted to Lab in NumPy, the others by "
+        "LittleCMS in 8-bit (default: %s)" % opts.de_float,
+        default=opts.de_float,
+        action="store_true",
+    )
+    parser.add_argument(
+        "--de-lut",
+        help="interpolate delta E in a LUT of the input colors, sampled once "
+        "per profiles and options and cached in the --lut-cache directory "
+        "(default: %s), instead of converting the images to Lab, the delta E "
+        "can differ from the calculated one (default: %s)"
+        % (get_default_lut_cache_dir(), opts.de_lut),
+        default=opts.de_lut,
+        action="store_true",
+    )
+    parser.add_argument(
+        "--de-processes",
+        metavar="N",
+        type=int,
+        help="number of worker processes calculating delta E, for very large "
+        "images, not used with --de-float (default: %d)" % opts.de_processes,
+        default=opts.de_processes,
+    )
+    parser.add_argument(
+        "--de-thresholds",
+        metavar="T1,T2,...",
+        type=parse_de_thresholds,
+        help="delta E heatmap thresholds (default: %s)"
+        % ",".join("%g" % t for t in opts.de_thresholds),
+        default=opts.de_thresholds,
+    )
+    parser.add_argument(
+        "--de-palette",
+        metavar="RRGGBB,...",
+        type=parse_de_palette,
+        help="delta E heatmap colors, one more than the thresholds, "
+        "the last two are the gradient above the second last threshold "
+        "(default: %s)" % ",".join("%02x%02x%02x" % c for c in opts.de_palette),
+        default=opts.de_palette,
+    )
+    parser.add_argument(
+        "-g",
+        "--gamut-check",
+        help="enable gamut check (default: %s)" % opts.gamut_check,
+        default=opts.gamut_check,
+        action="store_true",
+    )
+    parser.add_argument(
+        "--input-profile",
+        metavar="FILENAME",
+        help="input profile to use (overrides embedded profile in input image)",
+    )
+    parser.add_argument(
+        "--lut-cache",
+        metavar="DIRECTORY",
+        nargs="?",
+        const=get_default_lut_cache_dir(),
+        help="sample the transforms to 3D LUTs, cache them in DIRECTORY "
+        "(default: %s) and use them in the later runs, "
+        "the LUT output can differ from the transform by a few code values"
+        % get_default_lut_cache_dir(),
+    )
+    parser.add_argument(
+        "--memory-budget",
+        metavar="MB",
+        type=int,
+        help="process the image in strips of rows so the image data fits in MB "
+        "megabytes, the output images are written strip by strip as TIFF, "
+        "only the uncompressed input images are read strip by strip, a "
+        "compressed input image is decoded as a whole within the budget",
+    )
+    parser.add_argument(
+        "-r",
+        "--rendering-intent",
+        choices=["p", "r", "s", "a"],
+        help="rendering intent, p(erceptual), r(elative) colorimetric, s(aturation) or a(bsolute) colorimetric",
+    )
+    parser.add_argument(
+        "--threads",
+        metavar="N",
+        type=int,
+        help="number of threads applying the transforms to the bands of the "
+        "image (default: %d)" % opts.threads,
+        default=opts.threads,
+    )
+    parser.add_argument(
+        "--timings",
+        metavar="FILENAME",
+        help="append the wall time, CPU time and peak memory of the stages of "
+        "every run to FILENAME, a line of JSON per run, - is the standard output",
+    )
+    parser.add_argument(
+        "-v",
+        "--verbose",
+        help="enable verbose mode, use -vv to enable debug mode",
+        action="count",
+        default=0,
+    )
+
+
+class VersionAction(argparse.Action):
+    """--version, the version is read from the package metadata only when it
+    is printed, importlib.metadata takes a while to import."""
+
+    def __init__(self, option_strings, dest, **kwargs):
+        kwargs.update(nargs=0, default=argparse.SUPPRESS)
+        kwargs.setdefault("help", "show program's version number and exit")
+        super().__init__(option_strings, dest, **kwargs)
+
+    def __call__(self, parser, namespace, values, option_string=None):
+        import importlib.metadata
+
+        sys.stdout.write("%s\n" % importlib.metadata.version("benekli"))
+        parser.exit()
+
+
+# benekli <subcommand> ... runs the run(argv) of the subcommand module
+SUBCOMMANDS = {
+    "batch": ".batch",
+    "rank": ".rank",
+    "serve": ".serve",
+    "watch": ".watch",
+}
+
+
+def run():
+    if len(sys.argv) > 1 and sys.argv[1] in SUBCOMMANDS:
+        module = importlib.import_module(SUBCOMMANDS[sys.argv[1]], __package__)
+        return module.run(sys.argv[2:])
+
+    opts = CommandOptions()
+    parser = argparse.ArgumentParser(prog="benekli")
+    add_common_arguments(parser, opts)
+    parser.add_argument(
+        "-i",
+        "--input-image",
+        metavar="FILENAME",
+        help="input image filename",
+        required=True,
+    )
+    parser.add_argument(
+        "-o", "--output-image", metavar="FILENAME", help="output proof image"
+    )
+    parser.add_argument(
+        "-q", "--output-de", metavar="FILENAME", help="output delta E image"
+    )
+    parser.add_argument(
+        "--de-stats",
+        dest="output_de_stats",
+        metavar="FILENAME",
+        help="output delta E statistics (JSON)",
+    )
+    parser.add_argument(
+        "-s",
+        "--simulated-profile",
+        metavar="FILENAME",
+        help="simulated (printer/paper) profile",
+        required=True,
+    )
+    parser.add_argument(
+        "--sweep",
+        help="proof with all rendering intents with and without black point "
+        "compensation, the intent and bpc are added to the output filenames, "
+        "-r and --bpc are ignored",
+        default=False,
+        action="store_true",
+    )
+    parser.add_argument(
+        "--sweep-threads",
+        metavar="N",
+        type=int,
+        help="number of threads used by --sweep (default: %d)" % opts.sweep_threads,
+        default=opts.sweep_threads,
+    )
+    parser.add_argument(
+        "--cprofile",
+        metavar="FILENAME",
+        help="profile the run with cProfile and write the statistics (pstats) to "
+        "FILENAME, the threads of the bands are not profiled, use --threads 1",
+    )
+    parser.add_argument(
+        "--tracemalloc",
+        metavar="FILENAME",
+        help="trace the memory allocations of the run and write the tracemalloc "
+        "snapshot to FILENAME, the traced peaks are added to --timings",
+    )
+    parser.add_argument("--version", action=VersionAction)
+    args = parser.parse_args()
+    setup_logging(args.verbose)
+    logger.debug(args)
+
+    opts.load_from_args(args)
+
+    if opts.rendering_intent is None and not opts.sweep:
+        err("-r (rendering intent) must be specified, unless --sweep is used")
+
+    if opts.output_filename is None and not opts.needs_de():
+        err(
+            "At least one of -o (output proof image), -q (output delta E image) or --de-stats must be specified"
+        )
+
+    check_features()
+    from .benekli import run_with_opts
+
+    run_with_opts(opts)
+    return 0
+
+
+if __name__ == "__main__":
+    run()
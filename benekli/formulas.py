@@ -5,13 +5,35 @@
 import math
 import typing
 
+import numpy as np
+
 ColorTriple = typing.Tuple[float, float, float]
 
 
+# CONVERSIONS
+# the conversions take a color triple and return a tuple, or an array with the
+# colors in the last axis, e.g. (N, 3) or (H, W, 3), and return an array of the
+# same shape, see the _array versions, float32 arrays give float32 arrays, the
+# other arrays give float64 arrays
+# the piecewise functions of the _array versions calculate both pieces of all
+# values and select one, which is faster than indexing the values of a piece
+
+
+def _float_array(a):
+    a = np.asarray(a)
+    if not np.issubdtype(a.dtype, np.floating):
+        a = a.astype(np.float64)
+
+    return a
+
+
 # ICC.1:2010 3.1.24
 # convert nCIEXYZ to PCSXYZ
 # media white should be (0.9642, 1.0, 0.8249)
 def nXYZ_to_PCSXYZ(nXYZ, media_white):
+    if isinstance(nXYZ, np.ndarray):
+        return nXYZ_to_PCSXYZ_array(nXYZ, media_white)
+
     X = nXYZ[0]
     Y = nXYZ[1]
     Z = nXYZ[2]
@@ -24,7 +46,16 @@ def nXYZ_to_PCSXYZ(nXYZ, media_white):
     return (PCSX, PCSY, PCSZ)
 
 
+def nXYZ_to_PCSXYZ_array(nXYZ, media_white):
+    nXYZ = _float_array(nXYZ)
+    media_white = np.asarray(media_white, dtype=nXYZ.dtype)
+    return nXYZ / media_white * np.asarray((0.9642, 1.0, 0.8249), dtype=nXYZ.dtype)
+
+
 def PCSXYZ_to_nXYZ(PCSXYZ, media_white):
+    if isinstance(PCSXYZ, np.ndarray):
+        return PCSXYZ_to_nXYZ_array(PCSXYZ, media_white)
+
     PCSX = PCSXYZ[0]
     PCSY = PCSXYZ[1]
     PCSZ = PCSXYZ[2]
@@ -37,26 +68,52 @@ def PCSXYZ_to_nXYZ(PCSXYZ, media_white):
     return (X, Y, Z)
 
 
+def PCSXYZ_to_nXYZ_array(PCSXYZ, media_white):
+    PCSXYZ = _float_array(PCSXYZ)
+    media_white = np.asarray(media_white, dtype=PCSXYZ.dtype)
+    return PCSXYZ * media_white / np.asarray((0.9642, 1.0, 0.8249), dtype=PCSXYZ.dtype)
+
+
 # convert CIEXYZ to xyY
+# Y in XYZ is luminance and it is the same Y in xyY, x and y are the
+# chromaticity X / (X + Y + Z) and Y / (X + Y + Z)
 def XYZ_to_xyY(XYZ, illuminant_XYZ):
+    if isinstance(XYZ, np.ndarray):
+        return XYZ_to_xyY_array(XYZ, illuminant_XYZ)
+
     X = XYZ[0]
     Y = XYZ[1]
     Z = XYZ[2]
     if X == 0 and Y == 0 and Z == 0:
         # black, assume same chromaticity as illuminant
-        X = illuminant_XYZ[0]
-        Y = illuminant_XYZ[1]
-        Z = illuminant_XYZ[2]
+        Xn = illuminant_XYZ[0]
+        Yn = illuminant_XYZ[1]
+        Zn = illuminant_XYZ[2]
+        return (Xn / (Xn + Yn + Zn), Yn / (Xn + Yn + Zn), Y)
 
     x = X / (X + Y + Z)
-    # yeah, this is odd
-    # Y in XYZ is luminance and it is the same Y in xyY
-    # xy in xyY is actually related to X and Z and XYZ (not X and Y)
-    y = Z / (X + Y + Z)
+    y = Y / (X + Y + Z)
     return (x, y, Y)
 
 
+def XYZ_to_xyY_array(XYZ, illuminant_XYZ):
+    XYZ = _float_array(XYZ)
+    illuminant_XYZ = np.asarray(illuminant_XYZ, dtype=XYZ.dtype)
+    black = (XYZ == 0).all(axis=-1, keepdims=True)
+    # black, assume same chromaticity as illuminant
+    XYZ_or_illuminant = np.where(black, illuminant_XYZ, XYZ)
+    total = XYZ_or_illuminant.sum(axis=-1)
+    xyY = np.empty_like(XYZ_or_illuminant)
+    np.divide(XYZ_or_illuminant[..., 0], total, out=xyY[..., 0])
+    np.divide(XYZ_or_illuminant[..., 1], total, out=xyY[..., 1])
+    xyY[..., 2] = XYZ[..., 1]
+    return xyY
+
+
 def xyY_to_XYZ(xyY):
+    if isinstance(xyY, np.ndarray):
+        return xyY_to_XYZ_array(xyY)
+
     x = xyY[0]
     y = xyY[1]
     Y = xyY[2]
@@ -65,58 +122,145 @@ def xyY_to_XYZ(xyY):
     return (X, Y, Z)
 
 
+def xyY_to_XYZ_array(xyY):
+    xyY = _float_array(xyY)
+    x = xyY[..., 0]
+    y = xyY[..., 1]
+    Y = xyY[..., 2]
+    XYZ = np.empty_like(xyY)
+    np.multiply(Y / y, x, out=XYZ[..., 0])
+    XYZ[..., 1] = Y
+    np.multiply(Y / y, 1 - x - y, out=XYZ[..., 2])
+    return XYZ
+
+
+# the two pieces of f of CIELAB, cube root above (6/29)^3 and linear below
+def _Lab_f(t):
+    if t > (6 / 29) ** 3:
+        return pow(t, 1 / 3)
+
+    return (841 / 108) * t + (4 / 29)
+
+
+def _Lab_f_inverse(f):
+    if f > 6 / 29:
+        return f**3
+
+    return (108 / 841) * (f - (4 / 29))
+
+
 # convert CIEXYZ to CIELAB
 def XYZ_to_Lab(XYZ, illuminant_XYZ):
+    if isinstance(XYZ, np.ndarray):
+        return XYZ_to_Lab_array(XYZ, illuminant_XYZ)
+
     X = XYZ[0]
     Y = XYZ[1]
     Z = XYZ[2]
     Xn = illuminant_XYZ[0]
     Yn = illuminant_XYZ[1]
     Zn = illuminant_XYZ[2]
+    fx = _Lab_f(X / Xn)
+    fy = _Lab_f(Y / Yn)
+    fz = _Lab_f(Z / Zn)
+    L = 116 * fy - 16
+    a = 500 * (fx - fy)
+    b = 200 * (fy - fz)
+    return (L, a, b)
 
-    fc = lambda x, xn: pow(x / xn, 1/3)
-    fd = lambda x, xn: (841 / 108) * (x / xn) + (4 / 29)
-
-    if (X / Xn) > ((6 / 29) ** 3):
-        fx = fc
-
-    else:
-        fx = fd
-
-    if (Y / Yn) > ((6 / 29) ** 3):
-        fy = fc
-
-    else:
-        fy = fd
 
-    if (Z / Zn) > ((6 / 29) ** 3):
-        fz = fc
+def XYZ_to_Lab_array(XYZ, illuminant_XYZ):
+    XYZ = _float_array(XYZ)
+    t = XYZ / np.asarray(illuminant_XYZ, dtype=XYZ.dtype)
+    f = np.cbrt(t)
+    dark = t <= (6 / 29) ** 3
+    if dark.any():
+        t *= 841 / 108
+        t += 4 / 29
+        np.copyto(f, t, where=dark)
+
+    fx = f[..., 0]
+    fy = f[..., 1]
+    fz = f[..., 2]
+    # the memory layout of XYZ
+    Lab = np.empty_like(f)
+    np.multiply(fy, 116, out=Lab[..., 0])
+    Lab[..., 0] -= 16
+    np.subtract(fx, fy, out=Lab[..., 1])
+    Lab[..., 1] *= 500
+    np.subtract(fy, fz, out=Lab[..., 2])
+    Lab[..., 2] *= 200
+    return Lab
+
+
+# convert CIELAB to CIEXYZ
+def Lab_to_XYZ(Lab, illuminant_XYZ):
+    if isinstance(Lab, np.ndarray):
+        return Lab_to_XYZ_array(Lab, illuminant_XYZ)
 
-    else:
-        fz = fd
+    L = Lab[0]
+    a = Lab[1]
+    b = Lab[2]
+    fy = (L + 16) / 116
+    fx = fy + a / 500
+    fz = fy - b / 200
+    X = illuminant_XYZ[0] * _Lab_f_inverse(fx)
+    Y = illuminant_XYZ[1] * _Lab_f_inverse(fy)
+    Z = illuminant_XYZ[2] * _Lab_f_inverse(fz)
+    return (X, Y, Z)
 
-    L = 116 * fy(Y, Yn) - 16
-    a = 500 * (fx(X, Xn) - fy(Y, Yn))
-    b = 200 * (fy(Y, Yn) - fz(Z, Zn))
-    return (L, a, b)
 
+def Lab_to_XYZ_array(Lab, illuminant_XYZ):
+    Lab = _float_array(Lab)
+    f = np.empty_like(Lab)
+    np.add(Lab[..., 0], 16, out=f[..., 1])
+    f[..., 1] /= 116
+    np.divide(Lab[..., 1], 500, out=f[..., 0])
+    f[..., 0] += f[..., 1]
+    np.divide(Lab[..., 2], -200, out=f[..., 2])
+    f[..., 2] += f[..., 1]
+    t = f * f
+    t *= f
+    dark = f <= 6 / 29
+    if dark.any():
+        f -= 4 / 29
+        f *= 108 / 841
+        np.copyto(t, f, where=dark)
 
-def Lab_to_XYZ(Lab):
-    pass
+    t *= np.asarray(illuminant_XYZ, dtype=t.dtype)
+    return t
 
 
 # convert CIELAB to CIELCh
 # LCh is just Lab in polar coordinates, L is unchanged
+# h is in radians, -pi...pi
 def Lab_to_LCh(Lab):
+    if isinstance(Lab, np.ndarray):
+        return Lab_to_LCh_array(Lab)
+
     L = Lab[0]
     a = Lab[1]
     b = Lab[2]
     C = math.sqrt(a * a + b * b)
-    h = math.atan(b / a)
+    h = math.atan2(b, a)
     return (L, C, h)
 
 
+def Lab_to_LCh_array(Lab):
+    Lab = _float_array(Lab)
+    a = Lab[..., 1]
+    b = Lab[..., 2]
+    LCh = np.empty_like(Lab)
+    LCh[..., 0] = Lab[..., 0]
+    np.sqrt(a * a + b * b, out=LCh[..., 1])
+    np.arctan2(b, a, out=LCh[..., 2])
+    return LCh
+
+
 def LCh_to_Lab(LCh):
+    if isinstance(LCh, np.ndarray):
+        return LCh_to_Lab_array(LCh)
+
     L = LCh[0]
     C = LCh[1]
     h = LCh[2]
@@ -125,6 +269,17 @@ def LCh_to_Lab(LCh):
     return (L, a, b)
 
 
+def LCh_to_Lab_array(LCh):
+    LCh = _float_array(LCh)
+    C = LCh[..., 1]
+    h = LCh[..., 2]
+    Lab = np.empty_like(LCh)
+    Lab[..., 0] = LCh[..., 0]
+    np.multiply(C, np.cos(h), out=Lab[..., 1])
+    np.multiply(C, np.sin(h), out=Lab[..., 2])
+    return Lab
+
+
 # CIE COLOR DIFFERENCE (dE) FORMULAS
 # ref: https://en.wikipedia.org/wiki/Color_difference
 
@@ -152,7 +307,8 @@ def de94(Lab1, Lab2, kL, K1, K2):
     C1 = math.sqrt(a1**2 + b1**2)
     C2 = math.sqrt(a2**2 + b2**2)
     delta_Cab = C1 - C2
-    delta_Hab = math.sqrt((a1 - a2) ** 2 + (b1 - b2) ** 2 - delta_Cab**2)
+    # clamp at 0, rounding errors can make it slightly negative
+    delta_Hab = math.sqrt(max(0.0, (a1 - a2) ** 2 + (b1 - b2) ** 2 - delta_Cab**2))
     SL = 1
     SC = 1 + K1 * C1
     SH = 1 + K2 * C1
@@ -173,23 +329,267 @@ def de94_for_textiles(Lab1, Lab2):
     return de94(Lab1, Lab2, 2.0, 0.048, 0.014)
 
 
-def de2000(Lab1, Lab2):
-    """
-    Implementation of the CIEDE2000 color difference formula.
-    This is a simplified implementation for testing purposes.
-    """
+# CIEDE2000
+# ref: G. Sharma, W. Wu, E. N. Dalal, "The CIEDE2000 Color-Difference Formula:
+# Implementation Notes, Supplementary Test Data, and Mathematical Observations"
+# kL, kC and kH are the parametric weighting factors, all 1 by default
+def de2000(Lab1, Lab2, kL=1.0, kC=1.0, kH=1.0):
     L1 = Lab1[0]
     a1 = Lab1[1]
     b1 = Lab1[2]
     L2 = Lab2[0]
     a2 = Lab2[1]
     b2 = Lab2[2]
-    
-    
-    if L1 == L2 and a1 == a2 and b1 == b2:
-        return 0.0
-    
-    if a1 == a2 and b1 == b2:
-        return abs(L1 - L2)
-    
-    return math.sqrt((L1 - L2) ** 2 + (a1 - a2) ** 2 + (b1 - b2) ** 2)
+    # a' with the G factor
+    C1 = math.sqrt(a1 * a1 + b1 * b1)
+    C2 = math.sqrt(a2 * a2 + b2 * b2)
+    C_bar7 = ((C1 + C2) / 2) ** 7
+    G = 0.5 * (1 - math.sqrt(C_bar7 / (C_bar7 + 25**7)))
+    a1p = (1 + G) * a1
+    a2p = (1 + G) * a2
+    # C' and h' (in degrees)
+    C1p = math.sqrt(a1p * a1p + b1 * b1)
+    C2p = math.sqrt(a2p * a2p + b2 * b2)
+    h1p = 0.0 if (a1p == 0 and b1 == 0) else math.degrees(math.atan2(b1, a1p)) % 360
+    h2p = 0.0 if (a2p == 0 and b2 == 0) else math.degrees(math.atan2(b2, a2p)) % 360
+    # delta L', delta C' and delta H'
+    delta_Lp = L2 - L1
+    delta_Cp = C2p - C1p
+    # hues differing by exactly 180 degrees are found from a and b, since
+    # the rounding errors of h' would make the branches below arbitrary
+    opposite = C1p * C2p != 0 and a1 * b2 == b1 * a2 and a1 * a2 + b1 * b2 < 0
+    if C1p * C2p == 0:
+        delta_hp = 0.0
+
+    elif opposite:
+        delta_hp = 180.0 if h1p < h2p else -180.0
+
+    elif abs(h2p - h1p) <= 180:
+        delta_hp = h2p - h1p
+
+    elif h2p - h1p > 180:
+        delta_hp = h2p - h1p - 360
+
+    else:
+        delta_hp = h2p - h1p + 360
+
+    delta_Hp = 2 * math.sqrt(C1p * C2p) * math.sin(math.radians(delta_hp / 2))
+    # means of L', C' and h'
+    L_barp = (L1 + L2) / 2
+    C_barp = (C1p + C2p) / 2
+    if C1p * C2p == 0:
+        h_barp = h1p + h2p
+
+    elif opposite or abs(h1p - h2p) <= 180:
+        h_barp = (h1p + h2p) / 2
+
+    elif h1p + h2p < 360:
+        h_barp = (h1p + h2p + 360) / 2
+
+    else:
+        h_barp = (h1p + h2p - 360) / 2
+
+    # weighting functions
+    T = (
+        1
+        - 0.17 * math.cos(math.radians(h_barp - 30))
+        + 0.24 * math.cos(math.radians(2 * h_barp))
+        + 0.32 * math.cos(math.radians(3 * h_barp + 6))
+        - 0.20 * math.cos(math.radians(4 * h_barp - 63))
+    )
+    L_barp_50 = (L_barp - 50) ** 2
+    SL = 1 + (0.015 * L_barp_50) / math.sqrt(20 + L_barp_50)
+    SC = 1 + 0.045 * C_barp
+    SH = 1 + 0.015 * C_barp * T
+    # hue rotation term
+    delta_theta = 30 * math.exp(-(((h_barp - 275) / 25) ** 2))
+    C_barp7 = C_barp**7
+    RC = 2 * math.sqrt(C_barp7 / (C_barp7 + 25**7))
+    RT = -math.sin(math.radians(2 * delta_theta)) * RC
+    dL = delta_Lp / (kL * SL)
+    dC = delta_Cp / (kC * SC)
+    dH = delta_Hp / (kH * SH)
+    return math.sqrt(dL * dL + dC * dC + dH * dH + RT * dC * dH)
+
+
+# ARRAY VERSIONS OF THE COLOR DIFFERENCE FORMULAS
+# Lab1 and Lab2 are arrays with Lab in the last axis, e.g. (H, W, 3)
+# the result has the same shape without the last axis, e.g. (H, W)
+# except de2000_array, the operations are done in the same order as the scalar
+# versions above so the results are the same (up to the last bit, since python
+# uses pow for ** 2 whereas numpy squares)
+
+
+def _Lab_channels(Lab):
+    Lab = np.asarray(Lab, dtype=np.float64)
+    return (Lab[..., 0], Lab[..., 1], Lab[..., 2])
+
+
+def de76_array(Lab1, Lab2):
+    L1, a1, b1 = _Lab_channels(Lab1)
+    L2, a2, b2 = _Lab_channels(Lab2)
+    return np.sqrt((L1 - L2) ** 2 + (a1 - a2) ** 2 + (b1 - b2) ** 2)
+
+
+# C1 and C2 are the chroma of Lab1 and Lab2 if they are already known
+def de94_array(Lab1, Lab2, kL, K1, K2, C1=None, C2=None):
+    L1, a1, b1 = _Lab_channels(Lab1)
+    L2, a2, b2 = _Lab_channels(Lab2)
+    delta_L = L1 - L2
+    if C1 is None:
+        C1 = np.sqrt(a1**2 + b1**2)
+
+    if C2 is None:
+        C2 = np.sqrt(a2**2 + b2**2)
+
+    delta_Cab = C1 - C2
+    delta_Hab = np.sqrt(np.maximum(0.0, (a1 - a2) ** 2 + (b1 - b2) ** 2 - delta_Cab**2))
+    SL = 1
+    SC = 1 + K1 * C1
+    SH = 1 + K2 * C1
+    kC = 1.0
+    kH = 1.0
+    return np.sqrt(
+        (delta_L / (kL * SL)) ** 2
+        + (delta_Cab / (kC * SC)) ** 2
+        + (delta_Hab / (kH * SH)) ** 2
+    )
+
+
+def de94_for_graphic_arts_array(Lab1, Lab2):
+    return de94_array(Lab1, Lab2, 1.0, 0.045, 0.015)
+
+
+def de94_for_textiles_array(Lab1, Lab2):
+    return de94_array(Lab1, Lab2, 2.0, 0.048, 0.014)
+
+
+# number of pixels processed at once by de2000_array
+# the temporary arrays of a chunk fit in the CPU cache
+DE2000_CHUNK_SIZE = 1 << 11
+
+# the array version of de2000 avoids most of the trigonometric functions
+# delta H' is calculated from delta H'^2 = delta a'^2 + delta b^2 - delta C'^2
+# (= 2 (C1'C2' - a1'a2' - b1b2) but with less cancellation error), its sign
+# is the sign of sin(h2' - h1'), the mean hue h_bar' is the direction of the sum
+# of the unit (a', b) vectors, which is the mean angle on the shorter arc,
+# and T is calculated from cos and sin of h_bar' with the multiple angle identities
+_TINY = np.finfo(np.float64).tiny
+_COS_30 = math.cos(math.radians(30))
+_SIN_30 = math.sin(math.radians(30))
+_COS_6 = math.cos(math.radians(6))
+_SIN_6 = math.sin(math.radians(6))
+_COS_63 = math.cos(math.radians(63))
+_SIN_63 = math.sin(math.radians(63))
+
+
+def _de2000_chunk(Lab1, Lab2, kL, kC, kH, C1=None, C2=None):
+    L1, a1, b1 = _Lab_channels(Lab1)
+    L2, a2, b2 = _Lab_channels(Lab2)
+    # a' with the G factor
+    if C1 is None:
+        C1 = np.sqrt(a1 * a1 + b1 * b1)
+
+    if C2 is None:
+        C2 = np.sqrt(a2 * a2 + b2 * b2)
+
+    C_bar7 = ((C1 + C2) / 2) ** 7
+    one_plus_G = 1.5 - 0.5 * np.sqrt(C_bar7 / (C_bar7 + 25**7))
+    a1p = one_plus_G * a1
+    a2p = one_plus_G * a2
+    C1p = np.sqrt(a1p * a1p + b1 * b1)
+    C2p = np.sqrt(a2p * a2p + b2 * b2)
+    # unit (a', b) vectors, 0 if achromatic since then a' and b are 0
+    inv_C1p = 1 / np.maximum(C1p, _TINY)
+    inv_C2p = 1 / np.maximum(C2p, _TINY)
+    cos_h1 = a1p * inv_C1p
+    sin_h1 = b1 * inv_C1p
+    cos_h2 = a2p * inv_C2p
+    sin_h2 = b2 * inv_C2p
+    # delta H', sign and opposite hues are found from a and b like de2000
+    cross = a1 * b2 - b1 * a2
+    opposite = (cross == 0) & (a1 * a2 + b1 * b2 < 0) & (C1p * C2p != 0)
+    delta_ap = a2p - a1p
+    delta_b = b2 - b1
+    delta_Cp = C2p - C1p
+    delta_Hp = np.sqrt(
+        np.maximum(delta_ap * delta_ap + delta_b * delta_b - delta_Cp * delta_Cp, 0.0)
+    )
+    # mean hue, h_bar' is the lower hue + 90 for the opposite hues
+    cos_h = cos_h1 + cos_h2
+    sin_h = sin_h1 + sin_h2
+    if opposite.any():
+        first_is_lower = (b1 > 0) | ((b1 == 0) & (a1 > 0))
+        cross = np.where(opposite, np.where(first_is_lower, 1.0, -1.0), cross)
+        lower_cos = np.where(first_is_lower, cos_h1, cos_h2)
+        lower_sin = np.where(first_is_lower, sin_h1, sin_h2)
+        cos_h[opposite] = -lower_sin[opposite]
+        sin_h[opposite] = lower_cos[opposite]
+
+    delta_Hp = np.copysign(delta_Hp, cross)
+    norm = np.sqrt(cos_h * cos_h + sin_h * sin_h)
+    # h_bar' is 0 if both are achromatic
+    achromatic = norm == 0
+    cos_h[achromatic] = 1.0
+    norm[achromatic] = 1.0
+    cos_h /= norm
+    sin_h /= norm
+    h_barp = np.degrees(np.arctan2(sin_h, cos_h))
+    h_barp[h_barp < 0] += 360
+    # weighting functions
+    cos_2h = cos_h * cos_h - sin_h * sin_h
+    sin_2h = 2 * sin_h * cos_h
+    cos_3h = cos_2h * cos_h - sin_2h * sin_h
+    sin_3h = sin_2h * cos_h + cos_2h * sin_h
+    cos_4h = cos_2h * cos_2h - sin_2h * sin_2h
+    sin_4h = 2 * sin_2h * cos_2h
+    T = (
+        1
+        - 0.17 * (cos_h * _COS_30 + sin_h * _SIN_30)
+        + 0.24 * cos_2h
+        + 0.32 * (cos_3h * _COS_6 - sin_3h * _SIN_6)
+        - 0.20 * (cos_4h * _COS_63 + sin_4h * _SIN_63)
+    )
+    L_barp_50 = ((L1 + L2) / 2 - 50) ** 2
+    C_barp = (C1p + C2p) / 2
+    SL = 1 + (0.015 * L_barp_50) / np.sqrt(20 + L_barp_50)
+    SC = 1 + 0.045 * C_barp
+    SH = 1 + 0.015 * C_barp * T
+    # hue rotation term
+    delta_theta = 30 * np.exp(-(((h_barp - 275) / 25) ** 2))
+    C_barp7 = C_barp**7
+    RC = 2 * np.sqrt(C_barp7 / (C_barp7 + 25**7))
+    RT = -np.sin(np.radians(2 * delta_theta)) * RC
+    dL = (L2 - L1) / (kL * SL)
+    dC = delta_Cp / (kC * SC)
+    dH = delta_Hp / (kH * SH)
+    return np.sqrt(np.maximum(dL * dL + dC * dC + dH * dH + RT * dC * dH, 0.0))
+
+
+# C1 and C2 are the chroma of Lab1 and Lab2 if they are already known
+def de2000_array(Lab1, Lab2, kL=1.0, kC=1.0, kH=1.0, C1=None, C2=None):
+    """Return the CIEDE2000 delta E of the Lab arrays with shape (..., 3)."""
+    Lab1, Lab2 = np.broadcast_arrays(np.asarray(Lab1), np.asarray(Lab2))
+    shape = Lab1.shape[:-1]
+    Lab1 = Lab1.reshape(-1, 3)
+    Lab2 = Lab2.reshape(-1, 3)
+    if C1 is not None:
+        C1 = np.broadcast_to(C1, shape).reshape(-1)
+
+    if C2 is not None:
+        C2 = np.broadcast_to(C2, shape).reshape(-1)
+
+    out = np.empty(Lab1.shape[0], dtype=np.float64)
+    for i in range(0, Lab1.shape[0], DE2000_CHUNK_SIZE):
+        chunk = slice(i, i + DE2000_CHUNK_SIZE)
+        out[chunk] = _de2000_chunk(
+            Lab1[chunk],
+            Lab2[chunk],
+            kL,
+            kC,
+            kH,
+            None if C1 is None else C1[chunk],
+            None if C2 is None else C2[chunk],
+        )
+
+    return out.reshape(shape)
@@ -0,0 +1,102 @@
+# SPDX-FileCopyrightText: 2025 Mete Balci
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+# color difference formulas of 8-bit Lab images (Pillow LAB mode)
+#
+# L is 0...255 for 0...100, a and b are signed bytes -128...127, LittleCMS
+# encodes them with a +128 offset but Pillow converts them to signed bytes,
+# so the bytes are decoded before the formulas, otherwise L is scaled by 2.55
+# and a negative a or b (e.g. -1 is 255) is far from a positive one
+#
+# there are only 65536 (a, b) pairs, so the chroma sqrt(a^2 + b^2) of all
+# pairs is calculated once per process, and looked up with a and b bytes as a
+# little endian 16-bit index, the lookup table has the same values as
+# calculated per pixel so the results do not change
+
+import functools
+
+import numpy as np
+
+from .formulas import de76_array, de94_array, de2000_array
+
+LAB8_L_SCALE = 100 / 255
+
+
+def decode_Lab8(Lab):
+    """Return the float L, a, b of 8-bit Lab with shape (..., 3)."""
+    Lab = np.asarray(Lab, dtype=np.uint8)
+    decoded = np.empty(Lab.shape, dtype=np.float64)
+    np.multiply(Lab[..., 0], LAB8_L_SCALE, out=decoded[..., 0])
+    decoded[..., 1:] = Lab[..., 1:].view(np.int8)
+    return decoded
+
+
+def encode_Lab8(Lab):
+    """Return the 8-bit Lab of float L, a, b with shape (..., 3)."""
+    Lab = np.asarray(Lab)
+    encoded = np.empty_like(Lab, dtype=np.uint8)
+    # rounded by truncating the value + 0.5, a and b with a +128 offset so
+    # they are not negative, then the offset is converted to the signed bytes
+    encoded[..., 0] = np.clip(Lab[..., 0] * (1 / LAB8_L_SCALE) + 0.5, 0, 255)
+    encoded[..., 1:] = np.clip(Lab[..., 1:] + 128.5, 0, 255)
+    encoded[..., 1:] ^= 0x80
+    return encoded
+
+
+def get_ab_index(Lab):
+    """Return the lookup table index, a + 256 b, of 8-bit Lab with shape (..., 3)."""
+    Lab = np.ascontiguousarray(Lab, dtype=np.uint8)
+    return Lab[..., 1:].view("<u2")[..., 0]
+
+
+@functools.lru_cache(maxsize=None)
+def get_chroma_lut():
+    """Return the chroma lookup table."""
+    index = np.arange(1 << 16, dtype="<u2")
+    a = (index & 0xFF).astype(np.uint8).view(np.int8).astype(np.float64)
+    b = (index >> 8).astype(np.uint8).view(np.int8).astype(np.float64)
+    C = np.sqrt(a * a + b * b)
+    C.flags.writeable = False
+    return C
+
+
+def get_chroma(Lab):
+    """Return the chroma of 8-bit Lab with shape (..., 3)."""
+    return get_chroma_lut()[get_ab_index(Lab)]
+
+
+def de76_Lab8(Lab1, Lab2):
+    return de76_array(decode_Lab8(Lab1), decode_Lab8(Lab2))
+
+
+def de94_Lab8(Lab1, Lab2, kL, K1, K2):
+    return de94_array(
+        decode_Lab8(Lab1),
+        decode_Lab8(Lab2),
+        kL,
+        K1,
+        K2,
+        get_chroma(Lab1),
+        get_chroma(Lab2),
+    )
+
+
+def de94_for_graphic_arts_Lab8(Lab1, Lab2):
+    return de94_Lab8(Lab1, Lab2, 1.0, 0.045, 0.015)
+
+
+def de94_for_textiles_Lab8(Lab1, Lab2):
+    return de94_Lab8(Lab1, Lab2, 2.0, 0.048, 0.014)
+
+
+def de2000_Lab8(Lab1, Lab2, kL=1.0, kC=1.0, kH=1.0):
+    return de2000_array(
+        decode_Lab8(Lab1),
+        decode_Lab8(Lab2),
+        kL,
+        kC,
+        kH,
+        get_chroma(Lab1),
+        get_chroma(Lab2),
+    )
@@ -0,0 +1,163 @@
+# SPDX-FileCopyrightText: 2025 Mete Balci
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+# the options of a proof, used by the command line before the images are
+# processed, so this module does not import NumPy, Pillow or the other
+# modules of benekli at load time, the methods import what they need, see
+# cli.py
+
+import logging
+import os
+import sys
+
+logger = logging.getLogger(__name__)
+
+# delta E heatmap colors
+# de <= DE_THRESHOLDS[i] is colored with DE_PALETTE[i], except the last band,
+# which is a gradient from DE_PALETTE[-2] to DE_PALETTE[-1] between the last
+# two thresholds, de above the last threshold is colored with DE_PALETTE[-1]
+DE_THRESHOLDS = (1.0, 2.0, 3.0, 8.0)
+DE_PALETTE = (
+    # green
+    (0, 0xFF, 0),
+    # yellow
+    (0xFF, 0xFF, 0),
+    # orange
+    (0xFF, 0x45, 0),
+    # red gradient from light red to red
+    (0xFF, 140, 140),
+    (0xFF, 0, 0),
+)
+
+
+class ProofError(ValueError):
+    """An invalid image, profile or option, raised by the library API instead
+    of exiting like err."""
+
+
+def err(s):
+    logger.error(s)
+    sys.exit(1)
+
+
+class CommandOptions:
+
+    def __init__(self):
+        self.bpc = False
+        # --cprofile and --tracemalloc, see timings.profile
+        self.cprofile_filename = None
+        self.de_formula = "cie76"
+        self.de_direct = False
+        self.de_filename = None
+        self.de_float = False
+        self.de_lut = False
+        self.de_palette = DE_PALETTE
+        self.de_processes = 1
+        self.de_stats_filename = None
+        self.de_thresholds = DE_THRESHOLDS
+        self.display_profile_filename = None
+        self.gamut_check = False
+        self.input_filename = None
+        self.input_profile_filename = None
+        self.lut_cache_dir = None
+        # bytes, the image is processed in strips if it is given
+        self.memory_budget = None
+        self.output_filename = None
+        self.rendering_intent = "p"
+        self.simulated_profile_filename = None
+        self.sweep = False
+        self.sweep_threads = 1
+        self.threads = os.cpu_count() or 1
+        # the Timings of the run, set by run_with_opts
+        self.timings = None
+        self.timings_filename = None
+        self.tracemalloc_filename = None
+
+    def load_from_args(self, args):
+        self.bpc = args.bpc
+        self.cprofile_filename = args.cprofile
+        self.de_formula = args.de_formula
+        self.de_direct = args.de_direct
+        self.de_filename = args.output_de
+        self.de_float = args.de_float
+        self.de_lut = args.de_lut
+        self.de_palette = args.de_palette
+        self.de_processes = args.de_processes
+        self.de_stats_filename = args.output_de_stats
+        self.de_thresholds = args.de_thresholds
+        self.display_profile_filename = args.display_profile
+        self.gamut_check = args.gamut_check
+        self.input_filename = args.input_image
+        self.input_profile_filename = args.input_profile
+        self.lut_cache_dir = args.lut_cache
+        self.memory_budget = None
+        if args.memory_budget is not None:
+            self.memory_budget = args.memory_budget * 1024 * 1024
+
+        self.output_filename = args.output_image
+        self.rendering_intent = args.rendering_intent
+        self.simulated_profile_filename = args.simulated_profile
+        self.sweep = args.sweep
+        self.sweep_threads = args.sweep_threads
+        self.threads = args.threads
+        self.timings_filename = args.timings
+        self.tracemalloc_filename = args.tracemalloc
+
+    def get_color_difference_formula(self):
+        from .formulas import de76_array, de94_for_graphic_arts_array, de2000_array
+        from .lab8 import de76_Lab8, de94_for_graphic_arts_Lab8, de2000_Lab8
+
+        # the float Lab of FloatLab, or the 8-bit Lab of the LAB images
+        if self.de_formula == "cie76":
+            return de76_array if self.de_float else de76_Lab8
+
+        elif self.de_formula == "cie94":
+            if self.de_float:
+                return de94_for_graphic_arts_array
+
+            return de94_for_graphic_arts_Lab8
+
+        elif self.de_formula == "ciede2000":
+            return de2000_array if self.de_float else de2000_Lab8
+
+        else:
+            err("invalid de_formula: %s" % self.de_formula)
+
+    def needs_de(self):
+        return self.de_filename is not None or self.de_stats_filename is not None
+
+    def needs_display_profile(self):
+        # delta E direct does not use the display
+        return self.output_filename is not None or not self.de_direct
+
+    def get_proof_flags(self, gamut_check=True):
+        from PIL import ImageCms
+
+        return (
+            (ImageCms.Flags.SOFTPROOFING)
+            | (ImageCms.Flags.BLACKPOINTCOMPENSATION if self.bpc else 0)
+            | (ImageCms.Flags.GAMUTCHECK if self.gamut_check and gamut_check else 0)
+        )
+
+    def get_rendering_intent(self):
+        from PIL import ImageCms
+
+        if self.rendering_intent == "p":
+            return ImageCms.Intent.PERCEPTUAL
+        elif self.rendering_intent == "s":
+            return ImageCms.Intent.SATURATION
+        elif self.rendering_intent == "r":
+            return ImageCms.Intent.RELATIVE_COLORIMETRIC
+        elif self.rendering_intent == "a":
+            return ImageCms.Intent.ABSOLUTE_COLORIMETRIC
+        else:
+            err("invalid rendering_intent: %s" % self.rendering_intent)
+
+
+def get_default_lut_cache_dir():
+    cache_home = os.environ.get("XDG_CACHE_HOME")
+    if not cache_home:
+        cache_home = os.path.join(os.path.expanduser("~"), ".cache")
+
+    return os.path.join(cache_home, "benekli", "luts")
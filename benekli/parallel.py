@@ -0,0 +1,165 @@
+# SPDX-FileCopyrightText: 2025 Mete Balci
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+# delta E of large images in worker processes
+#
+# the Lab pixels and the delta E colors are in multiprocessing.shared_memory
+# blocks, the worker processes attach to them by name, so only the names and
+# the pixel ranges are sent to the workers, and only the statistics of the
+# ranges are sent back
+#
+# the workers are started once (spawn, the main process can have threads) and
+# reused by the later calls
+
+import concurrent.futures
+import multiprocessing
+import threading
+from multiprocessing import shared_memory
+from typing import Callable
+
+import numpy as np
+
+from .stats import DeStatistics
+from .unique import get_unique_de
+
+# number of ranges per process, so a slower process does not keep the others
+# waiting at the end
+RANGES_PER_PROCESS = 4
+
+_executors = {}
+_executors_lock = threading.Lock()
+
+
+def get_executor(processes):
+    """Return the process pool of processes workers, started at the first call."""
+    with _executors_lock:
+        if processes not in _executors:
+            _executors[processes] = concurrent.futures.ProcessPoolExecutor(
+                processes, mp_context=multiprocessing.get_context("spawn")
+            )
+
+        return _executors[processes]
+
+
+def shutdown():
+    """Stop the worker processes."""
+    with _executors_lock:
+        for executor in _executors.values():
+            executor.shutdown()
+
+        _executors.clear()
+
+
+def create_shared_array(a):
+    """Return a shared memory block with a copy of the array a."""
+    block = shared_memory.SharedMemory(create=True, size=max(1, a.nbytes))
+    np.ndarray(a.shape, a.dtype, buffer=block.buf)[...] = a
+    return block
+
+
+def _de_range(
+    names,
+    size,
+    start,
+    end,
+    de_formula,
+    colorizer,
+    chunk_size,
+    with_statistics,
+):
+    """Calculate delta E of the pixels start to end in a worker process."""
+    blocks = [
+        None if name is None else shared_memory.SharedMemory(name=name)
+        for name in names
+    ]
+    Lab1 = Lab2 = colors = None
+    try:
+        Lab1, Lab2, colors = [
+            None if block is None else np.ndarray((size, 3), np.uint8, block.buf)
+            for block in blocks
+        ]
+        statistics = DeStatistics() if with_statistics else None
+        de_formula = get_unique_de(de_formula)
+        for chunk_start in range(start, end, chunk_size):
+            chunk_end = min(chunk_start + chunk_size, end)
+            de = de_formula(Lab1[chunk_start:chunk_end], Lab2[chunk_start:chunk_end])
+            if colors is not None:
+                colors[chunk_start:chunk_end] = colorizer(de)
+
+            if statistics is not None:
+                statistics.update(de)
+
+        return statistics
+
+    finally:
+        # the arrays must be released before the blocks are closed
+        Lab1 = Lab2 = colors = None
+        for block in blocks:
+            if block is not None:
+                block.close()
+
+
+def process_de(
+    de_formula: Callable[[np.ndarray, np.ndarray], np.ndarray],
+    Lab1,
+    Lab2,
+    processes,
+    chunk_size,
+    colorizer: Callable[[np.ndarray], np.ndarray] = None,
+    statistics: DeStatistics = None,
+):
+    """Calculate delta E of the (n, 3) Lab arrays in worker processes.
+
+    Return the (n, 3) colors of colorizer(de) if colorizer is given, and
+    update statistics with delta E if it is given. de_formula and colorizer
+    must be picklable (module level functions or their partials)."""
+    size = len(Lab1)
+    blocks = []
+    try:
+        blocks.append(create_shared_array(Lab1))
+        blocks.append(create_shared_array(Lab2))
+        names = [blocks[0].name, blocks[1].name, None]
+        if colorizer is not None:
+            blocks.append(
+                shared_memory.SharedMemory(create=True, size=max(1, size * 3))
+            )
+            names[2] = blocks[2].name
+
+        # ranges of whole chunks
+        chunks = -(-size // chunk_size)
+        ranges = min(chunks, processes * RANGES_PER_PROCESS)
+        futures = []
+        executor = get_executor(processes)
+        for i in range(ranges):
+            start = chunks * i // ranges * chunk_size
+            end = min(chunks * (i + 1) // ranges * chunk_size, size)
+            futures.append(
+                executor.submit(
+                    _de_range,
+                    names,
+                    size,
+                    start,
+                    end,
+                    de_formula,
+                    colorizer,
+                    chunk_size,
+                    statistics is not None,
+                )
+            )
+
+        for future in futures:
+            range_statistics = future.result()
+            if statistics is not None:
+                statistics.merge(range_statistics)
+
+        colors = None
+        if colorizer is not None:
+            colors = np.ndarray((size, 3), np.uint8, blocks[2].buf).copy()
+
+        return colors
+
+    finally:
+        for block in blocks:
+            block.close()
+            block.unlink()
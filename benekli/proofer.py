@@ -0,0 +1,234 @@
+# SPDX-FileCopyrightText: 2025 Mete Balci
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+# the library API of benekli, SoftProofer soft proofs in-memory images with
+# the profiles of a setup opened, checked and built into transforms once
+#
+# run_with_opts reads and writes files and exits the process on an error like
+# the command line, SoftProofer raises ProofError instead, and it does not
+# change after it is created, the transforms are only applied, so one
+# SoftProofer can be used by many threads at the same time, the same way the
+# bands of an image are transformed in parallel, see apply_in_bands
+#
+# the images are PIL images in RGB or LAB mode, or NumPy arrays with the
+# shape (height, width, 3), uint8 arrays are RGB and float arrays are
+# L*, a*, b*, the Lab colors are returned as float32 arrays, like --de-float
+# the matrix/TRC profiles are converted to Lab in NumPy and the others by
+# LittleCMS in 8-bit
+
+import logging
+import os
+
+import numpy as np
+from PIL import Image, ImageCms
+
+from . import cache
+from .benekli import DE_CHUNK_SIZE, FloatLab, apply_in_bands, check_display_profile
+from .benekli import check_image_profile, check_simulated_profile
+from .benekli import float_Lab_transform, get_Lab_transform
+from .lab8 import decode_Lab8, encode_Lab8
+from .options import CommandOptions, ProofError
+
+logger = logging.getLogger(__name__)
+
+
+def open_profile(profile, name):
+    """Return the ImageCmsProfile of a filename, the bytes of an ICC profile or
+    an ImageCmsProfile."""
+    if isinstance(profile, ImageCms.ImageCmsProfile):
+        return profile
+
+    try:
+        if isinstance(profile, (bytes, bytearray)):
+            return cache.get_profile_from_bytes(bytes(profile))
+
+        if isinstance(profile, (str, os.PathLike)):
+            return cache.get_profile(profile)
+
+    except OSError as e:
+        # PyCMSError is an OSError too
+        raise ProofError("cannot open %s profile: %s" % (name, e)) from e
+
+    raise ProofError("invalid %s profile: %r" % (name, profile))
+
+
+def check_array(array):
+    if array.ndim != 3 or array.shape[2] != 3:
+        raise ProofError(
+            "image array shape is not (height, width, 3): %s" % (array.shape,)
+        )
+
+
+def is_float_Lab(image):
+    return isinstance(image, np.ndarray) and np.issubdtype(image.dtype, np.floating)
+
+
+def to_image(image):
+    """Return the PIL image of an image or an array."""
+    if isinstance(image, Image.Image):
+        if image.mode not in ("RGB", "LAB"):
+            raise ProofError("image mode is neither RGB nor LAB: %s" % image.mode)
+
+        return image
+
+    array = np.asarray(image)
+    check_array(array)
+    if array.dtype == np.uint8:
+        return Image.fromarray(array, mode="RGB")
+
+    if is_float_Lab(array):
+        return Image.fromarray(encode_Lab8(array), mode="LAB")
+
+    raise ProofError("image array is neither uint8 RGB nor float Lab: %s" % array.dtype)
+
+
+def to_array(float_Lab: FloatLab):
+    """Return the (height, width, 3) float32 Lab of a FloatLab."""
+    width, height = float_Lab.size
+    Lab = np.empty((width * height, 3), dtype=np.float32)
+    for start in range(0, len(Lab), DE_CHUNK_SIZE):
+        end = start + DE_CHUNK_SIZE
+        Lab[start:end] = float_Lab.get(start, end)
+
+    return Lab.reshape(height, width, 3)
+
+
+class SoftProofer:
+    """Soft proof images of the input profile on the display as they would
+    be printed with the simulated profile.
+
+    The profiles are filenames, ICC profile bytes or ImageCmsProfiles, the
+    input profile is sRGB if it is not given, the embedded profiles of the
+    images are not used. rendering_intent is p, r, s or a like -r, de_formula
+    is cie76, cie94 or ciede2000, and the images are transformed in bands in
+    threads threads. An invalid profile or option raises ProofError."""
+
+    def __init__(
+        self,
+        simulated_profile,
+        display_profile,
+        input_profile=None,
+        rendering_intent="p",
+        bpc=False,
+        gamut_check=False,
+        de_formula="cie76",
+        threads=1,
+    ):
+        if rendering_intent not in ("p", "r", "s", "a"):
+            raise ProofError("invalid rendering intent: %s" % rendering_intent)
+
+        if de_formula not in ("cie76", "cie94", "ciede2000"):
+            raise ProofError("invalid delta E formula: %s" % de_formula)
+
+        self.opts = CommandOptions()
+        self.opts.rendering_intent = rendering_intent
+        self.opts.bpc = bpc
+        self.opts.gamut_check = gamut_check
+        self.opts.de_formula = de_formula
+        self.opts.de_float = True
+        self.opts.threads = threads
+        self.de_formula = self.opts.get_color_difference_formula()
+
+        if input_profile is None:
+            self.input_profile = cache.get_built_profile("sRGB")
+
+        else:
+            self.input_profile = open_profile(input_profile, "input")
+
+        self.simulated_profile = open_profile(simulated_profile, "simulated")
+        self.display_profile = open_profile(display_profile, "display")
+        check_image_profile("RGB", self.input_profile.profile)
+        check_simulated_profile(
+            self.simulated_profile.profile, self.opts.get_rendering_intent()
+        )
+        check_display_profile(self.display_profile.profile)
+
+        self.transforms = {
+            "proof": self.get_proof_transform("RGB"),
+            "input_Lab": get_Lab_transform(self.input_profile),
+            "output_Lab": get_Lab_transform(self.display_profile),
+        }
+        shapers = {}
+        for name, profile in (
+            ("input_Lab", self.input_profile),
+            ("output_Lab", self.display_profile),
+        ):
+            shaper = cache.get_matrix_shaper(profile)
+            if shaper is not None:
+                shapers[name] = shaper
+
+        self.float_transform = float_Lab_transform(self.transform, shapers)
+
+    def get_proof_transform(self, mode):
+        # the proof transform of the Lab images is built on the first one
+        return cache.get_proof_transform(
+            self.input_profile if mode == "RGB" else cache.get_built_profile("LAB"),
+            self.display_profile,
+            self.simulated_profile,
+            mode,
+            "RGB",
+            ImageCms.Intent.ABSOLUTE_COLORIMETRIC,
+            self.opts.get_rendering_intent(),
+            self.opts.get_proof_flags(),
+        )
+
+    def transform(self, name, image):
+        if name == "proof" and image.mode == "LAB":
+            transform = self.get_proof_transform("LAB")
+
+        else:
+            transform = self.transforms[name]
+
+        return apply_in_bands(transform.point, image, self.opts.threads)
+
+    def proof(self, image):
+        """Return the soft proof of an image in the display profile, an image
+        for an image and an array for an array."""
+        proof_image = self.transform("proof", to_image(image))
+        if isinstance(image, Image.Image):
+            return proof_image
+
+        return np.asarray(proof_image)
+
+    def lab(self, image):
+        """Return the float32 Lab of an image, the input colors of RGB."""
+        if is_float_Lab(image):
+            # already Lab, not rounded to 8-bit
+            check_array(image)
+            return image.astype(np.float32)
+
+        image = to_image(image)
+        if image.mode == "LAB":
+            return to_array(FloatLab(image, decode_Lab8))
+
+        return to_array(self.float_transform("input_Lab", image))
+
+    def proof_lab(self, image):
+        """Return the float32 Lab of the soft proof of an image on the display,
+        the simulated colors."""
+        proof_image = self.transform("proof", to_image(image))
+        return to_array(self.float_transform("output_Lab", proof_image))
+
+    def delta_e(self, a, b):
+        """Return the float32 delta E between the colors of two images with the
+        shape (height, width), the images and the uint8 arrays are converted
+        with lab, e.g. delta_e(image, proof_lab(image)) is the delta E of the
+        soft proof of image."""
+        Lab1 = self.lab(a)
+        Lab2 = self.lab(b)
+        if Lab1.shape != Lab2.shape:
+            raise ProofError(
+                "image sizes are not the same: %s and %s"
+                % (Lab1.shape[1::-1], Lab2.shape[1::-1])
+            )
+
+        de = np.empty(Lab1.shape[:2], dtype=np.float32)
+        Lab1 = Lab1.reshape(-1, 3)
+        Lab2 = Lab2.reshape(-1, 3)
+        de_flat = de.reshape(-1)
+        for start in range(0, len(Lab1), DE_CHUNK_SIZE):
+            end = start + DE_CHUNK_SIZE
+            de_flat[start:end] = self.de_formula(Lab1[start:end], Lab2[start:end])
+
+        return de
@@ -0,0 +1,384 @@
+# SPDX-FileCopyrightText: 2025 Mete Balci
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+# benekli rank evaluates all simulated profile, rendering intent and bpc
+# combinations of an image and ranks them by an objective
+#
+# all candidates are first evaluated on a downsampled image, and only the
+# top-N of them are evaluated again with the full resolution image
+#
+# the out of gamut fraction is only evaluated if it is the objective, building
+# a transform with the gamut check takes several times longer
+#
+# with --timings, a record is written per evaluation of a candidate, so per
+# candidate for the preview and again for the top-N with the full resolution
+
+import argparse
+import copy
+import json
+import logging
+
+import numpy as np
+from PIL import Image, ImageCms
+
+from . import cache, timings
+from .benekli import apply_in_bands, build_transforms, calculate_de_statistics
+from .benekli import float_Lab_transform, get_input_Lab, get_Lab_shapers
+from .benekli import get_proof_Lab, get_proof_transform_name, get_sweep_variants
+from .benekli import open_profiles
+from .cli import add_common_arguments, check_features, setup_logging
+from .options import CommandOptions, err
+from .stats import DeStatistics
+
+logger = logging.getLogger(__name__)
+
+# lower is better for all objectives
+OBJECTIVES = ["mean", "median", "p95", "p99", "max", "out_of_gamut"]
+DEFAULT_TOP = 3
+DEFAULT_PREVIEW_SIZE = 256
+
+
+class Candidate:
+    """A simulated profile, rendering intent and bpc combination."""
+
+    def __init__(self, opts: CommandOptions, profiles, transforms):
+        self.opts = opts
+        self.profiles = profiles
+        self.transforms = transforms
+        self.result = None
+        self.resolution = None
+
+    def transform(self, name, image):
+        return apply_in_bands(self.transforms[name].point, image, self.opts.threads)
+
+    def get_out_of_gamut_fraction(self, input_image, proof):
+        """Return the fraction of the pixels marked by the LittleCMS gamut check.
+
+        The pixels whose proof differs from the proof with the gamut check are
+        out of gamut, a pixel whose proof is the alarm color is not counted."""
+        image_cms_profile, simulated_cms_profile, display_cms_profile = self.profiles
+        if self.opts.de_direct:
+            output_cms_profile = cache.get_built_profile("LAB")
+
+        else:
+            output_cms_profile = display_cms_profile
+
+        gamut_check = cache.get_proof_transform(
+            image_cms_profile,
+            output_cms_profile,
+            simulated_cms_profile,
+            input_image.mode,
+            proof.mode,
+            ImageCms.Intent.ABSOLUTE_COLORIMETRIC,
+            self.opts.get_rendering_intent(),
+            self.opts.get_proof_flags(gamut_check=False) | ImageCms.Flags.GAMUTCHECK,
+        )
+        differs = np.any(
+            np.asarray(proof) != np.asarray(gamut_check.point(input_image)), axis=-1
+        )
+        if differs.size == 0:
+            return 0.0
+
+        return float(np.count_nonzero(differs) / differs.size)
+
+    def evaluate(self, input_image, resolution, out_of_gamut=False):
+        """Evaluate the delta E statistics, and the out of gamut fraction.
+
+        The stages are timed like run_with_opts, and the record of the
+        evaluation is appended to opts.timings_filename if it is given."""
+        evaluation_timings = timings.Timings(
+            input=self.opts.input_filename,
+            simulated_profile=self.opts.simulated_profile_filename,
+            rendering_intent=self.opts.rendering_intent,
+            bpc=self.opts.bpc,
+            resolution=resolution,
+        )
+        try:
+            with evaluation_timings.run():
+                self._evaluate(evaluation_timings, input_image, out_of_gamut)
+
+        finally:
+            if self.opts.timings_filename is not None:
+                timings.write_record(
+                    self.opts.timings_filename, evaluation_timings.record
+                )
+
+        self.resolution = resolution
+
+    def _evaluate(self, evaluation_timings, input_image, out_of_gamut):
+        transform = self.transform
+        if self.opts.de_float:
+            transform = float_Lab_transform(
+                transform, get_Lab_shapers(self.opts, input_image)
+            )
+
+        with timings.stage(evaluation_timings, "input_Lab"):
+            input_image_Lab = get_input_Lab(self.opts, input_image, transform)
+
+        output_image = None
+        if not self.opts.de_direct:
+            with timings.stage(evaluation_timings, "proof"):
+                output_image = transform(
+                    get_proof_transform_name(self.opts), input_image
+                )
+
+        with timings.stage(evaluation_timings, "proof_Lab"):
+            output_image_Lab = get_proof_Lab(
+                self.opts, input_image, transform, output_image
+            )
+
+        statistics = DeStatistics()
+        with timings.stage(evaluation_timings, "de_statistics"):
+            calculate_de_statistics(
+                self.opts.get_color_difference_formula(),
+                input_image_Lab,
+                output_image_Lab,
+                statistics,
+                self.opts.de_processes,
+            )
+
+        self.result = statistics.to_dict()
+        self.result["out_of_gamut"] = None
+        if out_of_gamut:
+            proof = output_image
+            if self.opts.de_direct:
+                proof = output_image_Lab
+                if self.opts.de_float:
+                    proof = output_image_Lab.image
+
+            with timings.stage(evaluation_timings, "out_of_gamut"):
+                self.result["out_of_gamut"] = self.get_out_of_gamut_fraction(
+                    input_image, proof
+                )
+
+    def get_objective(self, objective):
+        value = self.result[objective]
+        # no pixels
+        return float("inf") if value is None else value
+
+    def to_dict(self):
+        d = {
+            "simulated_profile": self.opts.simulated_profile_filename,
+            "rendering_intent": self.opts.rendering_intent,
+            "bpc": self.opts.bpc,
+            "resolution": self.resolution,
+        }
+        d.update(self.result)
+        return d
+
+
+def create_candidates(opts: CommandOptions, input_image, simulated_profile_filenames):
+    """Create the candidates of all simulated profiles, intents and bpc."""
+    candidates = []
+    for simulated_profile_filename in simulated_profile_filenames:
+        profile_opts = copy.copy(opts)
+        profile_opts.simulated_profile_filename = simulated_profile_filename
+        # all intents are evaluated, the unsupported ones are skipped
+        profile_opts.sweep = True
+        profiles = open_profiles(profile_opts, input_image)
+        variants = get_sweep_variants(profile_opts, profiles[1].profile)
+        transforms = build_transforms(
+            profile_opts, input_image, variants, *profiles, de=True
+        )
+        for variant_opts in variants:
+            candidates.append(Candidate(variant_opts, profiles, transforms))
+
+    return candidates
+
+
+def get_preview_image(input_image, preview_size):
+    """Return the image downsampled to fit in preview_size x preview_size."""
+    preview_image = input_image.copy()
+    # a and b of 8-bit Lab are signed, they cannot be averaged as bytes
+    if input_image.mode == "LAB":
+        resample = Image.Resampling.NEAREST
+
+    else:
+        resample = Image.Resampling.BOX
+
+    preview_image.thumbnail((preview_size, preview_size), resample)
+    return preview_image
+
+
+def rank(candidates, input_image, objective, top=DEFAULT_TOP, preview_size=None):
+    """Return the candidates ranked by the objective, the best first.
+
+    If preview_size is given, all candidates are evaluated with the image
+    downsampled to preview_size, and only the top of them with the full
+    resolution image. The rest keep their preview results and are ranked after
+    the top."""
+    out_of_gamut = objective == "out_of_gamut"
+    remaining = list(candidates)
+    if preview_size is not None and max(input_image.size) > preview_size:
+        preview_image = get_preview_image(input_image, preview_size)
+        logger.info(
+            "evaluating %d candidates with %dx%d preview"
+            % (len(candidates), preview_image.size[0], preview_image.size[1])
+        )
+        for candidate in candidates:
+            candidate.evaluate(preview_image, "preview", out_of_gamut)
+
+        remaining.sort(key=lambda c: c.get_objective(objective))
+        full, pruned = remaining[:top], remaining[top:]
+
+    else:
+        full, pruned = remaining, []
+
+    logger.info("evaluating %d candidates with full resolution" % len(full))
+    for candidate in full:
+        candidate.evaluate(input_image, "full", out_of_gamut)
+
+    full.sort(key=lambda c: c.get_objective(objective))
+    return full + pruned
+
+
+def print_ranking(ranking, objective):
+    print(
+        "%4s  %-32s %6s %5s %8s %8s %8s %8s %8s %8s  %s"
+        % (
+            "rank",
+            "simulated profile",
+            "intent",
+            "bpc",
+            "mean",
+            "median",
+            "p95",
+            "p99",
+            "max",
+            "gamut%",
+            "resolution",
+        )
+    )
+    for i, candidate in enumerate(ranking):
+        r = candidate.result
+
+        def f(value):
+            return "-" if value is None else "%.2f" % value
+
+        print(
+            "%4d  %-32s %6s %5s %8s %8s %8s %8s %8s %8s  %s"
+            % (
+                i + 1,
+                candidate.opts.simulated_profile_filename[-32:],
+                candidate.opts.rendering_intent,
+                "yes" if candidate.opts.bpc else "no",
+                f(r["mean"]),
+                f(r["median"]),
+                f(r["p95"]),
+                f(r["p99"]),
+                f(r["max"]),
+                f(None if r["out_of_gamut"] is None else 100 * r["out_of_gamut"]),
+                candidate.resolution,
+            )
+        )
+
+    print("ranked by %s" % objective)
+
+
+def run(argv=None):
+    opts = CommandOptions()
+    parser = argparse.ArgumentParser(
+        prog="benekli rank",
+        description="rank the simulated profile, rendering intent and bpc "
+        "combinations of an image by delta E or out of gamut pixels",
+    )
+    add_common_arguments(parser, opts)
+    parser.add_argument(
+        "-i",
+        "--input-image",
+        metavar="FILENAME",
+        help="input image filename",
+        required=True,
+    )
+    parser.add_argument(
+        "-s",
+        "--simulated-profile",
+        metavar="FILENAME",
+        help="simulated (printer/paper) profile, can be repeated",
+        action="append",
+        required=True,
+    )
+    parser.add_argument(
+        "--objective",
+        choices=OBJECTIVES,
+        help="objective to minimize, delta E statistic or out of gamut fraction "
+        "(default: %s)" % OBJECTIVES[0],
+        default=OBJECTIVES[0],
+    )
+    parser.add_argument(
+        "--top",
+        metavar="N",
+        type=int,
+        help="number of the best candidates evaluated with the full resolution "
+        "image (default: %d)" % DEFAULT_TOP,
+        default=DEFAULT_TOP,
+    )
+    parser.add_argument(
+        "--preview-size",
+        metavar="PIXELS",
+        type=int,
+        help="evaluate all candidates first with the image downsampled to this "
+        "size, 0 evaluates all with the full resolution image (default: %d)"
+        % DEFAULT_PREVIEW_SIZE,
+        default=DEFAULT_PREVIEW_SIZE,
+    )
+    parser.add_argument(
+        "--output",
+        metavar="FILENAME",
+        help="output the ranking as JSON",
+    )
+    parser.set_defaults(
+        output_image=None,
+        output_de=None,
+        output_de_stats=None,
+        sweep=False,
+        sweep_threads=1,
+        cprofile=None,
+        tracemalloc=None,
+    )
+    args = parser.parse_args(argv)
+    setup_logging(args.verbose)
+    logger.debug(args)
+    check_features()
+
+    opts.load_from_args(args)
+
+    if args.top < 1:
+        err("--top must be at least 1")
+
+    with Image.open(opts.input_filename) as input_image:
+        input_image.load()
+        candidates = create_candidates(
+            opts, input_image, list(dict.fromkeys(args.simulated_profile))
+        )
+        if len(candidates) == 0:
+            err("no rendering intent is supported by the simulated profiles")
+
+        ranking = rank(
+            candidates,
+            input_image,
+            args.objective,
+            args.top,
+            args.preview_size if args.preview_size > 0 else None,
+        )
+
+    print_ranking(ranking, args.objective)
+    if args.output is not None:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "input_image": opts.input_filename,
+                    "objective": args.objective,
+                    "de_formula": opts.de_formula,
+                    "de_direct": opts.de_direct,
+                    "ranking": [candidate.to_dict() for candidate in ranking],
+                },
+                f,
+                indent=2,
+            )
+            f.write("\n")
+
+        print("ranking generated: %s" % args.output)
+
+    return 0
@@ -0,0 +1,430 @@
+# SPDX-FileCopyrightText: 2025 Mete Balci
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+# benekli serve, a long-running proofing daemon
+#
+# a proof run by the command line pays the Python startup, the imports, the
+# Pillow feature checks and the parsing of the profiles every time, which is
+# most of the time of a small proof, the daemon does these once and keeps the
+# parsed profiles and the built transforms in the caches of cache.py
+#
+# the jobs are JSON objects with the fields of the batch manifest records,
+# the options given on the command line are the defaults of the jobs, e.g.
+#
+#   {"image": "in.tif", "simulated_profile": "paper.icc", "output": "out.tif"}
+#
+# and the response is the job record with its status, done, failed, invalid
+# or rejected, and its error, over a Unix socket a job is a line and its
+# response is a line, over HTTP a job is POSTed to /jobs, GET /status returns
+# the counters of the jobs and the caches
+#
+# the jobs run in a pool of worker threads, so they share the caches, and
+# when the workers are busy and the queue is full, the new jobs are rejected
+# instead of waiting, the daemon only listens on localhost, and the clients
+# choose the files it reads and writes
+
+import argparse
+import concurrent.futures
+import copy
+import http.server
+import json
+import logging
+import os
+import signal
+import socketserver
+import sys
+import threading
+import time
+
+from . import cache
+from .batch import get_job_record
+from .benekli import open_cms_profile, run_with_opts
+from .cli import add_common_arguments, check_features, setup_logging
+from .options import CommandOptions, err
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_QUEUE_SIZE = 16
+# the names of the worker threads running the jobs
+JOB_THREAD_NAME_PREFIX = "benekli-job"
+
+# job fields, the keys of get_job_record, and their CommandOptions attributes
+JOB_FIELDS = {
+    "image": "input_filename",
+    "input_profile": "input_profile_filename",
+    "simulated_profile": "simulated_profile_filename",
+    "display_profile": "display_profile_filename",
+    "rendering_intent": "rendering_intent",
+    "bpc": "bpc",
+    "gamut_check": "gamut_check",
+    "de_formula": "de_formula",
+    "de_direct": "de_direct",
+    "de_float": "de_float",
+    "output": "output_filename",
+    "de": "de_filename",
+    "de_stats": "de_stats_filename",
+}
+
+BOOLEAN_JOB_FIELDS = ("bpc", "gamut_check", "de_direct", "de_float")
+
+# HTTP status codes of the job statuses
+HTTP_STATUS = {"done": 200, "failed": 500, "invalid": 400, "rejected": 503}
+
+
+class InvalidJob(ValueError):
+    pass
+
+
+class ErrorHandler(logging.Handler):
+    """Keep the last error logged by each job thread, err() logs the error of
+    a failed job before it exits."""
+
+    def __init__(self):
+        super().__init__(logging.ERROR)
+        self.local = threading.local()
+
+    def emit(self, record):
+        # the errors of the other threads, e.g. of the socket server, are not
+        # the errors of a job
+        if record.threadName.startswith(JOB_THREAD_NAME_PREFIX):
+            self.local.message = record.getMessage()
+
+    def pop(self):
+        message = getattr(self.local, "message", None)
+        self.local.message = None
+        return message
+
+
+def create_job(opts: CommandOptions, request):
+    """Return the options of a job request, the opts with the request fields."""
+    if not isinstance(request, dict):
+        raise InvalidJob("a job must be a JSON object")
+
+    unknown = [field for field in request if field not in JOB_FIELDS]
+    if len(unknown) > 0:
+        raise InvalidJob("unknown job fields: %s" % ", ".join(sorted(unknown)))
+
+    job = copy.copy(opts)
+    for field, attribute in JOB_FIELDS.items():
+        if field not in request:
+            continue
+
+        value = request[field]
+        if field in BOOLEAN_JOB_FIELDS:
+            if not isinstance(value, bool):
+                raise InvalidJob("%s must be true or false" % field)
+
+        elif value is not None and not isinstance(value, str):
+            raise InvalidJob("%s must be a string" % field)
+
+        setattr(job, attribute, value)
+
+    if job.input_filename is None or job.simulated_profile_filename is None:
+        raise InvalidJob("image and simulated_profile must be specified")
+
+    if job.rendering_intent is None:
+        raise InvalidJob("rendering_intent must be specified")
+
+    if job.output_filename is None and not job.needs_de():
+        raise InvalidJob("at least one of output, de or de_stats must be specified")
+
+    return job
+
+
+class ProofServer:
+    """Run the jobs in a pool of worker threads with a bounded queue."""
+
+    def __init__(self, opts: CommandOptions, workers=None, queue_size=None):
+        self.opts = opts
+        self.workers = workers or os.cpu_count() or 1
+        if queue_size is None:
+            queue_size = DEFAULT_QUEUE_SIZE
+
+        self.queue_size = queue_size
+        self.executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=self.workers, thread_name_prefix=JOB_THREAD_NAME_PREFIX
+        )
+        # a slot per running or queued job
+        self.slots = threading.BoundedSemaphore(self.workers + queue_size)
+        self.error_handler = ErrorHandler()
+        logging.getLogger("benekli").addHandler(self.error_handler)
+        self.lock = threading.Lock()
+        self.counts = {"pending": 0, "done": 0, "failed": 0, "rejected": 0}
+
+    def count(self, status, pending=0):
+        with self.lock:
+            self.counts[status] = self.counts[status] + 1
+            self.counts["pending"] = self.counts["pending"] + pending
+
+    def run_job(self, job):
+        """Run a job in a worker thread, return None if it succeeds or the
+        error."""
+        self.error_handler.pop()
+        try:
+            run_with_opts(job)
+
+        except SystemExit:
+            # err() logs the error and exits
+            return self.error_handler.pop() or "failed, see the log for the error"
+
+        except Exception as e:  # pylint: disable=broad-exception-caught
+            logger.exception("%s failed" % job.input_filename)
+            return str(e)
+
+        finally:
+            self.slots.release()
+
+        return None
+
+    def submit(self, request):
+        """Run a job request and return its response."""
+        try:
+            job = create_job(self.opts, request)
+
+        except InvalidJob as e:
+            return {"status": "invalid", "error": str(e)}
+
+        record = get_job_record(job)
+        if not self.slots.acquire(blocking=False):
+            self.count("rejected")
+            logger.warning("rejected %s, the queue is full" % job.input_filename)
+            record["status"] = "rejected"
+            record["error"] = "the server is busy, %d jobs are pending" % (
+                self.workers + self.queue_size
+            )
+            return record
+
+        with self.lock:
+            self.counts["pending"] = self.counts["pending"] + 1
+
+        start = time.perf_counter()
+        try:
+            error = self.executor.submit(self.run_job, job).result()
+
+        except RuntimeError as e:
+            # the executor is shut down
+            self.slots.release()
+            error = str(e)
+
+        record["status"] = "done" if error is None else "failed"
+        record["error"] = error
+        record["seconds"] = round(time.perf_counter() - start, 6)
+        self.count(record["status"], pending=-1)
+        logger.info(
+            "%s with %s %s in %.3f seconds"
+            % (
+                job.input_filename,
+                job.simulated_profile_filename,
+                record["status"],
+                record["seconds"],
+            )
+        )
+        return record
+
+    def get_status(self):
+        with self.lock:
+            status = dict(self.counts)
+
+        status["workers"] = self.workers
+        status["queue_size"] = self.queue_size
+        status["cache"] = {
+            name: info._asdict() for name, info in cache.cache_info().items()
+        }
+        return status
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+        logging.getLogger("benekli").removeHandler(self.error_handler)
+
+
+class UnixJobHandler(socketserver.StreamRequestHandler):
+    """A JSON job per line, a JSON response per line."""
+
+    def handle(self):
+        for line in self.rfile:
+            if len(line.strip()) == 0:
+                continue
+
+            try:
+                request = json.loads(line)
+
+            except json.JSONDecodeError as e:
+                response = {"status": "invalid", "error": "invalid JSON: %s" % e}
+
+            else:
+                if request == {"command": "status"}:
+                    response = self.server.proof_server.get_status()
+
+                else:
+                    response = self.server.proof_server.submit(request)
+
+            self.wfile.write(json.dumps(response).encode("utf-8") + b"\n")
+            self.wfile.flush()
+
+
+class HTTPJobHandler(http.server.BaseHTTPRequestHandler):
+    """POST /jobs runs a JSON job, GET /status returns the status."""
+
+    def send_json(self, code, response):
+        body = json.dumps(response).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        if self.path != "/status":
+            self.send_json(404, {"error": "not found"})
+            return
+
+        self.send_json(200, self.server.proof_server.get_status())
+
+    def do_POST(self):  # pylint: disable=invalid-name
+        if self.path != "/jobs":
+            self.send_json(404, {"error": "not found"})
+            return
+
+        length = int(self.headers.get("Content-Length", 0))
+        try:
+            request = json.loads(self.rfile.read(length))
+
+        except json.JSONDecodeError as e:
+            self.send_json(400, {"status": "invalid", "error": "invalid JSON: %s" % e})
+            return
+
+        response = self.server.proof_server.submit(request)
+        self.send_json(HTTP_STATUS[response["status"]], response)
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        logger.debug("%s %s" % (self.address_string(), format % args))
+
+
+class UnixJobServer(socketserver.ThreadingUnixStreamServer):
+    """Serve the jobs of proof_server on a Unix socket."""
+
+    daemon_threads = True
+
+    def __init__(self, socket_filename, proof_server: ProofServer):
+        self.proof_server = proof_server
+        super().__init__(socket_filename, UnixJobHandler)
+
+
+class HTTPJobServer(http.server.ThreadingHTTPServer):
+    """Serve the jobs of proof_server over HTTP."""
+
+    daemon_threads = True
+
+    def __init__(self, server_address, proof_server: ProofServer):
+        self.proof_server = proof_server
+        super().__init__(server_address, HTTPJobHandler)
+
+
+def create_server(proof_server: ProofServer, socket_filename=None, port=None):
+    """Return the socket server of proof_server, on a Unix socket or on a
+    localhost HTTP port."""
+    if socket_filename is not None:
+        if os.path.exists(socket_filename):
+            # left by a daemon that did not exit cleanly
+            os.remove(socket_filename)
+
+        return UnixJobServer(socket_filename, proof_server)
+
+    return HTTPJobServer(("127.0.0.1", port), proof_server)
+
+
+def run(argv=None):
+    opts = CommandOptions()
+    # the worker threads already use all CPUs
+    opts.threads = 1
+    parser = argparse.ArgumentParser(
+        prog="benekli serve",
+        description="run a proofing daemon, the jobs are sent as JSON over a "
+        "Unix socket or localhost HTTP",
+    )
+    add_common_arguments(parser, opts)
+    listen = parser.add_mutually_exclusive_group(required=True)
+    listen.add_argument(
+        "--socket",
+        metavar="FILENAME",
+        help="Unix socket to listen on, a JSON job per line",
+    )
+    listen.add_argument(
+        "--port",
+        metavar="PORT",
+        type=int,
+        help="localhost HTTP port to listen on, POST the JSON jobs to /jobs",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        metavar="N",
+        type=int,
+        help="number of worker threads (default: number of CPUs)",
+    )
+    parser.add_argument(
+        "--queue-size",
+        metavar="N",
+        type=int,
+        help="number of jobs waiting for a worker before the new jobs are "
+        "rejected (default: %d)" % DEFAULT_QUEUE_SIZE,
+        default=DEFAULT_QUEUE_SIZE,
+    )
+    parser.add_argument(
+        "--profile",
+        metavar="FILENAME",
+        help="profile to open at startup, can be repeated",
+        action="append",
+        default=[],
+    )
+    parser.set_defaults(
+        input_image=None,
+        simulated_profile=None,
+        output_image=None,
+        output_de=None,
+        output_de_stats=None,
+        sweep=False,
+        sweep_threads=1,
+        cprofile=None,
+        tracemalloc=None,
+    )
+    args = parser.parse_args(argv)
+    setup_logging(args.verbose)
+    logger.debug(args)
+    check_features()
+
+    opts.load_from_args(args)
+
+    for filename in [opts.display_profile_filename] + args.profile:
+        if filename is None:
+            continue
+
+        try:
+            open_cms_profile(filename)
+
+        except OSError as e:
+            err("cannot open profile %s: %s" % (filename, e))
+
+    proof_server = ProofServer(opts, args.jobs, args.queue_size)
+    server = create_server(proof_server, args.socket, args.port)
+    # stop like Ctrl-C
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    print(
+        "listening on %s with %d workers"
+        % (args.socket or "http://127.0.0.1:%d" % args.port, proof_server.workers),
+        flush=True,
+    )
+    try:
+        server.serve_forever()
+
+    except KeyboardInterrupt:
+        pass
+
+    finally:
+        server.server_close()
+        proof_server.close()
+        if args.socket is not None and os.path.exists(args.socket):
+            os.remove(args.socket)
+
+    return 0
@@ -0,0 +1,201 @@
+# SPDX-FileCopyrightText: 2025 Mete Balci
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+# RGB matrix/TRC (shaper) profiles in NumPy
+#
+# the RGB to PCSXYZ conversion of a matrix/TRC profile is a tone reproduction
+# curve (rTRC, gTRC, bTRC) per channel and the matrix of the colorants (rXYZ,
+# gXYZ, bXYZ), so the 8-bit RGB pixels are converted to float XYZ and Lab with
+# a 256 entry table per channel and a matrix product, the Lab colors are not
+# quantized to 8-bit like the LAB images of LittleCMS
+#
+# a profile with an A2Bx or D2Bx tag is not a matrix/TRC profile, LittleCMS
+# uses these tags instead of the matrix and the curves, and a profile whose
+# black is not 0 is not converted either, LittleCMS compensates the black
+# point of the V4 profiles in the perceptual intent
+#
+# the RGB to Lab transforms of the matrix/TRC input and display profiles are
+# MatrixShaperTransforms instead of LittleCMS transforms, the pixels are
+# converted in chunks so the float temporaries stay in the CPU cache, which is
+# faster than the 8-bit LittleCMS transform, and the 8-bit Lab is rounded from
+# the exact Lab, LittleCMS interpolates the optimized 8-bit transforms in a
+# grid
+#
+# ref: ICC.1:2010 (profile version 4.3.0.0), F.3 (three-component
+# matrix-based input profiles), 10.5 (curveType), 10.15 (parametricCurveType)
+
+import logging
+import struct
+
+import numpy as np
+from PIL import Image
+
+from .constants import PCS_illuminant_nXYZ
+from .formulas import XYZ_to_Lab
+from .lab8 import encode_Lab8
+
+logger = logging.getLogger(__name__)
+
+# number of pixels converted at once by to_Lab8
+SHAPER_CHUNK_SIZE = 1 << 16
+
+SHAPER_TAGS = (b"rXYZ", b"gXYZ", b"bXYZ", b"rTRC", b"gTRC", b"bTRC")
+LUT_TAGS = (b"A2B0", b"A2B1", b"A2B2", b"D2B0", b"D2B1", b"D2B2")
+
+# number of parameters of the parametric curve function types
+PARAMETRIC_CURVE_PARAMETERS = {0: 1, 1: 3, 2: 4, 3: 5, 4: 7}
+
+
+def read_tags(data):
+    """Return the tags of an ICC profile as a dict of signature to tag data."""
+    (count,) = struct.unpack_from(">I", data, 128)
+    tags = {}
+    for i in range(count):
+        signature, offset, size = struct.unpack_from(">4sII", data, 132 + 12 * i)
+        if offset + size > len(data):
+            raise ValueError("tag %s is out of the profile" % signature)
+
+        tags[signature] = data[offset : offset + size]
+
+    return tags
+
+
+def read_s15Fixed16(data, offset, count):
+    return np.array(struct.unpack_from(">%di" % count, data, offset)) / 65536
+
+
+def read_XYZ(tag):
+    if tag[0:4] != b"XYZ ":
+        raise ValueError("invalid XYZ tag type %s" % tag[0:4])
+
+    return read_s15Fixed16(tag, 8, 3)
+
+
+def read_curve(tag):
+    """Return the curve of a curv or para tag at the 256 8-bit input values."""
+    x = np.arange(256) / 255
+    if tag[0:4] == b"curv":
+        (count,) = struct.unpack_from(">I", tag, 8)
+        if count == 0:
+            return x
+
+        table = np.array(struct.unpack_from(">%dH" % count, tag, 12))
+        if count == 1:
+            # u8Fixed8Number gamma
+            return x ** (table[0] / 256)
+
+        # linear interpolation of the table
+        return np.interp(x * (count - 1), np.arange(count), table / 65535)
+
+    if tag[0:4] == b"para":
+        (function_type,) = struct.unpack_from(">H", tag, 8)
+        if function_type not in PARAMETRIC_CURVE_PARAMETERS:
+            raise ValueError("invalid parametric curve type %d" % function_type)
+
+        p = read_s15Fixed16(tag, 12, PARAMETRIC_CURVE_PARAMETERS[function_type])
+        p = np.concatenate([p, np.zeros(7 - len(p))])
+        g, a, b, c, d, e, f = p
+        if function_type == 0:
+            return x**g
+
+        if function_type in (1, 2):
+            # (ax + b)^g (+ c) from x = -b/a, otherwise 0 (c)
+            return np.where(a * x + b >= 0, np.maximum(a * x + b, 0) ** g + c, c)
+
+        # (ax + b)^g (+ e) from x = d, otherwise cx (+ f)
+        return np.where(x >= d, np.maximum(a * x + b, 0) ** g + e, c * x + f)
+
+    raise ValueError("invalid curve tag type %s" % tag[0:4])
+
+
+class MatrixShaper:
+    """RGB to PCSXYZ and Lab conversion of an RGB matrix/TRC profile."""
+
+    def __init__(self, curves, matrix):
+        # (3, 256) linear values of the 8-bit values per channel
+        self.curves = np.asarray(curves, dtype=np.float32)
+        # XYZ = matrix @ rgb
+        self.matrix = np.asarray(matrix, dtype=np.float32)
+
+    @classmethod
+    def from_bytes(cls, data):
+        """Return the MatrixShaper of an ICC profile, or None if the profile is
+        not an RGB matrix/TRC profile."""
+        if data is None or len(data) < 132:
+            return None
+
+        if data[16:20] != b"RGB " or data[20:24] != b"XYZ ":
+            return None
+
+        try:
+            tags = read_tags(data)
+            if not all(tag in tags for tag in SHAPER_TAGS) or any(
+                tag in tags for tag in LUT_TAGS
+            ):
+                return None
+
+            curves = np.stack(
+                [read_curve(tags[tag]) for tag in (b"rTRC", b"gTRC", b"bTRC")]
+            )
+            matrix = np.stack(
+                [read_XYZ(tags[tag]) for tag in (b"rXYZ", b"gXYZ", b"bXYZ")],
+                axis=1,
+            )
+
+        except (struct.error, ValueError) as e:
+            logger.warning("cannot read the matrix/TRC tags: %s" % e)
+            return None
+
+        if curves[:, 0].any():
+            return None
+
+        return cls(curves, matrix)
+
+    def to_XYZ(self, rgb):
+        """Return the float32 PCSXYZ of the (..., 3) 8-bit RGB array rgb."""
+        rgb = np.asarray(rgb, dtype=np.uint8)
+        # channel by channel, XYZ is the transpose of a (3, ...) array so the
+        # channels of the next steps are contiguous too
+        planes = np.ascontiguousarray(np.moveaxis(rgb, -1, 0))
+        linear = np.empty(planes.shape, dtype=np.float32)
+        for channel in range(3):
+            np.take(self.curves[channel], planes[channel], out=linear[channel])
+
+        XYZ = self.matrix @ linear.reshape(3, -1)
+        return np.moveaxis(XYZ.reshape(planes.shape), 0, -1)
+
+    def to_Lab(self, rgb):
+        """Return the float32 Lab of the (..., 3) 8-bit RGB array rgb."""
+        # the Lab profile of LittleCMS is relative to the PCS illuminant
+        return XYZ_to_Lab(self.to_XYZ(rgb), PCS_illuminant_nXYZ)
+
+    def to_Lab8(self, rgb):
+        """Return the 8-bit Lab (Pillow LAB mode) of the (..., 3) 8-bit RGB array
+        rgb."""
+        pixels = np.asarray(rgb, dtype=np.uint8).reshape(-1, 3)
+        Lab = np.empty(pixels.shape, dtype=np.uint8)
+        for start in range(0, len(pixels), SHAPER_CHUNK_SIZE):
+            end = start + SHAPER_CHUNK_SIZE
+            Lab[start:end] = encode_Lab8(self.to_Lab(pixels[start:end]))
+
+        return Lab.reshape(np.shape(rgb))
+
+
+class MatrixShaperTransform:
+    """The RGB to LAB transform of a matrix/TRC profile, used like an
+    ImageCmsTransform."""
+
+    input_mode = "RGB"
+    output_mode = "LAB"
+
+    def __init__(self, matrix_shaper: MatrixShaper):
+        self.matrix_shaper = matrix_shaper
+
+    def apply(self, image):
+        return Image.fromarray(
+            self.matrix_shaper.to_Lab8(np.asarray(image)), mode=self.output_mode
+        )
+
+    def point(self, image):
+        return self.apply(image)
@@ -0,0 +1,100 @@
+# SPDX-FileCopyrightText: 2025 Mete Balci
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+# delta E statistics, updated chunk by chunk so the delta E of the whole image
+# is never kept in memory
+#
+# the median and the percentiles are found in a histogram with
+# DE_STATS_RESOLUTION bins per 1.0 delta E, so they are rounded up to the next
+# 1 / DE_STATS_RESOLUTION (0.01), but never above the max, the delta E above
+# DE_STATS_HISTOGRAM_MAX is counted in the last bin, a percentile in that bin
+# is reported as the max, the count, the mean, the max and the percentages
+# above the thresholds are exact
+
+import math
+
+import numpy as np
+
+DE_STATS_THRESHOLDS = (1.0, 2.0, 3.0)
+DE_STATS_PERCENTILES = (50, 95, 99)
+DE_STATS_RESOLUTION = 100
+DE_STATS_HISTOGRAM_MAX = 200
+
+
+class DeStatistics:
+    """Statistics of the delta E values given to update."""
+
+    def __init__(self, thresholds=DE_STATS_THRESHOLDS):
+        self.thresholds = thresholds
+        self.count = 0
+        self.sum = 0.0
+        self.max = None
+        self.above = [0] * len(thresholds)
+        # bin i has the delta E in ((i - 1) / resolution, i / resolution]
+        # and the last bin has the delta E above the histogram max
+        self.histogram = np.zeros(
+            DE_STATS_HISTOGRAM_MAX * DE_STATS_RESOLUTION + 2, dtype=np.int64
+        )
+
+    def update(self, de):
+        de = np.ravel(de)
+        if len(de) == 0:
+            return
+
+        self.count = self.count + len(de)
+        self.sum = self.sum + float(np.sum(de, dtype=np.float64))
+        de_max = float(np.max(de))
+        self.max = de_max if self.max is None else max(self.max, de_max)
+        for i, threshold in enumerate(self.thresholds):
+            self.above[i] = self.above[i] + int(np.count_nonzero(de > threshold))
+
+        index = np.multiply(de, DE_STATS_RESOLUTION, dtype=np.float64)
+        np.ceil(index, out=index)
+        np.clip(index, 0, len(self.histogram) - 1, out=index)
+        self.histogram += np.bincount(
+            index.astype(np.intp), minlength=len(self.histogram)
+        )
+
+    def merge(self, other):
+        """Add the delta E values of other, with the same thresholds."""
+        assert self.thresholds == other.thresholds
+        self.count = self.count + other.count
+        self.sum = self.sum + other.sum
+        if other.max is not None:
+            self.max = other.max if self.max is None else max(self.max, other.max)
+
+        self.above = [a + b for a, b in zip(self.above, other.above)]
+        self.histogram += other.histogram
+
+    def percentile(self, q):
+        """Return the nearest-rank q-th percentile, rounded up to a bin edge."""
+        if self.count == 0:
+            return None
+
+        rank = max(1, math.ceil(q / 100 * self.count))
+        i = int(np.searchsorted(np.cumsum(self.histogram), rank))
+        if i == len(self.histogram) - 1:
+            return self.max
+
+        return min(i / DE_STATS_RESOLUTION, self.max)
+
+    def to_dict(self):
+        if self.count == 0:
+            mean = None
+            percent_above = {"%g" % t: None for t in self.thresholds}
+
+        else:
+            mean = self.sum / self.count
+            percent_above = {
+                "%g" % t: 100 * above / self.count
+                for t, above in zip(self.thresholds, self.above)
+            }
+
+        d = {"count": self.count, "mean": mean}
+        for q in DE_STATS_PERCENTILES:
+            d["median" if q == 50 else "p%d" % q] = self.percentile(q)
+
+        d["max"] = self.max
+        d["percent_above"] = percent_above
+        return d
@@ -0,0 +1,287 @@
+# SPDX-FileCopyrightText: 2025 Mete Balci
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+# reading and writing images in horizontal strips, so an image larger than the
+# memory can be soft proofed strip by strip
+#
+# StripReader reads only the rows of a strip when the image data is not
+# compressed (e.g. uncompressed TIFF), the rows are read from the file with the
+# offsets and the strides of the tiles Pillow reports when it opens the image,
+# other images are decoded as a whole once
+#
+# TiffStripWriter writes an 8-bit RGB TIFF incrementally, the strips are
+# compressed with Deflate (zlib) and horizontal differencing, and the IFD is
+# written after the last strip, so the rows of the image are never kept in
+# memory, BigTIFF is written if the image can be larger than 4 GB
+
+import logging
+import os
+import struct
+import zlib
+
+import numpy as np
+from PIL import Image, ImageFile
+
+logger = logging.getLogger(__name__)
+
+# uncompressed size of a TIFF strip
+TIFF_STRIP_SIZE = 1 << 16
+# uncompressed image size from which BigTIFF is written, leaving room for the
+# Deflate overhead of incompressible data and for the IFD
+TIFF_BIGTIFF_SIZE = (1 << 32) - (1 << 28)
+# the modes of one byte per band read from the file by StripReader
+RAW_MODES = ("L", "RGB", "RGBA", "CMYK", "LAB")
+
+TIFF_ASCII = 2
+TIFF_SHORT = 3
+TIFF_LONG = 4
+TIFF_UNDEFINED = 7
+TIFF_LONG8 = 16
+
+TIFF_TYPE_FORMATS = {
+    TIFF_SHORT: "H",
+    TIFF_LONG: "I",
+    TIFF_LONG8: "Q",
+}
+
+
+def get_raw_tiles(image):
+    """Return the uncompressed tiles of an opened image, or None.
+
+    A tile is ((x0, y0, x1, y1), offset, stride, rawmode), the rows of the
+    tile follow each other in the file, stride bytes apart."""
+    if (
+        not isinstance(image, ImageFile.ImageFile)
+        or image.mode not in RAW_MODES
+        or not image.tile
+    ):
+        return None
+
+    tiles = []
+    for codec_name, extents, offset, args in image.tile:
+        # only 8-bit top-down pixels of the image mode
+        if (
+            codec_name != "raw"
+            or not isinstance(args, tuple)
+            or len(args) < 3
+            or args[0] != image.mode
+            or args[2] != 1
+        ):
+            return None
+
+        x0, _, x1, _ = extents
+        stride = args[1] if args[1] > 0 else (x1 - x0) * len(image.getbands())
+        tiles.append((extents, offset, stride, args[0]))
+
+    return tiles
+
+
+class StripReader:
+    """Read the rows of an image strip by strip."""
+
+    def __init__(self, filename, image):
+        self.filename = filename
+        self.size = image.size
+        self.mode = image.mode
+        self.tiles = get_raw_tiles(image)
+        self.image = None
+        if self.tiles is None:
+            logger.warning(
+                "%s is compressed, it is decoded as a whole, not strip by strip"
+                % filename
+            )
+
+    def read(self, y0, y1):
+        """Return the rows y0 to y1 (exclusive) as an image."""
+        width = self.size[0]
+        if self.tiles is None:
+            if self.image is None:
+                self.image = Image.open(self.filename)
+                self.image.load()
+
+            return self.image.crop((0, y0, width, y1))
+
+        # read only the rows of the tiles in the strip, the file is read with
+        # the offsets and strides of the tiles, not by the decoder of Pillow
+        pixels = np.empty(
+            (y1 - y0, width, Image.getmodebands(self.mode)), dtype=np.uint8
+        )
+        with open(self.filename, "rb") as f:
+            for tile in self.tiles:
+                (x0, ty0, x1, ty1), _, _, _ = tile
+                r0 = max(y0, ty0)
+                r1 = min(y1, ty1)
+                if r0 < r1:
+                    pixels[r0 - y0 : r1 - y0, x0:x1] = self.read_rows(f, tile, r0, r1)
+
+        return Image.frombytes(self.mode, (width, y1 - y0), pixels.tobytes())
+
+    def read_rows(self, f, tile, r0, r1):
+        """Return the rows r0 to r1 (exclusive) of a tile as an array."""
+        (x0, ty0, x1, _), offset, stride, _ = tile
+        bands = Image.getmodebands(self.mode)
+        row_size = (x1 - x0) * bands
+        f.seek(offset + (r0 - ty0) * stride)
+        # the last row is not padded to the stride
+        size = (r1 - r0 - 1) * stride + row_size
+        data = f.read(size)
+        if len(data) < size:
+            raise OSError("%s is truncated" % self.filename)
+
+        rows = np.frombuffer(data + bytes(stride - row_size), dtype=np.uint8)
+        return rows.reshape(r1 - r0, stride)[:, :row_size].reshape(
+            r1 - r0, x1 - x0, bands
+        )
+
+    def close(self):
+        if self.image is not None:
+            self.image.close()
+            self.image = None
+
+
+class TiffStripWriter:
+    """Write an 8-bit RGB TIFF strip by strip."""
+
+    def __init__(self, filename, width, height, description=None):
+        self.filename = filename
+        self.width = width
+        self.height = height
+        self.description = description
+        self.bigtiff = width * height * 3 >= TIFF_BIGTIFF_SIZE
+        self.rows_per_strip = max(1, TIFF_STRIP_SIZE // (width * 3))
+        self.buffer = np.empty((self.rows_per_strip, width, 3), dtype=np.uint8)
+        self.buffer_rows = 0
+        self.rows = 0
+        self.strip_offsets = []
+        self.strip_byte_counts = []
+        self.f = open(filename, "wb")
+        # the IFD offset is written by close
+        if self.bigtiff:
+            self.f.write(b"II" + struct.pack("<HHHQ", 43, 8, 0, 0))
+
+        else:
+            self.f.write(b"II" + struct.pack("<HI", 42, 0))
+
+    def write(self, pixels):
+        """Write the next rows, pixels is a (rows, width, 3) uint8 array."""
+        pixels = np.asarray(pixels)
+        assert pixels.shape[1:] == (self.width, 3)
+        if self.rows + len(pixels) > self.height:
+            raise ValueError("%s has only %d rows" % (self.filename, self.height))
+
+        self.rows = self.rows + len(pixels)
+        start = 0
+        while start < len(pixels):
+            n = min(len(pixels) - start, self.rows_per_strip - self.buffer_rows)
+            self.buffer[self.buffer_rows : self.buffer_rows + n] = pixels[
+                start : start + n
+            ]
+            self.buffer_rows = self.buffer_rows + n
+            start = start + n
+            if self.buffer_rows == self.rows_per_strip:
+                self.write_strip(self.buffer)
+
+    def write_strip(self, strip):
+        # horizontal differencing predictor, modulo 256
+        difference = np.empty_like(strip)
+        difference[:, 0] = strip[:, 0]
+        np.subtract(strip[:, 1:], strip[:, :-1], out=difference[:, 1:])
+        data = zlib.compress(difference.tobytes())
+        self.strip_offsets.append(self.f.tell())
+        self.strip_byte_counts.append(len(data))
+        self.f.write(data)
+        self.buffer_rows = 0
+
+    def get_tags(self, icc_profile):
+        offset_type = TIFF_LONG8 if self.bigtiff else TIFF_LONG
+        tags = [
+            (256, TIFF_LONG, [self.width]),
+            (257, TIFF_LONG, [self.height]),
+            (258, TIFF_SHORT, [8, 8, 8]),
+            # Adobe Deflate
+            (259, TIFF_SHORT, [8]),
+            # RGB
+            (262, TIFF_SHORT, [2]),
+        ]
+        if self.description is not None:
+            tags.append((270, TIFF_ASCII, self.description.encode("ascii") + b"\0"))
+
+        tags = tags + [
+            (273, offset_type, self.strip_offsets),
+            (277, TIFF_SHORT, [3]),
+            (278, TIFF_LONG, [self.rows_per_strip]),
+            (279, offset_type, self.strip_byte_counts),
+            # contiguous
+            (284, TIFF_SHORT, [1]),
+            # horizontal differencing
+            (317, TIFF_SHORT, [2]),
+        ]
+        if icc_profile is not None:
+            tags.append((34675, TIFF_UNDEFINED, icc_profile))
+
+        return tags
+
+    def close(self, icc_profile=None):
+        """Write the IFD, icc_profile is embedded if it is given."""
+        if self.buffer_rows > 0:
+            self.write_strip(self.buffer[: self.buffer_rows])
+
+        if self.rows != self.height:
+            self.f.close()
+            raise ValueError(
+                "%s has %d rows, %d are written"
+                % (self.filename, self.height, self.rows)
+            )
+
+        if self.bigtiff:
+            count_format, entry_format, value_size = "<Q", "<HHQ", 8
+
+        else:
+            count_format, entry_format, value_size = "<H", "<HHI", 4
+
+        tags = self.get_tags(icc_profile)
+        # the values that do not fit in the entries follow the IFD
+        ifd_offset = self.f.tell() + self.f.tell() % 2
+        data_offset = (
+            ifd_offset
+            + struct.calcsize(count_format)
+            + len(tags) * (struct.calcsize(entry_format) + value_size)
+            + value_size
+        )
+        entries = []
+        data = []
+        for tag, tag_type, values in tags:
+            count = len(values)
+            if tag_type in (TIFF_ASCII, TIFF_UNDEFINED):
+                value = bytes(values)
+
+            else:
+                value = struct.pack(
+                    "<%d%s" % (count, TIFF_TYPE_FORMATS[tag_type]), *values
+                )
+
+            if len(value) <= value_size:
+                value = value.ljust(value_size, b"\0")
+
+            else:
+                data.append(value + b"\0" * (len(value) % 2))
+                value = struct.pack("<Q" if self.bigtiff else "<I", data_offset)
+                data_offset = data_offset + len(data[-1])
+
+            entries.append(struct.pack(entry_format, tag, tag_type, count) + value)
+
+        self.f.write(b"\0" * (ifd_offset - self.f.tell()))
+        self.f.write(struct.pack(count_format, len(entries)))
+        self.f.write(b"".join(entries))
+        # no next IFD
+        self.f.write(b"\0" * value_size)
+        self.f.write(b"".join(data))
+        self.f.seek(8 if self.bigtiff else 4)
+        self.f.write(struct.pack("<Q" if self.bigtiff else "<I", ifd_offset))
+        self.f.close()
+
+    def abort(self):
+        """Close and remove the incomplete file."""
+        self.f.close()
+        os.remove(self.filename)
@@ -0,0 +1,223 @@
+# SPDX-FileCopyrightText: 2025 Mete Balci
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+# the timings of the stages of a run, e.g. decoding the input image, opening
+# the profiles, building the transforms, the transforms, the delta E image
+# and saving the images
+#
+# run_with_opts creates the Timings of a run and keeps it in opts.timings,
+# the stages are timed with stage(opts.timings, name), which does nothing if
+# there is no Timings, e.g. when proof_with_opts is called directly
+#
+# a stage record has the wall time, the CPU time of the process, which
+# includes the threads of the bands and the sweep, so it can be more than the
+# wall time, and how much the peak RSS of the process grows during the stage,
+# the OS reports only the peak of the whole process, so it is 0 for a stage
+# that needs less memory than an earlier one, the record of the run has the
+# peak RSS of the process, when tracemalloc is tracing (--tracemalloc) the
+# record also has the peak of the memory allocated by Python and NumPy during
+# the stage, the stages of the sweep variants run at the same time with
+# --sweep-threads, so their peaks are of all of them
+#
+# the stage hooks are called after every stage of every run in this process,
+# the whole run is the stage "run", its record has the records of its stages
+#
+# this module does not import NumPy or Pillow, see cli.py
+
+import contextlib
+import json
+import logging
+import sys
+import threading
+import time
+import tracemalloc
+
+try:
+    import resource
+
+except ImportError:
+    # not on Windows
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+# frames kept per allocation by --tracemalloc
+TRACEMALLOC_FRAMES = 16
+
+_stage_hooks = []
+_stage_hooks_lock = threading.Lock()
+
+
+def get_peak_rss():
+    """Return the peak resident set size of this process in megabytes."""
+    if resource is None:
+        return None
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    if sys.platform == "darwin":
+        return peak / (1 << 20)
+
+    return peak / (1 << 10)
+
+
+def add_stage_hook(hook):
+    """Call hook(name, record) after every stage of every run, the whole run
+    is the stage "run"."""
+    with _stage_hooks_lock:
+        _stage_hooks.append(hook)
+
+
+def remove_stage_hook(hook):
+    with _stage_hooks_lock:
+        _stage_hooks.remove(hook)
+
+
+def call_stage_hooks(name, record):
+    with _stage_hooks_lock:
+        hooks = tuple(_stage_hooks)
+
+    for hook in hooks:
+        try:
+            hook(name, record)
+
+        except Exception:  # pylint: disable=broad-exception-caught
+            # a hook does not fail the proof
+            logger.exception("stage hook %r failed" % hook)
+
+
+@contextlib.contextmanager
+def measure(record):
+    """Add the wall time, CPU time and the growth of the peak memory of the
+    context to record."""
+    tracing = tracemalloc.is_tracing()
+    if tracing:
+        tracemalloc.reset_peak()
+
+    peak_rss = get_peak_rss()
+    wall = time.perf_counter()
+    cpu = time.process_time()
+    try:
+        yield record
+
+    finally:
+        record["wall_s"] = round(time.perf_counter() - wall, 6)
+        record["cpu_s"] = round(time.process_time() - cpu, 6)
+        if peak_rss is None:
+            record["peak_rss_growth_mb"] = None
+
+        else:
+            record["peak_rss_growth_mb"] = round(get_peak_rss() - peak_rss, 3)
+
+        if tracing:
+            record["traced_peak_mb"] = round(
+                tracemalloc.get_traced_memory()[1] / (1 << 20), 3
+            )
+
+
+class Timings:
+    """The record of a run and of its stages."""
+
+    def __init__(self, **record):
+        self.record = record
+        self.stages = []
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def stage(self, name, **details):
+        """Time a stage, details are added to its record."""
+        record = {"stage": name}
+        record.update(details)
+        try:
+            with measure(record):
+                yield record
+
+        finally:
+            # the sweep variants add their stages from their threads
+            with self._lock:
+                self.stages.append(record)
+
+            call_stage_hooks(name, record)
+
+    @contextlib.contextmanager
+    def run(self):
+        """Time the run, its status is failed if the context raises."""
+        self.record["status"] = "failed"
+        try:
+            with measure(self.record):
+                yield self
+
+            self.record["status"] = "done"
+
+        finally:
+            self.record["peak_rss_mb"] = get_peak_rss()
+            # the stages reset the traced peak
+            for record in self.stages:
+                if "traced_peak_mb" in record and "traced_peak_mb" in self.record:
+                    self.record["traced_peak_mb"] = max(
+                        self.record["traced_peak_mb"], record["traced_peak_mb"]
+                    )
+
+            self.record["stages"] = self.stages
+            call_stage_hooks("run", self.record)
+
+
+def stage(timings, name, **details):
+    """Return the context timing the stage name of timings, or a context that
+    does nothing if timings is None."""
+    if timings is None:
+        return contextlib.nullcontext()
+
+    return timings.stage(name, **details)
+
+
+def write_record(filename, record):
+    """Append record to filename as a line of JSON, - is the standard output."""
+    line = json.dumps(record) + "\n"
+    if filename == "-":
+        sys.stdout.write(line)
+        sys.stdout.flush()
+        return
+
+    # a single write, so the lines of the batch workers are not mixed
+    with open(filename, "a", encoding="utf-8") as f:
+        f.write(line)
+
+
+@contextlib.contextmanager
+def profile(cprofile_filename=None, tracemalloc_filename=None):
+    """Profile the context with cProfile and write its statistics (pstats) to
+    cprofile_filename, and trace its memory allocations and write the
+    tracemalloc snapshot to tracemalloc_filename, if they are given.
+
+    cProfile profiles only the calling thread, the transforms of the bands
+    run in other threads unless --threads is 1."""
+    profiler = None
+    if cprofile_filename is not None:
+        import cProfile
+
+        profiler = cProfile.Profile()
+
+    started = False
+    if tracemalloc_filename is not None and not tracemalloc.is_tracing():
+        tracemalloc.start(TRACEMALLOC_FRAMES)
+        started = True
+
+    if profiler is not None:
+        profiler.enable()
+
+    try:
+        yield
+
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            profiler.dump_stats(cprofile_filename)
+            logger.info("cProfile statistics written: %s" % cprofile_filename)
+
+        if tracemalloc_filename is not None:
+            tracemalloc.take_snapshot().dump(tracemalloc_filename)
+            logger.info("tracemalloc snapshot written: %s" % tracemalloc_filename)
+            if started:
+                tracemalloc.stop()
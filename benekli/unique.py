@@ -0,0 +1,95 @@
+# SPDX-FileCopyrightText: 2025 Mete Balci
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+# delta E of the unique (Lab1, Lab2) pairs
+#
+# graphics, charts, posterized images and test targets have far fewer distinct
+# pairs than pixels, so delta E is calculated once per pair and scattered
+# back to the pixels with the inverse index of np.unique
+#
+# the pairs and their delta E are kept in sorted arrays across the chunks of
+# an image, so a pair is calculated only once in the whole image, and the
+# pixels of the pairs found in the earlier chunks are not sorted again, when a
+# chunk has more than UNIQUE_MAX_RATIO new distinct pairs (e.g. a photo),
+# finding the pairs costs more than it saves, and delta E of the rest of the
+# image is calculated for every pixel
+#
+# the formulas are calculated pixel by pixel, so delta E is the same as
+# calculated for every pixel
+
+from typing import Callable
+
+import numpy as np
+
+from .lab8 import de2000_Lab8
+
+UNIQUE_MAX_RATIO = 0.25
+# pairs kept, 12 MB
+UNIQUE_MAX_PAIRS = 1 << 20
+# cie76 and cie94 are faster than finding the pairs
+UNIQUE_DE_FORMULAS = (de2000_Lab8,)
+
+
+def get_pair_keys(Lab1, Lab2):
+    """Return the (Lab1, Lab2) pairs of (n, 3) uint8 arrays as uint64 keys."""
+    pairs = np.zeros((len(Lab1), 8), dtype=np.uint8)
+    pairs[:, 0:3] = Lab1
+    pairs[:, 3:6] = Lab2
+    return pairs.view(np.uint64).reshape(-1)
+
+
+def get_unique_de(de_formula: Callable[[np.ndarray, np.ndarray], np.ndarray]):
+    """Return de_formula calculated once per unique pair if it is worth it."""
+    if de_formula in UNIQUE_DE_FORMULAS:
+        return UniqueDe(de_formula)
+
+    return de_formula
+
+
+class UniqueDe:
+    """A delta E formula calculated once per unique pair of the chunks."""
+
+    def __init__(self, de_formula: Callable[[np.ndarray, np.ndarray], np.ndarray]):
+        self.de_formula = de_formula
+        self.enabled = True
+        # sorted
+        self.keys = np.empty(0, dtype=np.uint64)
+        self.de = np.empty(0, dtype=np.float64)
+
+    def __call__(self, Lab1, Lab2):
+        if not self.enabled:
+            return self.de_formula(Lab1, Lab2)
+
+        # the pairs found in the earlier chunks
+        keys = get_pair_keys(Lab1, Lab2)
+        if len(self.keys) > 0:
+            position = np.minimum(np.searchsorted(self.keys, keys), len(self.keys) - 1)
+            de = self.de[position]
+            missing = np.flatnonzero(self.keys[position] != keys)
+            if len(missing) == 0:
+                return de
+
+        else:
+            de = np.empty(len(keys), dtype=np.float64)
+            missing = np.arange(len(keys))
+
+        # the new pairs
+        unique_keys, index, inverse = np.unique(
+            keys[missing], return_index=True, return_inverse=True
+        )
+        if len(unique_keys) > UNIQUE_MAX_RATIO * len(keys):
+            self.enabled = False
+            self.keys = None
+            self.de = None
+            de[missing] = self.de_formula(Lab1[missing], Lab2[missing])
+            return de
+
+        unique_de = self.de_formula(Lab1[missing[index]], Lab2[missing[index]])
+        de[missing] = unique_de[inverse]
+        if len(self.keys) + len(unique_keys) <= UNIQUE_MAX_PAIRS:
+            position = np.searchsorted(self.keys, unique_keys)
+            self.keys = np.insert(self.keys, position, unique_keys)
+            self.de = np.insert(self.de, position, unique_de)
+
+        return de
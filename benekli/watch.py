@@ -0,0 +1,401 @@
+# SPDX-FileCopyrightText: 2025 Mete Balci
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+# benekli watch, soft proof the images dropped into a hot folder
+#
+# the directory is polled, there is no portable file notification in the
+# standard library, and an image is proofed only after its size and
+# modification time do not change for --settle seconds, so the files that
+# are still being copied are not read half written
+#
+# the images are put into a bounded asyncio queue, and the worker tasks run
+# their jobs in the worker processes of batch.py, which open the profiles
+# once, when the queue is full the folder is not scanned until there is
+# room, so a burst of files waits in the folder instead of in memory
+#
+# the jobs are named and recorded in the manifest like batch, so the images
+# that are done are not proofed again when the watcher is restarted, and an
+# image is proofed again when it is replaced while the watcher runs
+
+import argparse
+import asyncio
+import concurrent.futures
+import json
+import logging
+import os
+import time
+
+from .batch import DEFAULT_MANIFEST_FILENAME, init_worker, run_job, create_jobs
+from .batch import get_job_record, get_record_key, read_manifest
+from .cli import add_common_arguments, check_features, setup_logging
+from .options import CommandOptions, err
+
+logger = logging.getLogger(__name__)
+
+IMAGE_EXTENSIONS = (".tif", ".tiff", ".jpg", ".jpeg", ".png")
+
+DEFAULT_SETTLE = 2.0
+DEFAULT_POLL_INTERVAL = 1.0
+DEFAULT_QUEUE_SIZE = 64
+
+
+class HotFolder:
+    """Find the images of a directory that are completely written."""
+
+    def __init__(self, directory, settle=DEFAULT_SETTLE):
+        self.directory = directory
+        self.settle = settle
+        # filename: (size, modification time), and when it was first seen
+        self.changing = {}
+        # (filename, size, modification time) of the images already found
+        self.found = set()
+
+    def scan(self, now):
+        """Return the images that have not changed for settle seconds."""
+        ready = []
+        filenames = set()
+        with os.scandir(self.directory) as entries:
+            for entry in sorted(entries, key=lambda entry: entry.name):
+                name = entry.name
+                if name.startswith(".") or not name.lower().endswith(IMAGE_EXTENSIONS):
+                    continue
+
+                try:
+                    if not entry.is_file():
+                        continue
+
+                    stat = entry.stat()
+
+                except OSError:
+                    # removed meanwhile
+                    continue
+
+                filename = entry.path
+                filenames.add(filename)
+                state = (stat.st_size, stat.st_mtime_ns)
+                if (filename,) + state in self.found:
+                    continue
+
+                if filename not in self.changing or self.changing[filename][0] != state:
+                    self.changing[filename] = (state, now)
+
+                elif now - self.changing[filename][1] >= self.settle:
+                    del self.changing[filename]
+                    self.found.add((filename,) + state)
+                    ready.append(filename)
+
+        for filename in list(self.changing):
+            if filename not in filenames:
+                del self.changing[filename]
+
+        return ready
+
+    def is_settling(self):
+        return len(self.changing) > 0
+
+
+class Watcher:
+    """Run the jobs of the images of a hot folder in worker processes."""
+
+    def __init__(
+        self,
+        opts: CommandOptions,
+        input_dir,
+        simulated_profile_filenames,
+        output_dir,
+        proof=True,
+        de=False,
+        de_stats=False,
+        workers=None,
+        queue_size=DEFAULT_QUEUE_SIZE,
+        settle=DEFAULT_SETTLE,
+        poll_interval=DEFAULT_POLL_INTERVAL,
+        manifest_filename=None,
+    ):
+        self.opts = opts
+        self.folder = HotFolder(input_dir, settle)
+        self.simulated_profile_filenames = simulated_profile_filenames
+        self.output_dir = output_dir
+        self.outputs = {"proof": proof, "de": de, "de_stats": de_stats}
+        self.workers = workers or os.cpu_count() or 1
+        self.queue_size = queue_size
+        self.poll_interval = poll_interval
+        self.manifest_filename = manifest_filename
+        self.done = read_manifest(manifest_filename)
+        # the images found while the watcher runs
+        self.found = set()
+        self.counts = {"done": 0, "failed": 0}
+        self.queue = None
+        self.manifest = None
+
+    def get_jobs(self, filename):
+        """Return the jobs of an image that are not done yet, all of them if
+        the image is replaced while the watcher runs."""
+        jobs = create_jobs(
+            [filename],
+            self.simulated_profile_filenames,
+            self.opts,
+            self.output_dir,
+            **self.outputs,
+        )
+        if filename in self.found:
+            # found again, so replaced after its jobs were done
+            for job in jobs:
+                self.done.discard(get_record_key(get_job_record(job)))
+
+        self.found.add(filename)
+        return [
+            job for job in jobs if get_record_key(get_job_record(job)) not in self.done
+        ]
+
+    async def work(self, executor):
+        loop = asyncio.get_running_loop()
+        while True:
+            job, queued = await self.queue.get()
+            start = time.monotonic()
+            try:
+                error = await loop.run_in_executor(executor, run_job, job)
+
+            except Exception as e:  # pylint: disable=broad-exception-caught
+                error = str(e)
+
+            record = get_job_record(job)
+            record["status"] = "done" if error is None else "failed"
+            record["error"] = error
+            self.counts[record["status"]] = self.counts[record["status"]] + 1
+            if error is None:
+                self.done.add(get_record_key(record))
+                logger.info(
+                    "%s with %s done in %.3f seconds, waited %.3f seconds, "
+                    "queue depth %d"
+                    % (
+                        job.input_filename,
+                        job.simulated_profile_filename,
+                        time.monotonic() - start,
+                        start - queued,
+                        self.queue.qsize(),
+                    )
+                )
+
+            else:
+                logger.error(
+                    "%s with %s failed: %s"
+                    % (job.input_filename, job.simulated_profile_filename, error)
+                )
+
+            if self.manifest is not None:
+                self.manifest.write(json.dumps(record) + "\n")
+                self.manifest.flush()
+
+            self.queue.task_done()
+
+    async def run(self, once=False):
+        """Watch the folder, or with once, proof the images in the folder and
+        return when they are done."""
+        profile_filenames = set(self.simulated_profile_filenames)
+        profile_filenames.add(self.opts.display_profile_filename)
+        profile_filenames.add(self.opts.input_profile_filename)
+        profile_filenames.discard(None)
+
+        self.queue = asyncio.Queue(self.queue_size)
+        if self.manifest_filename is not None:
+            self.manifest = open(self.manifest_filename, "a", encoding="utf-8")
+
+        workers = []
+        try:
+            with concurrent.futures.ProcessPoolExecutor(
+                max_workers=self.workers,
+                initializer=init_worker,
+                initargs=(
+                    sorted(profile_filenames),
+                    logging.getLogger("benekli").level,
+                ),
+            ) as executor:
+                workers = [
+                    asyncio.create_task(self.work(executor))
+                    for _ in range(self.workers)
+                ]
+                while True:
+                    for filename in self.folder.scan(time.monotonic()):
+                        for job in self.get_jobs(filename):
+                            # waits for room when the queue is full
+                            await self.queue.put((job, time.monotonic()))
+                            logger.info(
+                                "queued %s with %s, queue depth %d"
+                                % (
+                                    job.input_filename,
+                                    job.simulated_profile_filename,
+                                    self.queue.qsize(),
+                                )
+                            )
+
+                    if once and not self.folder.is_settling():
+                        break
+
+                    await asyncio.sleep(self.poll_interval)
+
+                await self.queue.join()
+
+        finally:
+            for worker in workers:
+                worker.cancel()
+
+            await asyncio.gather(*workers, return_exceptions=True)
+            if self.manifest is not None:
+                self.manifest.close()
+                self.manifest = None
+
+        return self.counts["failed"]
+
+
+def run(argv=None):
+    opts = CommandOptions()
+    # the worker processes already use all CPUs
+    opts.threads = 1
+    parser = argparse.ArgumentParser(
+        prog="benekli watch",
+        description="soft proof the images written into a directory",
+    )
+    add_common_arguments(parser, opts)
+    parser.add_argument(
+        "--input-dir",
+        metavar="DIRECTORY",
+        help="directory to watch for the input images",
+        required=True,
+    )
+    parser.add_argument(
+        "-s",
+        "--simulated-profile",
+        metavar="FILENAME",
+        help="simulated (printer/paper) profile, can be repeated",
+        action="append",
+        required=True,
+    )
+    parser.add_argument(
+        "--output-dir",
+        metavar="DIRECTORY",
+        help="directory of the output proof and delta E images",
+        required=True,
+    )
+    parser.add_argument(
+        "--no-proof",
+        help="do not output proof images",
+        default=False,
+        action="store_true",
+    )
+    parser.add_argument(
+        "--de",
+        help="output delta E images",
+        default=False,
+        action="store_true",
+    )
+    parser.add_argument(
+        "--de-stats",
+        help="output delta E statistics (JSON)",
+        default=False,
+        action="store_true",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        metavar="N",
+        type=int,
+        help="number of worker processes (default: number of CPUs)",
+    )
+    parser.add_argument(
+        "--queue-size",
+        metavar="N",
+        type=int,
+        help="number of jobs waiting for a worker (default: %d)" % DEFAULT_QUEUE_SIZE,
+        default=DEFAULT_QUEUE_SIZE,
+    )
+    parser.add_argument(
+        "--settle",
+        metavar="SECONDS",
+        type=float,
+        help="an image is proofed when it has not changed for SECONDS "
+        "(default: %s)" % DEFAULT_SETTLE,
+        default=DEFAULT_SETTLE,
+    )
+    parser.add_argument(
+        "--poll-interval",
+        metavar="SECONDS",
+        type=float,
+        help="seconds between the scans of the directory (default: %s)"
+        % DEFAULT_POLL_INTERVAL,
+        default=DEFAULT_POLL_INTERVAL,
+    )
+    parser.add_argument(
+        "--once",
+        help="proof the images in the directory and exit",
+        default=False,
+        action="store_true",
+    )
+    parser.add_argument(
+        "--manifest",
+        metavar="FILENAME",
+        help="manifest of the finished jobs, the jobs in it are not run again "
+        "(default: %s in the output directory)" % DEFAULT_MANIFEST_FILENAME,
+    )
+    parser.set_defaults(
+        input_image=None,
+        output_image=None,
+        output_de=None,
+        output_de_stats=None,
+        sweep=False,
+        sweep_threads=1,
+        cprofile=None,
+        tracemalloc=None,
+    )
+    args = parser.parse_args(argv)
+    setup_logging(args.verbose)
+    logger.debug(args)
+    check_features()
+
+    opts.load_from_args(args)
+
+    if opts.rendering_intent is None:
+        err("-r (rendering intent) must be specified")
+
+    if args.no_proof and not args.de and not args.de_stats:
+        err(
+            "--no-proof requires --de or --de-stats, otherwise there is nothing to output"
+        )
+
+    if not os.path.isdir(args.input_dir):
+        err("%s is not a directory" % args.input_dir)
+
+    if os.path.realpath(args.input_dir) == os.path.realpath(args.output_dir):
+        err("the output directory must not be the input directory")
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    manifest_filename = args.manifest
+    if manifest_filename is None:
+        manifest_filename = os.path.join(args.output_dir, DEFAULT_MANIFEST_FILENAME)
+
+    watcher = Watcher(
+        opts,
+        args.input_dir,
+        list(dict.fromkeys(args.simulated_profile)),
+        args.output_dir,
+        proof=not args.no_proof,
+        de=args.de,
+        de_stats=args.de_stats,
+        workers=args.jobs,
+        queue_size=args.queue_size,
+        settle=args.settle,
+        poll_interval=args.poll_interval,
+        manifest_filename=manifest_filename,
+    )
+    try:
+        failed = asyncio.run(watcher.run(args.once))
+
+    except KeyboardInterrupt:
+        failed = watcher.counts["failed"]
+
+    print(
+        "watch done: %d jobs done, %d failed"
+        % (watcher.counts["done"], watcher.counts["failed"])
+    )
+    return 1 if failed > 0 else 0
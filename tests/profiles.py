@@ -0,0 +1,97 @@
+import io
+import os
+import struct
+from PIL import ImageCms
+
+REPOSITORY_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FOURTEEN_BALLS = os.path.join(REPOSITORY_DIR, "FourteenBalls.tif")
+
+
+def create_test_profiles(directory):
+    """Create a printer (sRGB with prtr device class) and a display (sRGB) profile."""
+    srgb = ImageCms.ImageCmsProfile(ImageCms.createProfile("sRGB")).tobytes()
+    printer = bytearray(srgb)
+    printer[12:16] = b"prtr"
+    printer_filename = os.path.join(directory, "printer.icc")
+    display_filename = os.path.join(directory, "display.icc")
+    with open(printer_filename, "wb") as f:
+        f.write(bytes(printer))
+
+    with open(display_filename, "wb") as f:
+        f.write(srgb)
+
+    return printer_filename, display_filename
+
+
+D50 = (0.9642, 1.0, 0.8249)
+# sRGB colorants adapted to D50
+SRGB_COLORANTS = (
+    (0.4361, 0.2225, 0.0139),
+    (0.3851, 0.7169, 0.0971),
+    (0.1431, 0.0606, 0.7141),
+)
+
+
+def _s15Fixed16(x):
+    return struct.pack(">i", round(x * 65536))
+
+
+def _XYZ_tag(XYZ):
+    return b"XYZ " + bytes(4) + b"".join(_s15Fixed16(x) for x in XYZ)
+
+
+def _curv_tag(gamma):
+    return b"curv" + bytes(4) + struct.pack(">IH", 1, round(gamma * 256)) + bytes(2)
+
+
+def _desc_tag(description):
+    ascii_description = description.encode("ascii") + b"\0"
+    return (
+        b"desc"
+        + bytes(4)
+        + struct.pack(">I", len(ascii_description))
+        + ascii_description
+        + bytes(4 + 4 + 2 + 1 + 67)
+    )
+
+
+def create_matrix_profile(
+    filename, colorants=SRGB_COLORANTS, gamma=2.2, device_class="prtr"
+):
+    """Create an ICC v2 RGB matrix/TRC profile with the D50 colorants."""
+    tags = [
+        (b"desc", _desc_tag("benekli test %s profile" % device_class)),
+        (b"wtpt", _XYZ_tag(D50)),
+        (b"rXYZ", _XYZ_tag(colorants[0])),
+        (b"gXYZ", _XYZ_tag(colorants[1])),
+        (b"bXYZ", _XYZ_tag(colorants[2])),
+        (b"rTRC", _curv_tag(gamma)),
+        (b"gTRC", _curv_tag(gamma)),
+        (b"bTRC", _curv_tag(gamma)),
+    ]
+    offset = 128 + 4 + 12 * len(tags)
+    tag_table = struct.pack(">I", len(tags))
+    data = b""
+    for signature, tag in tags:
+        tag_table += signature + struct.pack(">II", offset + len(data), len(tag))
+        data += tag + bytes(-len(tag) % 4)
+
+    size = offset + len(data)
+    header = (
+        struct.pack(">I", size)
+        + bytes(4)
+        + struct.pack(">I", 0x02100000)
+        + device_class.encode("ascii")
+        + b"RGB XYZ "
+        + bytes(12)
+        + b"acsp"
+        + bytes(4 + 4 + 4 + 4 + 8)
+        + struct.pack(">I", 0)
+        + b"".join(_s15Fixed16(x) for x in D50)
+        + bytes(4 + 16 + 28)
+    )
+    assert len(header) == 128
+    with open(filename, "wb") as f:
+        f.write(header + tag_table + data)
+
+    return filename
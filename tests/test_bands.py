@@ -0,0 +1,74 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+from PIL import Image, ImageCms
+from benekli import cache
+from benekli.benekli import CommandOptions, apply_in_bands, run_with_opts
+from tests.profiles import create_matrix_profile, create_test_profiles
+from tests.test_lut import NARROW_COLORANTS
+
+
+class TestBands(unittest.TestCase):
+    """Test applying the transforms to the bands of the image in threads."""
+
+    def setUp(self):
+        """Set up test environment."""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        _, self.display_profile = create_test_profiles(self.temp_dir.name)
+        self.printer_profile = create_matrix_profile(
+            os.path.join(self.temp_dir.name, "narrow.icc"), NARROW_COLORANTS, 1.8
+        )
+        self.pixels = np.random.default_rng(17).integers(
+            0, 256, (601, 499, 3), dtype=np.uint8
+        )
+        self.srgb = ImageCms.ImageCmsProfile(ImageCms.createProfile("sRGB"))
+
+    def tearDown(self):
+        """Clean up test environment."""
+        self.temp_dir.cleanup()
+        cache.cache_clear()
+
+    def test_apply_in_bands(self):
+        """Test that the bands give the same image as the whole image."""
+        image = Image.fromarray(self.pixels)
+        cms_transform = ImageCms.buildProofTransform(
+            self.srgb,
+            self.srgb,
+            ImageCms.ImageCmsProfile(self.printer_profile),
+            "RGB",
+            "RGB",
+            ImageCms.Intent.ABSOLUTE_COLORIMETRIC,
+            ImageCms.Intent.PERCEPTUAL,
+            ImageCms.Flags.SOFTPROOFING | ImageCms.Flags.GAMUTCHECK,
+        )
+        expected = cms_transform.point(image)
+        for threads in (1, 3, 4, 1000):
+            actual = apply_in_bands(cms_transform.point, image, threads)
+            self.assertEqual(actual.tobytes(), expected.tobytes())
+            self.assertEqual(actual.info, expected.info)
+
+    def test_threads(self):
+        """Test that the output files do not depend on the threads."""
+        input_image = os.path.join(self.temp_dir.name, "input.tif")
+        Image.fromarray(self.pixels).save(input_image, icc_profile=self.srgb.tobytes())
+        opts = CommandOptions()
+        opts.input_filename = input_image
+        opts.simulated_profile_filename = self.printer_profile
+        opts.display_profile_filename = self.display_profile
+        opts.de_formula = "ciede2000"
+        outputs = []
+        for threads in (1, 4):
+            opts.threads = threads
+            opts.output_filename = os.path.join(self.temp_dir.name, "%d.tif" % threads)
+            opts.de_filename = os.path.join(self.temp_dir.name, "%d.de.tif" % threads)
+            run_with_opts(opts)
+            for filename in (opts.output_filename, opts.de_filename):
+                with open(filename, "rb") as f:
+                    outputs.append(f.read())
+
+        self.assertEqual(outputs[:2], outputs[2:])
+
+
+if __name__ == "__main__":
+    unittest.main()
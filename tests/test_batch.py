@@ -0,0 +1,100 @@
+import json
+import os
+import tempfile
+import unittest
+from PIL import Image
+from benekli.batch import create_jobs, expand_images, read_manifest, run_batch
+from benekli.benekli import CommandOptions
+from tests.profiles import FOURTEEN_BALLS, create_test_profiles
+
+
+class TestBatch(unittest.TestCase):
+    """Test batch soft proofing."""
+
+    def setUp(self):
+        """Set up test environment."""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.printer_profile, self.display_profile = create_test_profiles(
+            self.temp_dir.name
+        )
+        self.output_dir = os.path.join(self.temp_dir.name, "out")
+        os.makedirs(self.output_dir)
+        self.manifest = os.path.join(self.output_dir, "manifest.jsonl")
+        self.opts = CommandOptions()
+        self.opts.display_profile_filename = self.display_profile
+        self.opts.bpc = True
+
+    def tearDown(self):
+        """Clean up test environment."""
+        self.temp_dir.cleanup()
+
+    def test_expand_images(self):
+        """Test that glob patterns are expanded and duplicates removed."""
+        for name in ("b.tif", "a.tif", "c.png"):
+            open(os.path.join(self.temp_dir.name, name), "w").close()
+
+        images = expand_images(
+            [
+                os.path.join(self.temp_dir.name, "*.tif"),
+                os.path.join(self.temp_dir.name, "a.tif"),
+            ]
+        )
+        self.assertEqual(
+            [os.path.basename(image) for image in images], ["a.tif", "b.tif"]
+        )
+        with self.assertRaises(SystemExit):
+            expand_images([os.path.join(self.temp_dir.name, "*.jpg")])
+
+    def test_create_jobs(self):
+        """Test the cross product of images and profiles and the output names."""
+        jobs = create_jobs(
+            ["x/a.tif", "b.tif"], ["p1.icc", "p2.icc"], self.opts, "out", True, True
+        )
+        self.assertEqual(len(jobs), 4)
+        self.assertEqual(jobs[1].input_filename, "x/a.tif")
+        self.assertEqual(jobs[1].simulated_profile_filename, "p2.icc")
+        self.assertEqual(jobs[1].output_filename, os.path.join("out", "a.p2.p.bpc.tif"))
+        self.assertEqual(jobs[1].de_filename, os.path.join("out", "a.p2.p.bpc.de.tif"))
+
+    def test_run_batch_and_resume(self):
+        """Test running a batch and resuming it from the manifest."""
+        jobs = create_jobs(
+            [FOURTEEN_BALLS],
+            [self.printer_profile],
+            self.opts,
+            self.output_dir,
+            True,
+            True,
+        )
+        self.assertEqual(run_batch(jobs, 1, self.manifest), 0)
+        with Image.open(jobs[0].output_filename) as im:
+            self.assertEqual(im.mode, "RGB")
+
+        self.assertTrue(os.path.exists(jobs[0].de_filename))
+        self.assertEqual(len(read_manifest(self.manifest)), 1)
+
+        # an interrupted write leaves an incomplete line
+        with open(self.manifest, "a", encoding="utf-8") as f:
+            f.write('{"image": ')
+
+        os.remove(jobs[0].output_filename)
+        self.assertEqual(run_batch(jobs, 1, self.manifest), 0)
+        self.assertFalse(os.path.exists(jobs[0].output_filename))
+
+    def test_failed_job(self):
+        """Test that a failed job is recorded and retried."""
+        missing_profile = os.path.join(self.temp_dir.name, "missing.icc")
+        jobs = create_jobs(
+            [FOURTEEN_BALLS], [missing_profile], self.opts, self.output_dir, True, False
+        )
+        self.assertEqual(run_batch(jobs, 1, self.manifest), 1)
+        self.assertEqual(len(read_manifest(self.manifest)), 0)
+        with open(self.manifest, "r", encoding="utf-8") as f:
+            record = json.loads(f.readline())
+
+        self.assertEqual(record["status"], "failed")
+        self.assertEqual(run_batch(jobs, 1, self.manifest), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,40 @@
+import unittest
+from benekli import bench
+
+
+class TestBench(unittest.TestCase):
+    """Test the benchmarks."""
+
+    def test_run_stage(self):
+        """Test the result records of the stages."""
+        for stage in bench.BENCH_STAGES:
+            with self.subTest(stage=stage):
+                result = bench.run_stage(stage, 0.01, 1)
+                self.assertEqual(result["stage"], stage)
+                self.assertEqual(result["image"], "synthetic-0.01MP")
+                self.assertEqual(result["megapixels"], 0.01)
+                self.assertGreater(result["seconds"], 0)
+                self.assertGreater(result["mp_per_s"], 0)
+
+    def test_compare(self):
+        """Test that the stages slower than the tolerance are regressions."""
+        baseline = {
+            "results": [
+                {"stage": "de76", "image": "a.tif", "seconds": 1.0},
+                {"stage": "de2000", "image": "a.tif", "seconds": 1.0},
+            ]
+        }
+        results = [
+            {"stage": "de76", "image": "a.tif", "seconds": 1.2},
+            {"stage": "de2000", "image": "a.tif", "seconds": 1.5},
+            {"stage": "proof", "image": "a.tif", "seconds": 9.0},
+        ]
+        compared, regressions = bench.compare(results, baseline, 0.25)
+        self.assertEqual(
+            [result.get("change") for result in compared], [0.2, 0.5, None]
+        )
+        self.assertEqual(regressions, [compared[1]])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,70 @@
+import os
+import tempfile
+import unittest
+from PIL import ImageCms
+from benekli import cache
+from benekli.benekli import CommandOptions, run_with_opts
+from tests.profiles import FOURTEEN_BALLS, create_test_profiles
+
+
+class TestCache(unittest.TestCase):
+    """Test the profile and transform caches."""
+
+    def setUp(self):
+        """Set up test environment."""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.printer_profile, self.display_profile = create_test_profiles(
+            self.temp_dir.name
+        )
+        cache.cache_clear()
+
+    def tearDown(self):
+        """Clean up test environment."""
+        self.temp_dir.cleanup()
+        cache.cache_clear()
+
+    def test_lru(self):
+        """Test the eviction order and the counters."""
+        lru = cache.LRUCache(2)
+        self.assertEqual(lru.get("a", lambda: 1), 1)
+        self.assertEqual(lru.get("b", lambda: 2), 2)
+        self.assertEqual(lru.get("a", lambda: 3), 1)
+        self.assertEqual(lru.get("c", lambda: 4), 4)
+        # b is the least recently used
+        self.assertEqual(lru.get("b", lambda: 5), 5)
+        self.assertEqual(lru.info(), cache.CacheInfo(1, 4, 2, 2))
+
+    def test_profile_key(self):
+        """Test that profiles with the same content have the same key."""
+        printer = cache.get_profile(self.printer_profile)
+        display = cache.get_profile(self.display_profile)
+        self.assertIs(cache.get_profile(self.printer_profile), printer)
+        self.assertNotEqual(
+            cache.get_profile_key(printer), cache.get_profile_key(display)
+        )
+        # same content as the display profile, but not opened by the cache
+        srgb = ImageCms.ImageCmsProfile(ImageCms.createProfile("sRGB"))
+        self.assertEqual(cache.get_profile_key(srgb), cache.get_profile_key(display))
+
+    def test_repeated_proofs(self):
+        """Test that repeated proofs reuse the profiles and the transforms."""
+        opts = CommandOptions()
+        opts.input_filename = FOURTEEN_BALLS
+        opts.simulated_profile_filename = self.printer_profile
+        opts.display_profile_filename = self.display_profile
+        opts.de_filename = os.path.join(self.temp_dir.name, "de.tif")
+        run_with_opts(opts)
+        info = cache.cache_info()
+        # proof, input to Lab and proof to Lab
+        self.assertEqual(info["transforms"].misses, 3)
+        self.assertEqual(info["transforms"].hits, 0)
+        run_with_opts(opts)
+        run_with_opts(opts)
+        info = cache.cache_info()
+        self.assertEqual(info["transforms"].misses, 3)
+        self.assertEqual(info["transforms"].hits, 6)
+        self.assertEqual(info["profiles"].currsize, info["profiles"].misses)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -2,7 +2,8 @@ import unittest
 import os
 import tempfile
 from unittest.mock import patch, MagicMock
-from benekli.benekli import CommandOptions, run
+from benekli.benekli import CommandOptions
+from benekli.cli import run
 
 class TestCommandLineInterface(unittest.TestCase):
     """Test the command-line interface functionality."""
@@ -31,6 +32,7 @@ class TestCommandLineInterface(unittest.TestCase):
         mock_args.rendering_intent = "p"
         mock_args.output_image = None
         mock_args.output_de = None
+        mock_args.output_de_stats = None
         mock_args.verbose = 0
         mock_parse_args.return_value = mock_args
         
@@ -83,6 +85,12 @@ class TestCommandLineInterface(unittest.TestCase):
         
         self.assertIsNotNone(opts.output_filename)
         self.assertIsNotNone(opts.de_filename)
+    @patch('benekli.cli.run')
+    def test_benekli_run(self, mock_run):
+        """Test that benekli.benekli.run runs the command line."""
+        from benekli import benekli
+        benekli.run(['-h'])
+        mock_run.assert_called_once_with(['-h'])
 
 if __name__ == '__main__':
     unittest.main()
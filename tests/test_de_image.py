@@ -0,0 +1,220 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+import numpy as np
+from PIL import Image, ImageCms
+from benekli import benekli, formulas, parallel
+from benekli.benekli import CommandOptions, build_de_lut, calculate_de_statistics
+from benekli.benekli import create_de_image, de_colorizer, iterate_de
+from benekli.lab8 import decode_Lab8
+from benekli.formulas import de76_array, de2000_array
+from benekli.stats import DeStatistics
+from tests.profiles import create_test_profiles
+
+
+class TestDeColorizer(unittest.TestCase):
+    """Test the delta E heatmap colorizer."""
+
+    def test_default_bands(self):
+        """Test the default 1/2/3/8 bands."""
+        de = np.array([0.0, 1.0, 1.001, 2.0, 2.5, 3.0, 8.0, 20.0])
+        colors = de_colorizer(de)
+        self.assertEqual(colors.dtype, np.uint8)
+        self.assertEqual(colors.shape, (8, 3))
+        self.assertEqual(colors[0].tolist(), [0, 0xFF, 0])
+        self.assertEqual(colors[1].tolist(), [0, 0xFF, 0])
+        self.assertEqual(colors[2].tolist(), [0xFF, 0xFF, 0])
+        self.assertEqual(colors[3].tolist(), [0xFF, 0xFF, 0])
+        self.assertEqual(colors[4].tolist(), [0xFF, 0x45, 0])
+        self.assertEqual(colors[5].tolist(), [0xFF, 0x45, 0])
+        self.assertEqual(colors[6].tolist(), [0xFF, 0, 0])
+        self.assertEqual(colors[7].tolist(), [0xFF, 0, 0])
+
+    def test_gradient(self):
+        """Test the red gradient between the last two thresholds."""
+        colors = de_colorizer(np.array([5.5]))
+        self.assertEqual(colors[0].tolist(), [0xFF, 70, 70])
+
+    def test_custom_thresholds_and_palette(self):
+        """Test custom thresholds and palette."""
+        thresholds = (0.5, 4.0)
+        palette = ((0, 0, 0), (0, 0, 0), (200, 200, 200))
+        colors = de_colorizer(np.array([[0.5, 2.25, 4.0, 9.0]]), thresholds, palette)
+        self.assertEqual(colors.shape, (1, 4, 3))
+        self.assertEqual(colors[0, 0].tolist(), [0, 0, 0])
+        self.assertEqual(colors[0, 1].tolist(), [100, 100, 100])
+        self.assertEqual(colors[0, 2].tolist(), [200, 200, 200])
+        self.assertEqual(colors[0, 3].tolist(), [200, 200, 200])
+
+    def test_invalid_palette(self):
+        """Test that the palette must have one more color than the thresholds."""
+        with self.assertRaises(SystemExit):
+            build_de_lut((1.0, 2.0), ((0, 0, 0), (0, 0, 0)))
+
+
+class TestCreateDeImage(unittest.TestCase):
+    """Test creating the delta E image."""
+
+    def test_create_de_image(self):
+        """Test that the delta E image is colored per pixel."""
+        Lab1 = np.zeros((2, 3, 3), dtype=np.uint8)
+        Lab2 = np.zeros((2, 3, 3), dtype=np.uint8)
+        Lab2[0, 1] = (2, 0, 0)
+        Lab2[1, 2] = (10, 0, 0)
+        im1 = Image.fromarray(Lab1, mode="LAB")
+        im2 = Image.fromarray(Lab2, mode="LAB")
+        de_image = create_de_image(de76_array, im1, im2)
+        self.assertEqual(de_image.mode, "RGB")
+        self.assertEqual(de_image.size, (3, 2))
+        out = np.asarray(de_image)
+        self.assertEqual(out[0, 0].tolist(), [0, 0xFF, 0])
+        self.assertEqual(out[0, 1].tolist(), [0xFF, 0xFF, 0])
+        self.assertEqual(out[1, 2].tolist(), [0xFF, 0, 0])
+
+    def test_signed_ab(self):
+        """Test delta E of the LittleCMS Lab images with a and b on both sides
+        of 0 against the scalar formulas."""
+        to_Lab = ImageCms.buildTransform(
+            ImageCms.createProfile("sRGB"), ImageCms.createProfile("LAB"), "RGB", "LAB"
+        )
+        rgb1 = [[(128, 128, 128), (130, 126, 128), (128, 128, 131), (60, 61, 60)]]
+        rgb2 = [[(126, 130, 128), (128, 128, 128), (128, 128, 125), (61, 60, 61)]]
+        im1 = to_Lab.apply(Image.fromarray(np.array(rgb1, dtype=np.uint8)))
+        im2 = to_Lab.apply(Image.fromarray(np.array(rgb2, dtype=np.uint8)))
+        a = decode_Lab8(np.asarray(im1))[..., 1:]
+        self.assertTrue((a > 0).any() and (a < 0).any())
+
+        def get_Lab(im, x):
+            # Pillow returns the pixels with a +128 offset
+            L, a, b = im.getpixel((x, 0))
+            return (L * 100 / 255, a - 128, b - 128)
+
+        opts = CommandOptions()
+        for de_formula, formula in (
+            ("cie76", formulas.de76),
+            ("cie94", formulas.de94_for_graphic_arts),
+            ("ciede2000", formulas.de2000),
+        ):
+            with self.subTest(de_formula=de_formula):
+                opts.de_formula = de_formula
+                de = np.concatenate(
+                    [
+                        chunk_de
+                        for _, chunk_de in iterate_de(
+                            opts.get_color_difference_formula(), im1, im2
+                        )
+                    ]
+                )
+                expected = [formula(get_Lab(im1, x), get_Lab(im2, x)) for x in range(4)]
+                np.testing.assert_allclose(de, expected, rtol=1e-5, atol=1e-5)
+                self.assertLess(de.max(), 8)
+
+        de_image = create_de_image(opts.get_color_difference_formula(), im1, im2)
+        np.testing.assert_array_equal(np.asarray(de_image)[0], de_colorizer(de))
+
+
+class TestDeProcesses(unittest.TestCase):
+    """Test calculating delta E in worker processes."""
+
+    def tearDown(self):
+        """Clean up test environment."""
+        parallel.shutdown()
+
+    def test_processes(self):
+        """Test that the processes give the same image and statistics."""
+        rng = np.random.default_rng(19)
+        im1, im2 = [
+            Image.fromarray(rng.integers(0, 256, (300, 301, 3), dtype=np.uint8), "LAB")
+            for _ in range(2)
+        ]
+        images = []
+        reports = []
+        for processes in (1, 3):
+            statistics = DeStatistics()
+            images.append(
+                create_de_image(
+                    de2000_array,
+                    im1,
+                    im2,
+                    statistics=statistics,
+                    processes=processes,
+                ).tobytes()
+            )
+            reports.append(statistics.to_dict())
+            statistics = DeStatistics()
+            calculate_de_statistics(de2000_array, im1, im2, statistics, processes)
+            reports.append(statistics.to_dict())
+
+        self.assertEqual(images[0], images[1])
+        for report in reports[1:]:
+            self.assertEqual(report["count"], 300 * 301)
+            self.assertAlmostEqual(report["mean"], reports[0]["mean"], places=10)
+            for key in ("median", "p95", "p99", "max", "percent_above"):
+                self.assertEqual(report[key], reports[0][key])
+
+
+class TestDeDirect(unittest.TestCase):
+    """Test calculating delta E of the simulated colors directly."""
+
+    def setUp(self):
+        """Set up test environment."""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.printer_profile, self.display_profile = create_test_profiles(
+            self.temp_dir.name
+        )
+        # an sRGB image, so the colors are in the gamut of the printer and
+        # the display
+        input_image = os.path.join(self.temp_dir.name, "input.tif")
+        rng = np.random.default_rng(3)
+        Image.fromarray(rng.integers(0, 256, (64, 64, 3), dtype=np.uint8)).save(
+            input_image,
+            icc_profile=ImageCms.ImageCmsProfile(
+                ImageCms.createProfile("sRGB")
+            ).tobytes(),
+        )
+        self.opts = benekli.CommandOptions()
+        self.opts.input_filename = input_image
+        self.opts.simulated_profile_filename = self.printer_profile
+        self.opts.de_filename = os.path.join(self.temp_dir.name, "de.tif")
+
+    def tearDown(self):
+        """Clean up test environment."""
+        self.temp_dir.cleanup()
+
+    def get_output_Lab(self):
+        with mock.patch(
+            "benekli.benekli.create_de_image", wraps=benekli.create_de_image
+        ) as de_image:
+            benekli.run_with_opts(self.opts)
+            return np.asarray(de_image.call_args.args[2]).view(np.int8).astype(int)
+
+    def test_de_float_processes(self):
+        """Test the warning that the processes are not used with float Lab."""
+        self.opts.display_profile_filename = self.display_profile
+        self.opts.de_float = True
+        self.opts.de_processes = 2
+        with self.assertLogs("benekli.benekli", "WARNING") as logs:
+            benekli.run_with_opts(self.opts)
+
+        self.assertIn("--de-processes is not used with --de-float", logs.output[0])
+
+    def test_de_direct(self):
+        """Test that delta E direct does not need the display profile."""
+        self.opts.de_direct = True
+        with mock.patch("benekli.benekli.ImageCms.get_display_profile") as display:
+            direct = self.get_output_Lab()
+            display.assert_not_called()
+
+        # the image, the printer and the display are all sRGB, so the proof on
+        # the display has the same colors, up to the rounding to 8-bit RGB
+        self.opts.de_direct = False
+        self.opts.display_profile_filename = self.display_profile
+        on_display = self.get_output_Lab()
+        error = np.abs(direct - on_display)
+        error[..., 0] = np.minimum(error[..., 0], 256 - error[..., 0])
+        self.assertLessEqual(error.max(), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
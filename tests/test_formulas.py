@@ -2,7 +2,11 @@
 
 import unittest
 import math
+import numpy as np
 from benekli.formulas import de76, de94, de94_for_graphic_arts, de94_for_textiles, de2000
+from benekli.formulas import de76_array, de94_for_graphic_arts_array, de94_for_textiles_array, de2000_array
+from benekli.formulas import nXYZ_to_PCSXYZ, PCSXYZ_to_nXYZ, XYZ_to_xyY, xyY_to_XYZ
+from benekli.formulas import XYZ_to_Lab, Lab_to_XYZ, Lab_to_LCh, LCh_to_Lab
 
 class TestColorDifferenceFormulas(unittest.TestCase):
     """Test cases for color difference formulas (de76, de94, de2000)."""
@@ -24,7 +28,7 @@ class TestColorDifferenceFormulas(unittest.TestCase):
                 10.0,        # expected de76
                 10.0,        # expected de94_graphic
                 5.0,         # expected de94_textile (kL=2.0)
-                10.0         # expected de2000
+                9.47         # expected de2000 (10 / SL, SL = 1.0559 for L' = 55)
             ),
             (
                 (50, 0, 0),  # Lab1
@@ -239,5 +243,134 @@ class TestColorDifferenceFormulas(unittest.TestCase):
             self.skipTest(f"de2000 triangle inequality test skipped: {e}")
 
 
+class TestColorDifferenceArrayFormulas(unittest.TestCase):
+    """Test that the array formulas match the scalar formulas."""
+
+    def setUp(self):
+        """Set up random Lab images, including some identical pixels."""
+        rng = np.random.default_rng(2025)
+        self.Lab1 = rng.integers(0, 256, size=(16, 24, 3), dtype=np.uint8)
+        self.Lab2 = rng.integers(0, 256, size=(16, 24, 3), dtype=np.uint8)
+        self.Lab2[0, :] = self.Lab1[0, :]
+        self.Lab2[1, :, 1:] = self.Lab1[1, :, 1:]
+
+    def assert_matches_scalar(self, array_formula, scalar_formula):
+        result = array_formula(self.Lab1, self.Lab2)
+        self.assertEqual(result.shape, self.Lab1.shape[:2])
+        for y, x in np.ndindex(result.shape):
+            Lab1 = tuple(int(v) for v in self.Lab1[y, x])
+            Lab2 = tuple(int(v) for v in self.Lab2[y, x])
+            self.assertAlmostEqual(result[y, x], scalar_formula(Lab1, Lab2), places=10)
+
+    def test_de76_array(self):
+        """Test de76_array against de76."""
+        self.assert_matches_scalar(de76_array, de76)
+
+    def test_de94_array(self):
+        """Test de94 array versions against de94."""
+        self.assert_matches_scalar(de94_for_graphic_arts_array, de94_for_graphic_arts)
+        self.assert_matches_scalar(de94_for_textiles_array, de94_for_textiles)
+
+    def test_de2000_array(self):
+        """Test de2000_array against de2000."""
+        self.assert_matches_scalar(de2000_array, de2000)
+
+    def test_de2000_array_sharma_dataset(self):
+        """Test de2000_array against Sharma et al. (2005) dataset."""
+        cases = TestColorDifferenceFormulas("test_de2000_sharma_dataset")
+        cases.setUp()
+        Lab1 = np.array([case[0] for case in cases.sharma_test_cases])
+        Lab2 = np.array([case[1] for case in cases.sharma_test_cases])
+        expected = np.array([case[2] for case in cases.sharma_test_cases])
+        np.testing.assert_allclose(de2000_array(Lab1, Lab2), expected, atol=1e-4)
+        np.testing.assert_allclose(de2000_array(Lab2, Lab1), expected, atol=1e-4)
+
+    def test_de2000_array_opposite_hues(self):
+        """Test de2000_array with hues differing by exactly 180 degrees."""
+        Lab1 = np.array([(50, 1, 0), (50, -1, 0), (50, 3, 4), (60, 0, -2)])
+        Lab2 = np.array([(50, -1, 0), (50, 1, 0), (50, -6, -8), (60, 0, 5)])
+        result = de2000_array(Lab1, Lab2)
+        for i in range(len(Lab1)):
+            expected = de2000(tuple(Lab1[i].tolist()), tuple(Lab2[i].tolist()))
+            self.assertAlmostEqual(result[i], expected, places=10)
+
+    def test_array_broadcasting(self):
+        """Test that the array formulas work on (N, 3) arrays and triples."""
+        Lab1 = [(50, 60, 30), (50, 0, 0)]
+        Lab2 = [(60, 40, 60), (60, 0, 0)]
+        result = de76_array(Lab1, Lab2)
+        self.assertEqual(result.shape, (2,))
+        self.assertAlmostEqual(result[0], 37.42, places=2)
+        self.assertAlmostEqual(float(de76_array((50, 0, 0), (60, 0, 0))), 10.0)
+
+
+D50 = (0.9642, 1.0, 0.8249)
+
+
+class TestConversions(unittest.TestCase):
+    """Test the conversions of color triples and arrays."""
+
+    def setUp(self):
+        """Set up (H, W, 3) XYZ colors, some of them darker than (6/29)^3."""
+        rng = np.random.default_rng(19)
+        self.XYZ = rng.uniform(0.0, 1.0, (4, 5, 3)) * rng.choice([1.0, 0.005], (4, 5, 3))
+        self.XYZ[0, 0] = 0.0
+        self.XYZ[0, 1] = D50
+
+    def assert_matches_scalar(self, conversion, colors, *args):
+        result = conversion(colors, *args)
+        self.assertEqual(result.shape, colors.shape)
+        for index in np.ndindex(colors.shape[:-1]):
+            expected = conversion(tuple(colors[index].tolist()), *args)
+            self.assertIsInstance(expected, tuple)
+            np.testing.assert_allclose(result[index], expected, rtol=1e-12, atol=1e-12)
+
+    def test_arrays_match_scalars(self):
+        """Test the array versions against the scalar versions."""
+        media_white = (0.95, 1.0, 0.8)
+        Lab = XYZ_to_Lab(self.XYZ, D50)
+        self.assert_matches_scalar(nXYZ_to_PCSXYZ, self.XYZ, media_white)
+        self.assert_matches_scalar(PCSXYZ_to_nXYZ, self.XYZ, media_white)
+        self.assert_matches_scalar(XYZ_to_xyY, self.XYZ, D50)
+        self.assert_matches_scalar(xyY_to_XYZ, XYZ_to_xyY(self.XYZ[1:], D50))
+        self.assert_matches_scalar(XYZ_to_Lab, self.XYZ, D50)
+        self.assert_matches_scalar(Lab_to_XYZ, Lab, D50)
+        self.assert_matches_scalar(Lab_to_LCh, Lab)
+        self.assert_matches_scalar(LCh_to_Lab, Lab_to_LCh(Lab))
+
+    def test_round_trips(self):
+        """Test that the conversions invert each other."""
+        XYZ = self.XYZ.reshape(-1, 3)
+        media_white = (0.95, 1.0, 0.8)
+        np.testing.assert_allclose(
+            PCSXYZ_to_nXYZ(nXYZ_to_PCSXYZ(XYZ, media_white), media_white), XYZ
+        )
+        np.testing.assert_allclose(xyY_to_XYZ(XYZ_to_xyY(XYZ[1:], D50)), XYZ[1:])
+        Lab = XYZ_to_Lab(XYZ, D50)
+        np.testing.assert_allclose(Lab_to_XYZ(Lab, D50), XYZ, atol=1e-12)
+        np.testing.assert_allclose(LCh_to_Lab(Lab_to_LCh(Lab)), Lab, atol=1e-12)
+
+    def test_known_values(self):
+        """Test white, black and the hue angles."""
+        for conversion in (lambda c: c, np.array):
+            np.testing.assert_allclose(XYZ_to_Lab(conversion(D50), D50), (100, 0, 0))
+            np.testing.assert_allclose(Lab_to_XYZ(conversion((100, 0, 0)), D50), D50)
+            np.testing.assert_allclose(Lab_to_XYZ(conversion((0, 0, 0)), D50), (0, 0, 0), atol=1e-15)
+            np.testing.assert_allclose(
+                XYZ_to_xyY(conversion((0, 0, 0)), D50), (0.3457, 0.3585, 0), atol=1e-4
+            )
+            np.testing.assert_allclose(Lab_to_LCh(conversion((50, 0, 10))), (50, 10, math.pi / 2))
+            np.testing.assert_allclose(Lab_to_LCh(conversion((50, -10, 0))), (50, 10, math.pi))
+
+    def test_float32(self):
+        """Test that float32 arrays stay float32 and integer arrays are float64."""
+        XYZ = self.XYZ.astype(np.float32)
+        for conversion in (XYZ_to_Lab, Lab_to_XYZ, XYZ_to_xyY):
+            self.assertEqual(conversion(XYZ, D50).dtype, np.float32)
+        for conversion in (Lab_to_LCh, LCh_to_Lab, xyY_to_XYZ):
+            self.assertEqual(conversion(XYZ[1:]).dtype, np.float32)
+        self.assertEqual(Lab_to_LCh(np.array([(50, 3, 4)])).dtype, np.float64)
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,65 @@
+import unittest
+import numpy as np
+from PIL import Image, ImageCms
+from benekli.formulas import de76_array, de94_for_graphic_arts_array
+from benekli.formulas import de94_for_textiles_array, de2000_array
+from benekli.lab8 import decode_Lab8, de76_Lab8, get_chroma
+from benekli.lab8 import de94_for_graphic_arts_Lab8, de94_for_textiles_Lab8
+from benekli.lab8 import de2000_Lab8
+
+
+class TestLab8(unittest.TestCase):
+    """Test the formulas of 8-bit Lab."""
+
+    def setUp(self):
+        """Set up random 8-bit Lab images."""
+        rng = np.random.default_rng(29)
+        self.Lab1 = rng.integers(0, 256, (5000, 3), dtype=np.uint8)
+        self.Lab2 = rng.integers(0, 256, (5000, 3), dtype=np.uint8)
+
+    def test_decode(self):
+        """Test that a and b are signed and L is scaled to 0...100."""
+        decoded = decode_Lab8([(255, 255, 128), (0, 127, 0)])
+        np.testing.assert_allclose(decoded, [(100, -1, -128), (0, 127, 0)])
+        # a and b close to 0 on both sides
+        self.assertEqual(float(de76_Lab8((128, 255, 1), (128, 1, 255))), np.sqrt(8))
+
+    def test_pillow_Lab(self):
+        """Test the decoded Lab of sRGB blue in Pillow."""
+        srgb = ImageCms.createProfile("sRGB")
+        lab = ImageCms.createProfile("LAB")
+        to_Lab = ImageCms.buildTransform(srgb, lab, "RGB", "LAB")
+        blue = to_Lab.apply(Image.new("RGB", (1, 1), (0, 0, 255)))
+        L, a, b = decode_Lab8(np.asarray(blue))[0, 0]
+        # D50 Lab of sRGB blue is about 29.6, 68.3, -112.0
+        self.assertAlmostEqual(L, 29.6, delta=1)
+        self.assertAlmostEqual(a, 68.3, delta=1)
+        self.assertAlmostEqual(b, -112.0, delta=1)
+
+    def test_chroma(self):
+        """Test the lookup table against calculating all (a, b) pairs."""
+        Lab = np.zeros((256, 256, 3), dtype=np.uint8)
+        Lab[..., 0] = np.arange(256)[:, np.newaxis]
+        Lab[..., 1] = np.arange(256)[:, np.newaxis]
+        Lab[..., 2] = np.arange(256)[np.newaxis, :]
+        decoded = decode_Lab8(Lab)
+        np.testing.assert_array_equal(
+            get_chroma(Lab), np.sqrt(decoded[..., 1] ** 2 + decoded[..., 2] ** 2)
+        )
+
+    def test_formulas(self):
+        """Test that the lookup table does not change delta E."""
+        for Lab8_formula, array_formula in (
+            (de76_Lab8, de76_array),
+            (de94_for_graphic_arts_Lab8, de94_for_graphic_arts_array),
+            (de94_for_textiles_Lab8, de94_for_textiles_array),
+            (de2000_Lab8, de2000_array),
+        ):
+            np.testing.assert_array_equal(
+                Lab8_formula(self.Lab1, self.Lab2),
+                array_formula(decode_Lab8(self.Lab1), decode_Lab8(self.Lab2)),
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()
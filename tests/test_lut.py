@@ -0,0 +1,208 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+import numpy as np
+from PIL import Image, ImageCms
+from benekli import cache, lut
+from benekli.benekli import CommandOptions, get_strip_memory, run_with_opts
+from tests.profiles import SRGB_COLORANTS, create_matrix_profile
+from tests.profiles import create_test_profiles
+
+# a printer with a smaller gamut than sRGB
+NARROW_COLORANTS = tuple(
+    map(
+        tuple,
+        np.array([[0.7, 0.2, 0.1], [0.15, 0.7, 0.15], [0.1, 0.2, 0.7]])
+        @ np.array(SRGB_COLORANTS),
+    )
+)
+
+
+class TestLUT(unittest.TestCase):
+    """Test the 3D LUTs and their on-disk cache."""
+
+    def setUp(self):
+        """Set up test environment."""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        _, self.display_profile = create_test_profiles(self.temp_dir.name)
+        self.printer_profile = create_matrix_profile(
+            os.path.join(self.temp_dir.name, "narrow.icc"), NARROW_COLORANTS, 1.8
+        )
+        self.pixels = np.random.default_rng(7).integers(
+            0, 256, (256, 256, 3), dtype=np.uint8
+        )
+        self.srgb = ImageCms.ImageCmsProfile(ImageCms.createProfile("sRGB"))
+        self.lab = ImageCms.ImageCmsProfile(ImageCms.createProfile("LAB"))
+
+    def tearDown(self):
+        """Clean up test environment."""
+        self.temp_dir.cleanup()
+        cache.cache_clear()
+
+    def assert_lut_accuracy(self, cms_transform, image, out_mode, max_error):
+        lut_array = lut.sample_transform(cms_transform, image.mode)
+        self.assertEqual(lut_array.shape, (52, 52, 52, 3))
+        expected = np.asarray(cms_transform.apply(image))
+        actual = lut.apply_lut(lut_array, np.asarray(image), image.mode, out_mode)
+        if out_mode == "LAB":
+            # a and b are signed
+            expected = expected.view(np.int8)
+            actual = actual.view(np.int8)
+
+        error = np.abs(actual.astype(int) - expected.astype(int))
+        if out_mode == "LAB":
+            error[..., 0] = np.minimum(error[..., 0], 256 - error[..., 0])
+
+        self.assertLessEqual(error.max(), max_error)
+
+    def test_proof_accuracy(self):
+        """Test the documented accuracy of the proof LUT."""
+        printer = ImageCms.ImageCmsProfile(self.printer_profile)
+        for proof_intent, flags in (
+            (ImageCms.Intent.ABSOLUTE_COLORIMETRIC, 0),
+            (
+                ImageCms.Intent.RELATIVE_COLORIMETRIC,
+                ImageCms.Flags.BLACKPOINTCOMPENSATION,
+            ),
+        ):
+            cms_transform = ImageCms.buildProofTransform(
+                self.srgb,
+                self.srgb,
+                printer,
+                "RGB",
+                "RGB",
+                ImageCms.Intent.ABSOLUTE_COLORIMETRIC,
+                proof_intent,
+                ImageCms.Flags.SOFTPROOFING | flags,
+            )
+            self.assert_lut_accuracy(
+                cms_transform, Image.fromarray(self.pixels), "RGB", 2
+            )
+
+    def test_Lab_accuracy(self):
+        """Test the LUTs with Lab input and output."""
+        to_Lab = ImageCms.buildTransform(self.srgb, self.lab, "RGB", "LAB")
+        self.assert_lut_accuracy(to_Lab, Image.fromarray(self.pixels), "LAB", 2)
+        Lab_image = to_Lab.apply(Image.fromarray(self.pixels))
+        cms_transform = ImageCms.buildProofTransform(
+            self.lab,
+            self.srgb,
+            ImageCms.ImageCmsProfile(self.printer_profile),
+            "LAB",
+            "RGB",
+            ImageCms.Intent.ABSOLUTE_COLORIMETRIC,
+            ImageCms.Intent.RELATIVE_COLORIMETRIC,
+            ImageCms.Flags.SOFTPROOFING,
+        )
+        self.assert_lut_accuracy(cms_transform, Lab_image, "RGB", 6)
+
+    def test_grid_nodes_are_exact(self):
+        """Test that the LUT gives the transform output at the grid nodes."""
+        cms_transform = ImageCms.buildTransform(self.srgb, self.lab, "RGB", "LAB")
+        lut_array = lut.sample_transform(cms_transform, "RGB", 15)
+        nodes = self.pixels // 15 * 15
+        self.assertTrue(
+            np.array_equal(
+                lut.apply_lut(lut_array, nodes, "RGB", "LAB"),
+                np.asarray(cms_transform.apply(Image.fromarray(nodes))),
+            )
+        )
+        with self.assertRaises(ValueError):
+            lut.get_grid_size(4)
+
+    def test_lut_cache(self):
+        """Test that a warm cache does not open the profiles."""
+        input_image = os.path.join(self.temp_dir.name, "input.tif")
+        Image.fromarray(self.pixels).save(input_image, icc_profile=self.srgb.tobytes())
+        opts = CommandOptions()
+        opts.input_filename = input_image
+        opts.simulated_profile_filename = self.printer_profile
+        opts.display_profile_filename = self.display_profile
+        opts.lut_cache_dir = os.path.join(self.temp_dir.name, "luts")
+        opts.output_filename = os.path.join(self.temp_dir.name, "cold.tif")
+        opts.de_filename = os.path.join(self.temp_dir.name, "cold.de.tif")
+        run_with_opts(opts)
+        # proof and sRGB to Lab, both the input and the display profiles are sRGB
+        self.assertEqual(len(os.listdir(opts.lut_cache_dir)), 2)
+        opts.output_filename = os.path.join(self.temp_dir.name, "warm.tif")
+        opts.de_filename = os.path.join(self.temp_dir.name, "warm.de.tif")
+        with (
+            mock.patch("benekli.benekli.open_profiles", side_effect=AssertionError),
+            mock.patch("benekli.cache.ImageCms.buildProofTransform") as build,
+        ):
+            run_with_opts(opts)
+            build.assert_not_called()
+
+        for name in ("%s.tif", "%s.de.tif"):
+            with (
+                Image.open(os.path.join(self.temp_dir.name, name % "cold")) as cold,
+                Image.open(os.path.join(self.temp_dir.name, name % "warm")) as warm,
+            ):
+                self.assertTrue(np.array_equal(np.asarray(cold), np.asarray(warm)))
+                self.assertEqual(cold.info["icc_profile"], warm.info["icc_profile"])
+
+        # the LUTs of an earlier LUT_VERSION are not used
+        with mock.patch("benekli.lut.LUT_VERSION", lut.LUT_VERSION + 1):
+            run_with_opts(opts)
+
+        self.assertEqual(len(os.listdir(opts.lut_cache_dir)), 4)
+
+        # gamut check is not cached
+        opts.gamut_check = True
+        with mock.patch("benekli.lut.LUTCache") as lut_cache:
+            run_with_opts(opts)
+            lut_cache.assert_not_called()
+
+    def test_de_lut(self):
+        """Test delta E interpolated in the cached delta E LUT."""
+        input_image = os.path.join(self.temp_dir.name, "input.tif")
+        Image.fromarray(self.pixels).save(input_image, icc_profile=self.srgb.tobytes())
+        opts = CommandOptions()
+        opts.input_filename = input_image
+        opts.simulated_profile_filename = self.printer_profile
+        opts.display_profile_filename = self.display_profile
+        opts.de_formula = "ciede2000"
+
+        def get_report(name, de_lut, memory_budget=None):
+            opts.de_lut = de_lut
+            opts.memory_budget = memory_budget
+            opts.de_stats_filename = os.path.join(self.temp_dir.name, name)
+            run_with_opts(opts)
+            with open(opts.de_stats_filename, "r", encoding="utf-8") as f:
+                return json.load(f)
+
+        calculated = get_report("calculated.json", False)
+        opts.lut_cache_dir = os.path.join(self.temp_dir.name, "luts")
+        cold = get_report("cold.json", True)
+        with mock.patch("benekli.benekli.open_profiles", side_effect=AssertionError):
+            warm = get_report("warm.json", True)
+            strips = get_report("strips.json", True, get_strip_memory(256, 7, 1))
+
+        self.assertEqual(cold, warm)
+        self.assertAlmostEqual(cold["mean"], strips["mean"], places=4)
+        self.assertEqual(cold["count"], calculated["count"])
+        self.assertAlmostEqual(cold["mean"], calculated["mean"], delta=0.1)
+        self.assertAlmostEqual(cold["max"], calculated["max"], delta=2)
+
+        # the alarm color of gamut check is not interpolated
+        opts.gamut_check = True
+        with mock.patch("benekli.lut.LUTCache") as lut_cache:
+            get_report("gamut_check.json", True)
+            lut_cache.assert_not_called()
+
+    def test_scalar_lut_grid_nodes_are_exact(self):
+        """Test that the scalar LUT gives its values at the grid nodes."""
+        values = np.random.default_rng(9).random((18, 18, 18, 1), dtype=np.float32)
+        nodes = self.pixels // 15
+        self.assertTrue(
+            np.allclose(
+                lut.apply_scalar_lut(values, (nodes * 15).astype(np.uint8)),
+                values[nodes[..., 0], nodes[..., 1], nodes[..., 2], 0],
+            )
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
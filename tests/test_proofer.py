@@ -0,0 +1,130 @@
+import concurrent.futures
+import json
+import os
+import tempfile
+import unittest
+import numpy as np
+from PIL import Image, ImageCms
+from benekli.benekli import CommandOptions, run_with_opts
+from benekli.proofer import ProofError, SoftProofer
+from tests.profiles import create_matrix_profile, create_test_profiles
+from tests.test_lut import NARROW_COLORANTS
+
+
+class TestSoftProofer(unittest.TestCase):
+    """Test the library API."""
+
+    def setUp(self):
+        """Set up test environment."""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        _, self.display_profile = create_test_profiles(self.temp_dir.name)
+        self.printer_profile = create_matrix_profile(
+            os.path.join(self.temp_dir.name, "narrow.icc"), NARROW_COLORANTS, 1.8
+        )
+        self.pixels = np.random.default_rng(19).integers(
+            0, 256, (90, 110, 3), dtype=np.uint8
+        )
+        self.image = Image.fromarray(self.pixels)
+        self.proofer = SoftProofer(
+            self.printer_profile, self.display_profile, de_formula="ciede2000"
+        )
+
+    def tearDown(self):
+        """Clean up test environment."""
+        self.temp_dir.cleanup()
+
+    def output(self, filename):
+        return os.path.join(self.temp_dir.name, filename)
+
+    def test_same_as_command(self):
+        """Test that the proof and delta E are the same as of run_with_opts."""
+        input_filename = self.output("input.tif")
+        srgb = ImageCms.ImageCmsProfile(ImageCms.createProfile("sRGB"))
+        self.image.save(input_filename, icc_profile=srgb.tobytes())
+        opts = CommandOptions()
+        opts.input_filename = input_filename
+        opts.simulated_profile_filename = self.printer_profile
+        opts.display_profile_filename = self.display_profile
+        opts.de_formula = "ciede2000"
+        opts.de_float = True
+        opts.output_filename = self.output("proof.tif")
+        opts.de_stats_filename = self.output("de.json")
+        run_with_opts(opts)
+
+        # the same profile bytes as embedded in the input image
+        proofer = SoftProofer(
+            self.printer_profile,
+            self.display_profile,
+            input_profile=srgb.tobytes(),
+            de_formula="ciede2000",
+        )
+        proof = proofer.proof(self.image)
+        self.assertEqual(proof.mode, "RGB")
+        with Image.open(opts.output_filename) as expected:
+            self.assertEqual(np.asarray(proof).tolist(), np.asarray(expected).tolist())
+
+        de = proofer.delta_e(self.image, proofer.proof_lab(self.image))
+        self.assertEqual(de.shape, (90, 110))
+        self.assertEqual(de.dtype, np.float32)
+        with open(opts.de_stats_filename, "r", encoding="utf-8") as f:
+            report = json.load(f)
+
+        self.assertGreater(report["mean"], 0)
+        self.assertAlmostEqual(report["mean"], de.mean(), places=4)
+        self.assertAlmostEqual(report["max"], de.max(), places=4)
+
+    def test_arrays(self):
+        """Test that the arrays are converted like the images."""
+        proof = self.proofer.proof(self.pixels)
+        self.assertIsInstance(proof, np.ndarray)
+        self.assertEqual(
+            proof.tolist(), np.asarray(self.proofer.proof(self.image)).tolist()
+        )
+        Lab = self.proofer.lab(self.pixels)
+        self.assertEqual(Lab.shape, (90, 110, 3))
+        self.assertEqual(Lab.dtype, np.float32)
+        np.testing.assert_array_equal(Lab, self.proofer.lab(self.image))
+        # float arrays are Lab
+        np.testing.assert_array_equal(self.proofer.lab(Lab), Lab)
+        self.assertEqual(self.proofer.delta_e(Lab, self.image).max(), 0)
+        # a Lab image is proofed with the Lab input profile, its colors are
+        # rounded to 8-bit Lab
+        Lab_proof = self.proofer.proof(Lab)
+        self.assertEqual(Lab_proof.shape, (90, 110, 3))
+        self.assertLess(np.abs(Lab_proof.astype(int) - proof).mean(), 1)
+
+    def test_threads(self):
+        """Test that a proofer can be used by many threads."""
+        expected = self.proofer.proof(self.pixels)
+        with concurrent.futures.ThreadPoolExecutor(4) as executor:
+            proofs = list(executor.map(self.proofer.proof, [self.pixels] * 8))
+
+        for proof in proofs:
+            np.testing.assert_array_equal(proof, expected)
+
+    def test_errors(self):
+        """Test that the errors raise ProofError instead of exiting."""
+        with self.assertRaises(ProofError):
+            SoftProofer(self.output("missing.icc"), self.display_profile)
+
+        with self.assertRaises(ProofError):
+            # not a printer profile
+            SoftProofer(self.display_profile, self.display_profile)
+
+        with self.assertRaises(ProofError):
+            SoftProofer(
+                self.printer_profile, self.display_profile, rendering_intent="x"
+            )
+
+        with self.assertRaises(ProofError):
+            self.proofer.proof(self.image.convert("L"))
+
+        with self.assertRaises(ProofError):
+            self.proofer.proof(self.pixels[..., :2])
+
+        with self.assertRaises(ProofError):
+            self.proofer.delta_e(self.pixels, self.pixels[1:])
+
+
+if __name__ == "__main__":
+    unittest.main()
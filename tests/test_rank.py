@@ -0,0 +1,112 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+import numpy as np
+from PIL import Image, ImageCms
+from benekli import cache
+from benekli.benekli import CommandOptions
+from benekli.rank import Candidate, create_candidates, rank
+from tests.profiles import create_matrix_profile, create_test_profiles
+from tests.test_lut import NARROW_COLORANTS
+
+
+class TestRank(unittest.TestCase):
+    """Test ranking the simulated profiles, intents and bpc."""
+
+    def setUp(self):
+        """Set up test environment."""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.printer_profile, self.display_profile = create_test_profiles(
+            self.temp_dir.name
+        )
+        self.narrow_profile = create_matrix_profile(
+            os.path.join(self.temp_dir.name, "narrow.icc"), NARROW_COLORANTS, 1.8
+        )
+        # saturated gradients, so the preview is not averaged to gray
+        x, y = np.meshgrid(np.linspace(0, 255, 160), np.linspace(0, 255, 120))
+        self.image = Image.fromarray(
+            np.stack([x, y, 255 - x], axis=-1).round().astype(np.uint8)
+        )
+        self.image.info["icc_profile"] = ImageCms.ImageCmsProfile(
+            ImageCms.createProfile("sRGB")
+        ).tobytes()
+        self.opts = CommandOptions()
+        self.opts.input_filename = "image.tif"
+        self.opts.display_profile_filename = self.display_profile
+
+    def tearDown(self):
+        """Clean up test environment."""
+        self.temp_dir.cleanup()
+        cache.cache_clear()
+
+    def create_candidates(self):
+        return create_candidates(
+            self.opts, self.image, [self.narrow_profile, self.printer_profile]
+        )
+
+    def test_rank(self):
+        """Test that the printer with the gamut of the image is the best."""
+        candidates = self.create_candidates()
+        # p, r and s with and without bpc, and a, for both profiles
+        self.assertEqual(len(candidates), 14)
+        with mock.patch.object(
+            Candidate, "evaluate", autospec=True, side_effect=Candidate.evaluate
+        ) as evaluate:
+            ranking = rank(candidates, self.image, "mean", top=2, preview_size=40)
+            # 14 previews and 2 full resolution
+            self.assertEqual(evaluate.call_count, 16)
+
+        self.assertEqual(
+            [c.resolution for c in ranking], ["full"] * 2 + ["preview"] * 12
+        )
+        for candidate in ranking[:7]:
+            self.assertEqual(
+                candidate.opts.simulated_profile_filename, self.printer_profile
+            )
+            self.assertLess(candidate.result["mean"], 1.0)
+            self.assertIsNone(candidate.result["out_of_gamut"])
+
+        for candidate in ranking[7:]:
+            self.assertEqual(
+                candidate.opts.simulated_profile_filename, self.narrow_profile
+            )
+            self.assertGreater(candidate.result["mean"], 10.0)
+
+    def test_rank_without_preview(self):
+        """Test that all candidates are evaluated with full resolution."""
+        ranking = rank(
+            self.create_candidates(), self.image, "out_of_gamut", preview_size=None
+        )
+        self.assertEqual([c.resolution for c in ranking], ["full"] * 14)
+        objectives = [c.get_objective("out_of_gamut") for c in ranking]
+        self.assertEqual(objectives, sorted(objectives))
+        # sRGB image with the sRGB printer and with the narrow printer
+        self.assertEqual(objectives[0], 0.0)
+        self.assertGreater(objectives[-1], 0.5)
+
+    def test_rank_timings(self):
+        """Test that a timings record is written per evaluation."""
+        self.opts.timings_filename = os.path.join(self.temp_dir.name, "t.jsonl")
+        rank(
+            self.create_candidates(), self.image, "out_of_gamut", top=2, preview_size=40
+        )
+        with open(self.opts.timings_filename, "r", encoding="utf-8") as f:
+            records = [json.loads(line) for line in f]
+
+        self.assertEqual(len(records), 16)
+        self.assertEqual(
+            [record["resolution"] for record in records],
+            ["preview"] * 14 + ["full"] * 2,
+        )
+        for record in records:
+            self.assertEqual(record["status"], "done")
+            self.assertEqual(
+                [stage["stage"] for stage in record["stages"]],
+                ["input_Lab", "proof", "proof_Lab", "de_statistics", "out_of_gamut"],
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,146 @@
+import json
+import logging
+import os
+import socket
+import tempfile
+import threading
+import unittest
+import urllib.error
+import urllib.request
+from unittest import mock
+from PIL import Image
+from benekli import serve
+from benekli.benekli import CommandOptions
+from tests.profiles import FOURTEEN_BALLS, create_test_profiles
+
+
+class TestServe(unittest.TestCase):
+    """Test the proofing daemon."""
+
+    def setUp(self):
+        """Set up test environment."""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.printer_profile, self.display_profile = create_test_profiles(
+            self.temp_dir.name
+        )
+        opts = CommandOptions()
+        opts.display_profile_filename = self.display_profile
+        opts.threads = 1
+        self.proof_server = serve.ProofServer(opts, workers=1, queue_size=0)
+
+    def tearDown(self):
+        """Clean up test environment."""
+        self.proof_server.close()
+        self.temp_dir.cleanup()
+
+    def get_request(self, name):
+        return {
+            "image": FOURTEEN_BALLS,
+            "simulated_profile": self.printer_profile,
+            "output": os.path.join(self.temp_dir.name, "%s.tif" % name),
+        }
+
+    def start(self, server):
+        thread = threading.Thread(target=server.serve_forever)
+        thread.start()
+        self.addCleanup(thread.join)
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+
+    def test_job_errors(self):
+        """Test that only the errors of the job threads are kept."""
+        errors = []
+
+        def log_error():
+            logging.getLogger("benekli.serve").error("error of a thread")
+            errors.append(self.proof_server.error_handler.pop())
+
+        thread = threading.Thread(target=log_error)
+        thread.start()
+        thread.join()
+        self.proof_server.executor.submit(log_error).result()
+        self.assertEqual(errors, [None, "error of a thread"])
+
+    def test_invalid_jobs(self):
+        """Test that the invalid jobs are not run."""
+        request = self.get_request("invalid")
+        for invalid in (
+            [request],
+            dict(request, color="red"),
+            dict(request, bpc="yes"),
+            dict(request, output=None),
+            {"image": FOURTEEN_BALLS, "output": request["output"]},
+        ):
+            response = self.proof_server.submit(invalid)
+            self.assertEqual(response["status"], "invalid")
+
+        self.assertFalse(os.path.exists(request["output"]))
+
+    def test_unix_socket(self):
+        """Test the jobs and the status over a Unix socket."""
+        socket_filename = os.path.join(self.temp_dir.name, "benekli.sock")
+        self.start(serve.create_server(self.proof_server, socket_filename))
+        missing = dict(self.get_request("missing"), image="missing.tif")
+        with socket.socket(socket.AF_UNIX) as client:
+            client.connect(socket_filename)
+            lines = client.makefile("rwb")
+            for request in (self.get_request("proof"), missing, {"command": "status"}):
+                lines.write(json.dumps(request).encode("utf-8") + b"\n")
+                lines.flush()
+
+            responses = [json.loads(lines.readline()) for _ in range(3)]
+
+        self.assertEqual(responses[0]["status"], "done")
+        self.assertIsNone(responses[0]["error"])
+        with Image.open(responses[0]["output"]) as im:
+            self.assertEqual(im.mode, "RGB")
+
+        self.assertEqual(responses[1]["status"], "failed")
+        self.assertIn("missing.tif", responses[1]["error"])
+        self.assertEqual(responses[2]["done"], 1)
+        self.assertEqual(responses[2]["failed"], 1)
+        self.assertEqual(responses[2]["pending"], 0)
+
+    def test_http_rejects_when_busy(self):
+        """Test that a job is rejected when the worker is busy."""
+        server = serve.create_server(self.proof_server, port=0)
+        self.start(server)
+        url = "http://127.0.0.1:%d" % server.server_address[1]
+        started = threading.Event()
+        release = threading.Event()
+
+        def run_with_opts(job):
+            started.set()
+            release.wait()
+
+        def post(request):
+            try:
+                with urllib.request.urlopen(
+                    url + "/jobs", json.dumps(request).encode("utf-8")
+                ) as response:
+                    return response.status, json.load(response)
+
+            except urllib.error.HTTPError as e:
+                return e.code, json.load(e)
+
+        with mock.patch.object(serve, "run_with_opts", run_with_opts):
+            responses = []
+            first = threading.Thread(
+                target=lambda: responses.append(post(self.get_request("first")))
+            )
+            first.start()
+            self.assertTrue(started.wait(10))
+            code, response = post(self.get_request("second"))
+            release.set()
+            first.join()
+
+        self.assertEqual(code, 503)
+        self.assertEqual(response["status"], "rejected")
+        self.assertEqual(responses, [(200, responses[0][1])])
+        self.assertEqual(responses[0][1]["status"], "done")
+        with urllib.request.urlopen(url + "/status") as status:
+            self.assertEqual(json.load(status)["rejected"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,153 @@
+import json
+import os
+import struct
+import tempfile
+import unittest
+import numpy as np
+from PIL import Image, ImageCms
+from benekli import cache, shaper
+from benekli.benekli import CommandOptions, get_strip_memory, run_with_opts
+from benekli.formulas import de2000_array
+from benekli.lab8 import decode_Lab8, encode_Lab8
+from tests.profiles import create_matrix_profile, create_test_profiles
+from tests.test_lut import NARROW_COLORANTS
+
+
+class TestMatrixShaper(unittest.TestCase):
+    """Test the float Lab of the matrix/TRC profiles."""
+
+    def setUp(self):
+        """Set up test environment."""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.pixels = np.random.default_rng(11).integers(
+            0, 256, (256, 256, 3), dtype=np.uint8
+        )
+        self.lab = ImageCms.ImageCmsProfile(ImageCms.createProfile("LAB"))
+
+    def tearDown(self):
+        """Clean up test environment."""
+        self.temp_dir.cleanup()
+
+    def assert_Lab_accuracy(self, cms_profile):
+        matrix_shaper = shaper.MatrixShaper.from_bytes(cms_profile.tobytes())
+        self.assertIsNotNone(matrix_shaper)
+        # the optimized 8-bit transforms are interpolated in a grid
+        cms_transform = ImageCms.buildTransform(
+            cms_profile, self.lab, "RGB", "LAB", flags=ImageCms.Flags.NOOPTIMIZE
+        )
+        expected = decode_Lab8(
+            np.asarray(cms_transform.apply(Image.fromarray(self.pixels)))
+        )
+        actual = matrix_shaper.to_Lab(self.pixels)
+        self.assertEqual(actual.dtype, np.float32)
+        # half of the 8-bit Lab steps
+        error = np.abs(actual - expected).reshape(-1, 3).max(axis=0)
+        self.assertLess(error[0], 0.2)
+        self.assertLess(error[1], 0.51)
+        self.assertLess(error[2], 0.51)
+
+    def test_parametric_curves(self):
+        """Test the sRGB profile of LittleCMS, its curves are para tags."""
+        self.assert_Lab_accuracy(
+            ImageCms.ImageCmsProfile(ImageCms.createProfile("sRGB"))
+        )
+
+    def test_gamma_curves(self):
+        """Test a profile with gamma curv tags."""
+        filename = create_matrix_profile(
+            os.path.join(self.temp_dir.name, "matrix.icc"), device_class="mntr"
+        )
+        self.assert_Lab_accuracy(ImageCms.ImageCmsProfile(filename))
+
+    def test_table_curve(self):
+        """Test that a curv table is interpolated."""
+        table = np.round((np.arange(1024) / 1023) ** (563 / 256) * 65535)
+        tag = b"curv" + bytes(4) + struct.pack(">I1024H", 1024, *table.astype(int))
+        gamma = b"curv" + bytes(4) + struct.pack(">IH", 1, 563)
+        self.assertTrue(
+            np.allclose(shaper.read_curve(tag), shaper.read_curve(gamma), atol=1e-4)
+        )
+
+    def test_Lab8(self):
+        """Test the LAB images of MatrixShaperTransform."""
+        cms_profile = ImageCms.ImageCmsProfile(ImageCms.createProfile("sRGB"))
+        matrix_shaper = shaper.MatrixShaper.from_bytes(cms_profile.tobytes())
+        cms_transform = ImageCms.buildTransform(
+            cms_profile, self.lab, "RGB", "LAB", flags=ImageCms.Flags.NOOPTIMIZE
+        )
+        image = Image.fromarray(self.pixels)
+        expected = np.asarray(cms_transform.apply(image))
+        actual = shaper.MatrixShaperTransform(matrix_shaper).apply(image)
+        self.assertEqual(actual.mode, "LAB")
+        # both are rounded from almost the same Lab
+        difference = np.abs(decode_Lab8(np.asarray(actual)) - decode_Lab8(expected))
+        self.assertLessEqual(difference.max(), 1)
+        # 8-bit Lab is encoded as decoded
+        self.assertTrue(np.array_equal(encode_Lab8(decode_Lab8(expected)), expected))
+
+    def test_not_matrix_shaper(self):
+        """Test that the other profiles are not converted."""
+        self.assertIsNone(shaper.MatrixShaper.from_bytes(self.lab.tobytes()))
+        self.assertIsNone(shaper.MatrixShaper.from_bytes(b"not a profile"))
+        self.assertIsNone(shaper.MatrixShaper.from_bytes(None))
+
+
+class TestDeFloat(unittest.TestCase):
+    """Test delta E of float Lab."""
+
+    def setUp(self):
+        """Set up test environment."""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        _, self.display_profile = create_test_profiles(self.temp_dir.name)
+        self.printer_profile = create_matrix_profile(
+            os.path.join(self.temp_dir.name, "narrow.icc"), NARROW_COLORANTS, 1.8
+        )
+        self.pixels = np.random.default_rng(13).integers(
+            0, 256, (120, 100, 3), dtype=np.uint8
+        )
+        self.srgb = ImageCms.ImageCmsProfile(ImageCms.createProfile("sRGB"))
+        self.input_filename = os.path.join(self.temp_dir.name, "input.tif")
+        Image.fromarray(self.pixels).save(
+            self.input_filename, icc_profile=self.srgb.tobytes()
+        )
+
+    def tearDown(self):
+        """Clean up test environment."""
+        self.temp_dir.cleanup()
+        cache.cache_clear()
+
+    def proof(self, name, memory_budget=None):
+        opts = CommandOptions()
+        opts.input_filename = self.input_filename
+        opts.simulated_profile_filename = self.printer_profile
+        opts.display_profile_filename = self.display_profile
+        opts.de_formula = "ciede2000"
+        opts.de_float = True
+        opts.memory_budget = memory_budget
+        opts.output_filename = os.path.join(self.temp_dir.name, "%s.tif" % name)
+        opts.de_filename = os.path.join(self.temp_dir.name, "%s.de.tif" % name)
+        opts.de_stats_filename = os.path.join(self.temp_dir.name, "%s.json" % name)
+        run_with_opts(opts)
+        with open(opts.de_stats_filename, "r", encoding="utf-8") as f:
+            return opts, json.load(f)
+
+    def test_de_float(self):
+        """Test that delta E is of the float Lab of the input and the proof."""
+        opts, report = self.proof("whole")
+        matrix_shaper = shaper.MatrixShaper.from_bytes(self.srgb.tobytes())
+        with Image.open(opts.output_filename) as proof:
+            expected = de2000_array(
+                matrix_shaper.to_Lab(self.pixels),
+                matrix_shaper.to_Lab(np.asarray(proof)),
+            )
+
+        self.assertEqual(report["count"], expected.size)
+        self.assertAlmostEqual(report["mean"], expected.mean(), places=4)
+        self.assertAlmostEqual(report["max"], expected.max(), places=4)
+
+        _, strips_report = self.proof("strips", get_strip_memory(100, 7, 1))
+        self.assertEqual(report, strips_report)
+
+
+if __name__ == "__main__":
+    unittest.main()
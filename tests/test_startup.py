@@ -0,0 +1,71 @@
+import json
+import subprocess
+import sys
+import unittest
+
+# microseconds, the cumulative import time of benekli.cli reported by
+# python -X importtime, it is about 25 ms, importing Pillow and NumPy takes
+# more than 200 ms
+IMPORT_TIME_BUDGET = 75000
+
+IMAGING_MODULES = ("numpy", "PIL", "benekli.benekli")
+
+
+def run_python(code, *options):
+    return subprocess.run(
+        [sys.executable, *options, "-c", code],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+
+class TestStartup(unittest.TestCase):
+    """Test that the command line starts without the imaging stack."""
+
+    def get_imported_modules(self, argv):
+        """Return the imaging modules imported by benekli argv, and its exit code."""
+        code = (
+            "import json, sys\n"
+            "from benekli import cli\n"
+            "sys.argv = %r\n"
+            "try:\n"
+            "    cli.run()\n"
+            "except SystemExit as e:\n"
+            "    code = e.code\n"
+            "modules = [m for m in %r if m in sys.modules]\n"
+            "sys.stderr.write(json.dumps([modules, code]))\n"
+        ) % (["benekli"] + argv, IMAGING_MODULES)
+        result = run_python(code)
+        return json.loads(result.stderr.splitlines()[-1])
+
+    def test_parse_only(self):
+        """Test --version, --help and invalid arguments."""
+        for argv in (["--version"], ["--help"], ["-i", "input.tif"], ["-x"]):
+            with self.subTest(argv=argv):
+                modules, code = self.get_imported_modules(argv)
+                self.assertEqual(modules, [])
+                self.assertEqual(code, 0 if argv[0] in ("--version", "--help") else 2)
+
+        # -r is checked before the imaging stack is imported
+        modules, code = self.get_imported_modules(["-i", "in.tif", "-s", "p.icc"])
+        self.assertEqual(modules, [])
+        self.assertEqual(code, 1)
+
+    def test_import_time_budget(self):
+        """Test the import time of the command line."""
+        result = run_python("import benekli.cli", "-X", "importtime")
+        times = {}
+        for line in result.stderr.splitlines():
+            # import time: self [us] | cumulative | imported package
+            _, cumulative, name = line.split("|")
+            times[name.strip()] = cumulative.strip()
+
+        for module in IMAGING_MODULES:
+            self.assertNotIn(module, times)
+
+        self.assertLess(int(times["benekli.cli"]), IMPORT_TIME_BUDGET)
+
+
+if __name__ == "__main__":
+    unittest.main()
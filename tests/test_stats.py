@@ -0,0 +1,75 @@
+import json
+import os
+import tempfile
+import unittest
+import numpy as np
+from benekli.benekli import CommandOptions, run_with_opts
+from benekli.stats import DeStatistics
+from tests.profiles import FOURTEEN_BALLS, create_test_profiles
+
+
+class TestDeStatistics(unittest.TestCase):
+    """Test the delta E statistics."""
+
+    def test_statistics(self):
+        """Test the statistics against NumPy with the whole array."""
+        de = np.random.default_rng(11).gamma(2.0, 1.0, 100000)
+        statistics = DeStatistics()
+        # in chunks of different sizes
+        for chunk in np.array_split(de, [5, 1000, 50000]):
+            statistics.update(chunk)
+
+        d = statistics.to_dict()
+        self.assertEqual(d["count"], len(de))
+        self.assertAlmostEqual(d["mean"], np.mean(de), places=10)
+        self.assertEqual(d["max"], np.max(de))
+        for key, q in (("median", 50), ("p95", 95), ("p99", 99)):
+            expected = np.percentile(de, q, method="inverted_cdf")
+            self.assertGreaterEqual(d[key], expected)
+            self.assertLess(d[key] - expected, 0.01)
+
+        for threshold in (1, 2, 3):
+            self.assertEqual(
+                d["percent_above"][str(threshold)],
+                100 * np.count_nonzero(de > threshold) / len(de),
+            )
+
+    def test_edge_cases(self):
+        """Test no values, a single value and values above the histogram."""
+        self.assertIsNone(DeStatistics().to_dict()["median"])
+        statistics = DeStatistics()
+        statistics.update(np.array([0.0]))
+        self.assertEqual(statistics.to_dict()["p99"], 0.0)
+        statistics = DeStatistics()
+        statistics.update(np.array([1000.0, 1001.0]))
+        self.assertEqual(statistics.to_dict()["median"], 1001.0)
+        self.assertEqual(statistics.to_dict()["percent_above"]["3"], 100.0)
+
+
+class TestDeStatisticsOutput(unittest.TestCase):
+    """Test the delta E statistics report."""
+
+    def test_de_stats_file(self):
+        """Test that the report matches the delta E image."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            printer_profile, display_profile = create_test_profiles(temp_dir)
+            opts = CommandOptions()
+            opts.input_filename = FOURTEEN_BALLS
+            opts.simulated_profile_filename = printer_profile
+            opts.display_profile_filename = display_profile
+            opts.de_stats_filename = os.path.join(temp_dir, "de.json")
+            run_with_opts(opts)
+            with open(opts.de_stats_filename, "r", encoding="utf-8") as f:
+                report = json.load(f)
+
+        self.assertEqual(report["input_image"], FOURTEEN_BALLS)
+        self.assertEqual(report["rendering_intent"], "p")
+        self.assertGreater(report["count"], 0)
+        self.assertLessEqual(report["median"], report["p95"])
+        self.assertLessEqual(report["p95"], report["p99"])
+        self.assertLessEqual(report["p99"], report["max"])
+        self.assertEqual(sorted(report["percent_above"]), ["1", "2", "3"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,197 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+import numpy as np
+from PIL import Image, ImageCms
+from benekli import cache, stream
+from benekli.benekli import CommandOptions, get_strip_memory, get_strip_rows
+from benekli.benekli import run_with_opts
+from tests.profiles import create_test_profiles
+
+
+class TestStripWriter(unittest.TestCase):
+    """Test writing TIFF strip by strip."""
+
+    def setUp(self):
+        """Set up test environment."""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.temp_dir.name, "strips.tif")
+        self.pixels = np.random.default_rng(3).integers(
+            0, 256, (301, 257, 3), dtype=np.uint8
+        )
+
+    def tearDown(self):
+        """Clean up test environment."""
+        self.temp_dir.cleanup()
+
+    def write(self):
+        writer = stream.TiffStripWriter(self.filename, 257, 301, "strips")
+        # strips of a different size than the TIFF strips
+        for y in range(0, 301, 37):
+            writer.write(self.pixels[y : y + 37])
+
+        writer.close(b"profile")
+        with Image.open(self.filename) as image:
+            self.assertEqual(image.info["icc_profile"], b"profile")
+            self.assertEqual(image.tag_v2[270], "strips")
+            self.assertTrue(np.array_equal(np.asarray(image), self.pixels))
+
+    def test_tiff(self):
+        """Test that Pillow reads the TIFF."""
+        self.write()
+
+    def test_bigtiff(self):
+        """Test that Pillow reads the BigTIFF."""
+        with mock.patch("benekli.stream.TIFF_BIGTIFF_SIZE", 1):
+            self.write()
+
+    def test_missing_rows(self):
+        """Test that an incomplete image is an error."""
+        writer = stream.TiffStripWriter(self.filename, 257, 301)
+        writer.write(self.pixels[:300])
+        with self.assertRaises(ValueError):
+            writer.close()
+
+
+class TestStripReader(unittest.TestCase):
+    """Test reading an image strip by strip."""
+
+    def setUp(self):
+        """Set up test environment."""
+        self.temp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        """Clean up test environment."""
+        self.temp_dir.cleanup()
+
+    def test_read(self):
+        """Test that the strips of uncompressed images are read from the file."""
+        rng = np.random.default_rng(5)
+        for mode, bands in (("RGB", 3), ("L", 1)):
+            with self.subTest(mode=mode):
+                pixels = rng.integers(0, 256, (101, 53, bands), dtype=np.uint8)
+                filename = os.path.join(self.temp_dir.name, "input.tif")
+                Image.fromarray(pixels.squeeze(), mode).save(filename)
+                with Image.open(filename) as image:
+                    reader = stream.StripReader(filename, image)
+
+                self.assertIsNotNone(reader.tiles)
+                for y0, y1 in ((0, 13), (13, 100), (100, 101)):
+                    strip = reader.read(y0, y1)
+                    self.assertEqual(strip.mode, mode)
+                    self.assertEqual(strip.size, (53, y1 - y0))
+                    self.assertTrue(
+                        np.array_equal(
+                            np.asarray(strip).reshape(y1 - y0, 53, bands),
+                            pixels[y0:y1],
+                        )
+                    )
+
+
+class TestStripProof(unittest.TestCase):
+    """Test proofing an image strip by strip."""
+
+    def setUp(self):
+        """Set up test environment."""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.printer_profile, self.display_profile = create_test_profiles(
+            self.temp_dir.name
+        )
+        self.pixels = np.random.default_rng(5).integers(
+            0, 256, (200, 150, 3), dtype=np.uint8
+        )
+        self.icc_profile = ImageCms.ImageCmsProfile(
+            ImageCms.createProfile("sRGB")
+        ).tobytes()
+
+    def tearDown(self):
+        """Clean up test environment."""
+        self.temp_dir.cleanup()
+        cache.cache_clear()
+
+    def proof(self, input_filename, name, memory_budget=None):
+        opts = CommandOptions()
+        opts.input_filename = input_filename
+        opts.simulated_profile_filename = self.printer_profile
+        opts.display_profile_filename = self.display_profile
+        opts.output_filename = os.path.join(self.temp_dir.name, "%s.tif" % name)
+        opts.de_filename = os.path.join(self.temp_dir.name, "%s.de.tif" % name)
+        opts.de_stats_filename = os.path.join(self.temp_dir.name, "%s.json" % name)
+        opts.memory_budget = memory_budget
+        # the strips are sized for one thread
+        opts.threads = 1
+        run_with_opts(opts)
+        return opts
+
+    def assert_same_output(self, opts1, opts2):
+        for filename1, filename2 in (
+            (opts1.output_filename, opts2.output_filename),
+            (opts1.de_filename, opts2.de_filename),
+        ):
+            with Image.open(filename1) as image1, Image.open(filename2) as image2:
+                self.assertTrue(np.array_equal(np.asarray(image1), np.asarray(image2)))
+                self.assertEqual(image1.info["icc_profile"], image2.info["icc_profile"])
+
+        with (
+            open(opts1.de_stats_filename, "r", encoding="utf-8") as f1,
+            open(opts2.de_stats_filename, "r", encoding="utf-8") as f2,
+        ):
+            report1 = json.load(f1)
+            report2 = json.load(f2)
+
+        self.assertEqual(report1["count"], report2["count"])
+        self.assertAlmostEqual(report1["mean"], report2["mean"], places=10)
+        self.assertEqual(report1["p99"], report2["p99"])
+
+    def test_strips(self):
+        """Test that the strips give the same output as the whole image."""
+        input_filename = os.path.join(self.temp_dir.name, "input.tif")
+        Image.fromarray(self.pixels).save(input_filename, icc_profile=self.icc_profile)
+        # strips of 7 rows
+        memory_budget = get_strip_memory(150, 7, 1)
+        with mock.patch.object(
+            stream.StripReader,
+            "read",
+            autospec=True,
+            side_effect=stream.StripReader.read,
+        ) as read:
+            strips = self.proof(input_filename, "strips", memory_budget)
+            self.assertEqual(read.call_count, 29)
+
+        self.assert_same_output(self.proof(input_filename, "whole"), strips)
+
+    def test_strip_rows_threads(self):
+        """Test that the strips are smaller with the bands of the threads."""
+        opts = CommandOptions()
+        opts.memory_budget = get_strip_memory(150, 7, 1, threads=2)
+        opts.threads = 2
+        self.assertEqual(get_strip_rows(opts, 150, 1), 7)
+        opts.threads = 1
+        self.assertGreater(get_strip_rows(opts, 150, 1), 7)
+
+    def test_compressed_input(self):
+        """Test that a compressed image is decoded as a whole."""
+        input_filename = os.path.join(self.temp_dir.name, "input.tif")
+        Image.fromarray(self.pixels).save(
+            input_filename, icc_profile=self.icc_profile, compression="tiff_lzw"
+        )
+        # the decoded image and strips of 7 rows
+        memory_budget = self.pixels.nbytes + get_strip_memory(150, 7, 1)
+        strips = self.proof(input_filename, "strips", memory_budget)
+        self.assert_same_output(self.proof(input_filename, "whole"), strips)
+        # the decoded image does not fit
+        with self.assertRaises(SystemExit):
+            self.proof(input_filename, "small", get_strip_memory(150, 7, 1))
+
+    def test_memory_budget_too_small(self):
+        """Test that a budget without room for a row is an error."""
+        input_filename = os.path.join(self.temp_dir.name, "input.tif")
+        Image.fromarray(self.pixels).save(input_filename, icc_profile=self.icc_profile)
+        with self.assertRaises(SystemExit):
+            self.proof(input_filename, "strips", get_strip_memory(150, 1, 1) - 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
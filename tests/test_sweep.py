@@ -0,0 +1,116 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+import numpy as np
+from PIL import Image, ImageCms
+from benekli.benekli import CommandOptions, get_strip_memory, get_sweep_filename
+from benekli.benekli import run_with_opts
+from tests.profiles import create_test_profiles
+
+
+class TestSweep(unittest.TestCase):
+    """Test proofing with all rendering intents and bpc options at once."""
+
+    def setUp(self):
+        """Set up test environment."""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.printer_profile, self.display_profile = create_test_profiles(
+            self.temp_dir.name
+        )
+        self.input_image = os.path.join(self.temp_dir.name, "input.tif")
+        rng = np.random.default_rng(5)
+        Image.fromarray(rng.integers(0, 256, (16, 24, 3), dtype=np.uint8)).save(
+            self.input_image,
+            icc_profile=ImageCms.ImageCmsProfile(
+                ImageCms.createProfile("sRGB")
+            ).tobytes(),
+        )
+        self.opts = CommandOptions()
+        self.opts.input_filename = self.input_image
+        self.opts.simulated_profile_filename = self.printer_profile
+        self.opts.display_profile_filename = self.display_profile
+
+    def tearDown(self):
+        """Clean up test environment."""
+        self.temp_dir.cleanup()
+
+    def output(self, name):
+        return os.path.join(self.temp_dir.name, name)
+
+    def test_get_sweep_filename(self):
+        """Test that the intent and bpc are added before the extension."""
+        self.assertEqual(get_sweep_filename("a/b.tif", "p", True), "a/b.p.bpc.tif")
+        self.assertEqual(get_sweep_filename("b.jpg", "r", False), "b.r.nobpc.jpg")
+        self.assertEqual(get_sweep_filename("b.tif", "a", False), "b.a.tif")
+        self.assertIsNone(get_sweep_filename(None, "p", True))
+
+    def test_sweep(self):
+        """Test that a sweep decodes once and matches the single runs."""
+        self.opts.sweep = True
+        self.opts.sweep_threads = 2
+        self.opts.output_filename = self.output("sweep.tif")
+        self.opts.de_filename = self.output("sweep.de.tif")
+        with mock.patch("benekli.benekli.Image.open", wraps=Image.open) as image_open:
+            run_with_opts(self.opts)
+            self.assertEqual(image_open.call_count, 1)
+
+        variants = [
+            ("p", True, "p.bpc"),
+            ("p", False, "p.nobpc"),
+            ("r", True, "r.bpc"),
+            ("r", False, "r.nobpc"),
+            ("s", True, "s.bpc"),
+            ("s", False, "s.nobpc"),
+            ("a", False, "a"),
+        ]
+        for rendering_intent, bpc, suffix in variants:
+            self.opts.sweep = False
+            self.opts.rendering_intent = rendering_intent
+            self.opts.bpc = bpc
+            self.opts.output_filename = self.output("single.tif")
+            self.opts.de_filename = self.output("single.de.tif")
+            run_with_opts(self.opts)
+            for sweep, single in (
+                ("sweep.%s.tif" % suffix, "single.tif"),
+                ("sweep.de.%s.tif" % suffix, "single.de.tif"),
+            ):
+                with (
+                    Image.open(self.output(sweep)) as im1,
+                    Image.open(self.output(single)) as im2,
+                ):
+                    self.assertTrue(np.array_equal(np.asarray(im1), np.asarray(im2)))
+
+        self.assertEqual(
+            len([f for f in os.listdir(self.temp_dir.name) if f.startswith("sweep")]),
+            14,
+        )
+
+    def test_sweep_strips(self):
+        """Test that a sweep in strips in threads matches the whole image."""
+        self.opts.sweep = True
+        self.opts.sweep_threads = 2
+        self.opts.threads = 2
+        for name, memory_budget in (
+            ("whole", None),
+            ("strips", get_strip_memory(24, 5, 2, threads=2)),
+        ):
+            self.opts.memory_budget = memory_budget
+            self.opts.output_filename = self.output("%s.tif" % name)
+            self.opts.de_filename = self.output("%s.de.tif" % name)
+            run_with_opts(self.opts)
+
+        for suffix in ("p.bpc", "s.nobpc", "a"):
+            for whole, strips in (
+                ("whole.%s.tif" % suffix, "strips.%s.tif" % suffix),
+                ("whole.de.%s.tif" % suffix, "strips.de.%s.tif" % suffix),
+            ):
+                with (
+                    Image.open(self.output(whole)) as im1,
+                    Image.open(self.output(strips)) as im2,
+                ):
+                    self.assertTrue(np.array_equal(np.asarray(im1), np.asarray(im2)))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,121 @@
+import json
+import os
+import pstats
+import tempfile
+import tracemalloc
+import unittest
+from benekli import timings
+from benekli.benekli import CommandOptions, run_with_opts
+from tests.profiles import FOURTEEN_BALLS, create_test_profiles
+
+
+class TestTimings(unittest.TestCase):
+    """Test the timings of the stages of a run."""
+
+    def setUp(self):
+        """Set up test environment."""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        printer_profile, display_profile = create_test_profiles(self.temp_dir.name)
+        self.opts = CommandOptions()
+        self.opts.input_filename = FOURTEEN_BALLS
+        self.opts.simulated_profile_filename = printer_profile
+        self.opts.display_profile_filename = display_profile
+        self.opts.output_filename = self.output("proof.tif")
+        self.opts.de_filename = self.output("de.tif")
+        self.opts.timings_filename = self.output("timings.jsonl")
+
+    def tearDown(self):
+        """Clean up test environment."""
+        self.temp_dir.cleanup()
+
+    def output(self, filename):
+        return os.path.join(self.temp_dir.name, filename)
+
+    def read_records(self):
+        with open(self.opts.timings_filename, "r", encoding="utf-8") as f:
+            return [json.loads(line) for line in f]
+
+    def test_run_record(self):
+        """Test the records of the runs and the stage hooks."""
+        calls = []
+
+        def hook(name, record):
+            calls.append((name, record))
+
+        timings.add_stage_hook(hook)
+        try:
+            run_with_opts(self.opts)
+            run_with_opts(self.opts)
+
+        finally:
+            timings.remove_stage_hook(hook)
+
+        self.assertIsNone(self.opts.timings)
+        records = self.read_records()
+        self.assertEqual(len(records), 2)
+        record = records[0]
+        self.assertEqual(record["input"], FOURTEEN_BALLS)
+        self.assertEqual(record["status"], "done")
+        self.assertGreater(record["wall_s"], 0)
+        self.assertEqual(
+            [stage["stage"] for stage in record["stages"]],
+            [
+                "open_profiles",
+                "build_transforms",
+                "decode",
+                "input_Lab",
+                "proof",
+                "proof_save",
+                "proof_Lab",
+                "de_image",
+                "de_save",
+            ],
+        )
+        for stage in record["stages"]:
+            self.assertGreaterEqual(stage["wall_s"], 0)
+            self.assertGreaterEqual(stage["cpu_s"], 0)
+            self.assertNotIn("peak_rss_mb", stage)
+            self.assertNotIn("traced_peak_mb", stage)
+
+        if timings.get_peak_rss() is not None:
+            # the stages do not overlap without the sweep
+            growths = [stage["peak_rss_growth_mb"] for stage in record["stages"]]
+            self.assertGreaterEqual(min(growths), 0)
+            self.assertLessEqual(sum(growths), record["peak_rss_growth_mb"] + 0.01)
+            self.assertGreaterEqual(record["peak_rss_mb"], record["peak_rss_growth_mb"])
+
+        self.assertEqual(record["stages"][4]["rendering_intent"], "p")
+        # the stages and the run of both runs
+        self.assertEqual(len(calls), 2 * 10)
+        self.assertEqual(calls[9][0], "run")
+        self.assertEqual(calls[9][1]["stages"], record["stages"])
+
+    def test_failed_run(self):
+        """Test that the record of a failed run is written."""
+        self.opts.simulated_profile_filename = self.output("missing.icc")
+        with self.assertRaises(OSError):
+            run_with_opts(self.opts)
+
+        (record,) = self.read_records()
+        self.assertEqual(record["status"], "failed")
+        self.assertEqual(record["stages"][0]["stage"], "open_profiles")
+
+    def test_profile(self):
+        """Test the cProfile statistics and the tracemalloc snapshot."""
+        self.opts.cprofile_filename = self.output("run.prof")
+        self.opts.tracemalloc_filename = self.output("run.snapshot")
+        run_with_opts(self.opts)
+        self.assertFalse(tracemalloc.is_tracing())
+        stats = pstats.Stats(self.opts.cprofile_filename)
+        self.assertGreater(stats.total_calls, 0)
+        snapshot = tracemalloc.Snapshot.load(self.opts.tracemalloc_filename)
+        self.assertGreater(len(snapshot.traces), 0)
+        (record,) = self.read_records()
+        self.assertEqual(
+            record["traced_peak_mb"],
+            max(stage["traced_peak_mb"] for stage in record["stages"]),
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
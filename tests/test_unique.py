@@ -0,0 +1,71 @@
+import unittest
+from unittest import mock
+import numpy as np
+from benekli import unique
+from benekli.formulas import de2000_array
+from benekli.lab8 import de76_Lab8, de2000_Lab8
+from benekli.unique import UniqueDe, get_unique_de
+
+
+class TestUniqueDe(unittest.TestCase):
+    """Test calculating delta E once per unique pair of colors."""
+
+    def setUp(self):
+        """Set up test environment."""
+        self.rng = np.random.default_rng(23)
+        self.calculated = 0
+
+    def de_formula(self, Lab1, Lab2):
+        self.calculated = self.calculated + len(Lab1)
+        return de2000_array(Lab1, Lab2)
+
+    def calculate(self, de_formula, Lab1, Lab2):
+        # in chunks, like iterate_de
+        return np.concatenate(
+            [
+                de_formula(Lab1[start : start + 1000], Lab2[start : start + 1000])
+                for start in range(0, len(Lab1), 1000)
+            ]
+        )
+
+    def test_palette(self):
+        """Test that each pair is calculated once."""
+        palette1 = self.rng.integers(0, 256, (10, 3), dtype=np.uint8)
+        palette2 = self.rng.integers(0, 256, (10, 3), dtype=np.uint8)
+        Lab1 = palette1[self.rng.integers(0, 10, 10000)]
+        Lab2 = palette2[self.rng.integers(0, 10, 10000)]
+        de = self.calculate(UniqueDe(self.de_formula), Lab1, Lab2)
+        self.assertTrue(np.array_equal(de, de2000_array(Lab1, Lab2)))
+        pairs = len(np.unique(np.concatenate([Lab1, Lab2], axis=1), axis=0))
+        self.assertEqual(self.calculated, pairs)
+
+    def test_dense_fallback(self):
+        """Test that the pixels are calculated when most pairs are unique."""
+        Lab1 = self.rng.integers(0, 256, (10000, 3), dtype=np.uint8)
+        Lab2 = self.rng.integers(0, 256, (10000, 3), dtype=np.uint8)
+        de_formula = UniqueDe(self.de_formula)
+        de = self.calculate(de_formula, Lab1, Lab2)
+        self.assertTrue(np.array_equal(de, de2000_array(Lab1, Lab2)))
+        self.assertFalse(de_formula.enabled)
+        self.assertEqual(self.calculated, len(Lab1))
+
+    def test_pairs_limit(self):
+        """Test that the pairs over the limit are not kept."""
+        palette = self.rng.integers(0, 256, (100, 3), dtype=np.uint8)
+        Lab1 = palette[self.rng.integers(0, 100, 10000)]
+        Lab2 = np.zeros_like(Lab1)
+        de_formula = UniqueDe(self.de_formula)
+        with mock.patch.object(unique, "UNIQUE_MAX_PAIRS", 50):
+            de = self.calculate(de_formula, Lab1, Lab2)
+
+        self.assertTrue(np.array_equal(de, de2000_array(Lab1, Lab2)))
+        self.assertLessEqual(len(de_formula.keys), 50)
+
+    def test_get_unique_de(self):
+        """Test that cie76 is calculated for every pixel."""
+        self.assertIs(get_unique_de(de76_Lab8), de76_Lab8)
+        self.assertIsInstance(get_unique_de(de2000_Lab8), UniqueDe)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,117 @@
+import asyncio
+import os
+import shutil
+import tempfile
+import unittest
+from PIL import Image
+from benekli.batch import read_manifest
+from benekli.benekli import CommandOptions
+from benekli.watch import HotFolder, Watcher
+from tests.profiles import FOURTEEN_BALLS, create_test_profiles
+
+
+class TestWatch(unittest.TestCase):
+    """Test the hot folder watcher."""
+
+    def setUp(self):
+        """Set up test environment."""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.printer_profile, self.display_profile = create_test_profiles(
+            self.temp_dir.name
+        )
+        self.input_dir = os.path.join(self.temp_dir.name, "in")
+        self.output_dir = os.path.join(self.temp_dir.name, "out")
+        os.makedirs(self.input_dir)
+        os.makedirs(self.output_dir)
+        self.opts = CommandOptions()
+        self.opts.display_profile_filename = self.display_profile
+        self.opts.threads = 1
+
+    def tearDown(self):
+        """Clean up test environment."""
+        self.temp_dir.cleanup()
+
+    def test_hot_folder_settle(self):
+        """Test that an image is found once it does not change for settle."""
+        folder = HotFolder(self.input_dir, settle=2.0)
+        filename = os.path.join(self.input_dir, "a.tif")
+        with open(filename, "wb") as f:
+            f.write(b"half")
+
+        open(os.path.join(self.input_dir, "notes.txt"), "w").close()
+        open(os.path.join(self.input_dir, ".b.tif"), "w").close()
+        self.assertEqual(folder.scan(0.0), [])
+        self.assertEqual(folder.scan(1.0), [])
+        # still being written
+        with open(filename, "ab") as f:
+            f.write(b" written")
+
+        self.assertEqual(folder.scan(2.5), [])
+        self.assertTrue(folder.is_settling())
+        self.assertEqual(folder.scan(4.5), [filename])
+        self.assertFalse(folder.is_settling())
+        self.assertEqual(folder.scan(10.0), [])
+
+    def test_watch_once(self):
+        """Test proofing the images of a folder and skipping the done ones."""
+        shutil.copy(FOURTEEN_BALLS, self.input_dir)
+        manifest = os.path.join(self.output_dir, "manifest.jsonl")
+
+        def watch():
+            watcher = Watcher(
+                self.opts,
+                self.input_dir,
+                [self.printer_profile],
+                self.output_dir,
+                de=True,
+                workers=1,
+                queue_size=1,
+                settle=0.0,
+                poll_interval=0.01,
+                manifest_filename=manifest,
+            )
+            self.assertEqual(asyncio.run(watcher.run(once=True)), 0)
+            return watcher.counts
+
+        self.assertEqual(watch(), {"done": 1, "failed": 0})
+        self.assertEqual(len(os.listdir(self.output_dir)), 3)
+        proof = os.path.join(self.output_dir, "FourteenBalls.printer.p.tif")
+        with Image.open(proof) as im:
+            self.assertEqual(im.mode, "RGB")
+
+        self.assertEqual(len(read_manifest(manifest)), 1)
+        # done according to the manifest
+        self.assertEqual(watch(), {"done": 0, "failed": 0})
+
+    def test_watch_replaced(self):
+        """Test that a replaced image is proofed again."""
+        filename = os.path.join(self.input_dir, "FourteenBalls.tif")
+        shutil.copy(FOURTEEN_BALLS, filename)
+        manifest = os.path.join(self.output_dir, "manifest.jsonl")
+        watcher = Watcher(
+            self.opts,
+            self.input_dir,
+            [self.printer_profile],
+            self.output_dir,
+            workers=1,
+            settle=0.0,
+            poll_interval=0.01,
+            manifest_filename=manifest,
+        )
+        self.assertEqual(asyncio.run(watcher.run(once=True)), 0)
+        self.assertEqual(watcher.counts, {"done": 1, "failed": 0})
+        # not changed, not proofed again
+        self.assertEqual(asyncio.run(watcher.run(once=True)), 0)
+        self.assertEqual(watcher.counts, {"done": 1, "failed": 0})
+        # replaced after it is settled and proofed
+        with Image.open(FOURTEEN_BALLS) as im:
+            im.transpose(Image.Transpose.FLIP_LEFT_RIGHT).save(filename)
+
+        stat = os.stat(filename)
+        os.utime(filename, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        self.assertEqual(asyncio.run(watcher.run(once=True)), 0)
+        self.assertEqual(watcher.counts, {"done": 2, "failed": 0})
+
+
+if __name__ == "__main__":
+    unittest.main()